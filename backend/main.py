@@ -1,13 +1,45 @@
+import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from backend.routers import stocks, prediction
 from backend.routers import auth, watchlist_user       # ← NEW
+from backend.services import warmup, metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load + warm all models in a worker thread. The server starts accepting
+    # connections immediately (liveness), and /health/ready flips to 200 once
+    # the models are warm. Early prediction requests wait on the singleton lock
+    # instead of building their own copy.
+    warmup_task = asyncio.create_task(run_in_threadpool(warmup.warm_up_models))
+
+    # Optional: follow `python -m models.registry activate <version>` without a restart
+    stop_watch     = threading.Event()
+    watch_interval = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+    if watch_interval > 0:
+        threading.Thread(
+            target=warmup.watch_registry, args=(stop_watch, watch_interval),
+            name='model-registry-watch', daemon=True
+        ).start()
+
+    yield
+    stop_watch.set()
+    if not warmup_task.done():
+        warmup_task.cancel()
 
 
 app = FastAPI(
     title="Stock Price Prediction API",
     description="Deep Learning based NSE stock price forecasting using PyTorch LSTM-GRU",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 
@@ -21,6 +53,10 @@ app.add_middleware(
 )
 
 
+# Request latency per route + X-Debug-Timings → Server-Timing
+app.add_middleware(metrics.MetricsMiddleware)
+
+
 # Include routers
 app.include_router(stocks.router)
 app.include_router(prediction.router)
@@ -37,6 +73,28 @@ async def root():
     }
 
 
+@app.get("/health/live")
+async def liveness():
+    """Process is up and serving the event loop"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Models are loaded and warmed up — 503 until then"""
+    ready = warmup.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "models": warmup.get_status()}
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Stage / request latency histograms and cache counters, Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001, reload=True)
\ No newline at end of file
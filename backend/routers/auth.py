@@ -1,20 +1,38 @@
-from fastapi import APIRouter, HTTPException, Header
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from backend.schemas.authschemas import UserSignup, UserLogin
 from backend.services.authservice import (
-    authenticate_user, create_user, create_access_token,
-    get_user_by_username, get_user_by_email, verify_token
+    authenticate_user_async, create_user_async, create_access_token,
+    get_user_by_username, get_user_by_email, get_current_user, require_admin,
+    hash_pool, HashPoolBusy
 )
+from backend.services.rate_limit import RateLimiter, client_ip
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+# Admission control — a login storm is rejected here before it reaches bcrypt.
+# The per-account limit is keyed on (account, IP) so guessing from one address
+# cannot lock the owner out from theirs.
+_login_per_ip      = RateLimiter(rate_per_minute=30, burst=10)
+_login_per_account = RateLimiter(rate_per_minute=5,  burst=5)
+_signup_per_ip     = RateLimiter(rate_per_minute=10, burst=5)
+
+def _busy():
+    return HTTPException(
+        status_code=503, detail="Authentication is busy, retry shortly", headers={"Retry-After": "1"}
+    )
+
 @router.post("/signup")
-async def signup(data: UserSignup):
-    if get_user_by_email(data.email):
+async def signup(data: UserSignup, request: Request):
+    _signup_per_ip.check(client_ip(request), "Too many signup attempts")
+    if await run_in_threadpool(get_user_by_email, data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    if get_user_by_username(data.username):
+    if await run_in_threadpool(get_user_by_username, data.username):
         raise HTTPException(status_code=400, detail="Username already taken")
-    user = create_user(data.username, data.email, data.password)
+    try:
+        user = await create_user_async(data.username, data.email, data.password)
+    except HashPoolBusy:
+        raise _busy()
     if not user:
         raise HTTPException(status_code=500, detail="Failed to create user")
     token = create_access_token({"sub": str(user["id"])})
@@ -25,8 +43,14 @@ async def signup(data: UserSignup):
     }
 
 @router.post("/login")
-async def login(data: UserLogin):
-    user = authenticate_user(data.email, data.password)
+async def login(data: UserLogin, request: Request):
+    ip = client_ip(request)
+    _login_per_ip.check(ip, "Too many login attempts")
+    _login_per_account.check((data.email.lower(), ip), "Too many login attempts for this account")
+    try:
+        user = await authenticate_user_async(data.email, data.password)
+    except HashPoolBusy:
+        raise _busy()
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     token = create_access_token({"sub": str(user["id"])})
@@ -37,10 +61,10 @@ async def login(data: UserLogin):
     }
 
 @router.get("/me")
-async def get_me(authorization: Optional[str] = Header(None)):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    user = verify_token(authorization.split(" ")[1])
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+async def get_me(user: dict = Depends(get_current_user)):
     return user
+
+@router.get("/pool")
+async def hash_pool_stats(admin: dict = Depends(require_admin)):
+    """bcrypt pool queue depth and timings (admin only)"""
+    return hash_pool.stats()
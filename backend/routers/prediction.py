@@ -1,43 +1,128 @@
 # backend/routers/prediction.py
 
-from fastapi import APIRouter, HTTPException
+import json
+import threading
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from backend.services.prediction_service import get_predictor
 from backend.services.ensemble_service import get_ensemble_predictor
+from backend.services import warmup, http_cache
+from backend.services.authservice import require_admin
+from models.registry import ModelRegistry
 from backend.schemas.stock_schemas import PredictionRequest, PredictionResponse
 
 
 router = APIRouter(prefix="/api/predict", tags=["prediction"])
 
 
+def _prediction_headers(etag):
+    return http_cache.cache_headers(etag, cache_control=http_cache.PREDICTION_CACHE_CONTROL)
+
+
+async def _run_prediction(symbol, days_ahead, method, http_request, response):
+    # Off the event loop: may wait on the startup warm-up holding the load lock
+    predictor = await run_in_threadpool(get_predictor)
+    # The validator is a hash of the body (resolved method, live price, last
+    # bar, model version), stored with the service's cached forecast — a
+    # revalidation within the cache TTL is one dict lookup, no DB or model work
+    if http_request.method == 'GET':
+        etag = predictor.cached_etag(symbol, days_ahead, method)
+        if etag and http_cache.is_not_modified(http_request, etag):
+            return http_cache.not_modified(_prediction_headers(etag))
+
+    result = await run_in_threadpool(predictor.predict, symbol, days_ahead, method)
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Insufficient data for {symbol}"
+        )
+    headers = _prediction_headers(http_cache.body_etag('predict', result))
+    if http_request.method == 'GET' and http_cache.is_not_modified(http_request, headers['ETag']):
+        return http_cache.not_modified(headers)
+    response.headers.update(headers)
+    return result
+
+
 @router.post("/", response_model=PredictionResponse)
-async def predict_stock_price(request: PredictionRequest):
+async def predict_stock_price(request: PredictionRequest, http_request: Request, response: Response):
     """Predict future stock prices"""
     try:
-        predictor = get_predictor()
-        result = predictor.predict(request.symbol, request.days_ahead)
-
-        if result is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Insufficient data for {request.symbol}"
-            )
-
-        return result
+        return await _run_prediction(
+            request.symbol, request.days_ahead, request.method, http_request, response
+        )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _encode_event(event, data, fmt):
+    if fmt == 'ndjson':
+        return json.dumps({'event': event, 'data': data}) + '\n'
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/{symbol}/stream")
+async def stream_prediction(
+    symbol: str,
+    request: Request,
+    days_ahead: int = Query(default=5, ge=1, le=365),
+    method: Optional[Literal['direct', 'autoregressive', 'student']] = None,
+    chunk_size: int = Query(default=10, ge=1, le=365),
+    format: Literal['sse', 'ndjson'] = 'sse'
+):
+    """
+    Stream the forecast path in chunks as it is computed (SSE or NDJSON).
+    Each step runs in the threadpool; when the client disconnects the loop
+    is cancelled before its next step.
+    """
+    predictor = await run_in_threadpool(get_predictor)
+    cancel    = threading.Event()
+    events    = predictor.iter_predict(
+        symbol, days_ahead, method=method, chunk_size=chunk_size, cancel_event=cancel
+    )
+
+    async def body():
+        sentinel = object()
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                item = await run_in_threadpool(next, events, sentinel)
+                if item is sentinel:
+                    break
+                yield _encode_event(*item, format)
+        finally:
+            cancel.set()
+            try:
+                events.close()
+            except ValueError:
+                # Still executing a step in the worker thread — the cancel
+                # flag stops it at the next step boundary.
+                pass
+
+    media_type = 'application/x-ndjson' if format == 'ndjson' else 'text/event-stream'
+    return StreamingResponse(
+        body(), media_type=media_type,
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @router.get("/health")
 async def model_health():
-    """Check if LSTM model is loaded"""
+    """Check if LSTM model is loaded (does not trigger a load while warming up)"""
+    status = warmup.get_status()['lstm']
+    if status['state'] in ('pending', 'loading'):
+        return {"status": "loading", "model_loaded": False}
     try:
         predictor = get_predictor()
         return {
             "status": "healthy",
             "device": str(predictor.device),
-            "model_loaded": True
+            "model_loaded": True,
+            "warm": warmup.is_ready('lstm')
         }
     except Exception as e:
         return {
@@ -50,7 +135,7 @@ async def model_health():
 async def predict_xgb_signal(request: PredictionRequest):
     """XGBoost + LightGBM ensemble signal — UP / SIDEWAYS / DOWN"""
     try:
-        predictor = get_ensemble_predictor()
+        predictor = await run_in_threadpool(get_ensemble_predictor)
         result    = predictor.predict(request.symbol)
         if result is None:
             raise HTTPException(
@@ -67,6 +152,8 @@ async def predict_xgb_signal(request: PredictionRequest):
 @router.get("/xgb/health")
 async def xgb_health():
     """Check if ensemble models are loaded"""
+    if warmup.get_status()['ensemble']['state'] in ('pending', 'loading'):
+        return {"status": "loading"}
     try:
         predictor = get_ensemble_predictor()
         return {
@@ -77,4 +164,49 @@ async def xgb_health():
         return {
             "status": "unhealthy",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+@router.post("/reload", status_code=202)
+async def reload_models(background_tasks: BackgroundTasks, version: Optional[str] = None,
+                        admin: dict = Depends(require_admin)):
+    """Hot-swap to a registry version (default: CURRENT) without dropping requests — admin only"""
+    registry = ModelRegistry()
+    try:
+        version, _ = registry.resolve(version)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Model version not found")
+    background_tasks.add_task(warmup.reload_models, version)
+    return {"status": "reloading", "version": version}
+
+
+@router.get("/models")
+async def list_model_versions():
+    """Registry versions and which one each service is currently serving"""
+    registry = ModelRegistry()
+    return {
+        "current":  registry.current_version(),
+        "versions": [
+            {"version": v, "manifest": registry.read_manifest(v)}
+            for v in registry.list_versions()
+        ],
+        "serving":  {name: s['version'] for name, s in warmup.get_status().items()}
+    }
+
+
+# Declared last so the fixed paths above (/health, /models, ...) match first
+@router.get("/{symbol}", response_model=PredictionResponse)
+async def get_stock_prediction(
+    symbol: str,
+    http_request: Request,
+    response: Response,
+    days_ahead: int = Query(default=5, ge=1, le=365),
+    method: Optional[Literal['direct', 'autoregressive', 'student']] = None
+):
+    """Cacheable GET form of POST / — answers If-None-Match with 304"""
+    try:
+        return await _run_prediction(symbol, days_ahead, method, http_request, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,40 +1,83 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from backend.services.data_service import DataService
+from backend.services import downsampling, serialization, http_cache
 from backend.schemas.stock_schemas import StockInfo, HistoricalPrice
-from typing import List
+from typing import List, Literal, Optional
 
 router = APIRouter(prefix="/api/stocks", tags=["stocks"])
 
 
 @router.get("/", response_model=List[StockInfo])
-async def get_all_stocks():
+async def get_all_stocks(request: Request, response: Response):
     """Get list of all available stocks"""
     try:
-        stocks = DataService.get_all_stocks()
+        last_date, n_stocks = await run_in_threadpool(DataService.get_catalog_stamp)
+        headers = http_cache.cache_headers(http_cache.make_etag('stocks', last_date, n_stocks), last_date)
+        if http_cache.is_not_modified(request, headers['ETag'], last_date):
+            return http_cache.not_modified(headers)
+
+        stocks = await run_in_threadpool(DataService.get_all_stocks)
+        response.headers.update(headers)
         return stocks
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/{symbol}/historical")
-async def get_historical_data(symbol: str, limit: int = 90):
-    """Get historical price data for a stock"""
+async def get_historical_data(
+    symbol: str,
+    request: Request,
+    limit: int = Query(default=90, ge=1, le=10000),
+    max_points: Optional[int] = Query(default=None, ge=3, le=10000),
+    downsample: Literal['lttb', 'ohlc'] = 'lttb',
+    format: Literal['rows', 'columnar', 'msgpack', 'arrow'] = 'rows'
+):
+    """
+    Get historical price data for a stock.
+
+    max_points  — reduce to at most this many points (LTTB on close, or OHLC buckets)
+    format      — rows (default, one object per day), columnar (one array per
+                  field), msgpack or arrow (columnar, binary)
+    """
     try:
-        data = DataService.get_historical_prices(symbol, limit)
-        if not data:
+        last_date = await run_in_threadpool(DataService.get_last_trade_date, symbol)
+        if last_date is None:
             raise HTTPException(status_code=404, detail="Stock not found")
-        return data
+        etag    = http_cache.make_etag(symbol, last_date, limit, max_points, downsample, format)
+        headers = http_cache.cache_headers(etag, last_date)
+        if http_cache.is_not_modified(request, etag, last_date):
+            return http_cache.not_modified(headers)
+
+        arrays = await run_in_threadpool(DataService.get_historical_arrays, symbol, limit)
+        if arrays is None:
+            raise HTTPException(status_code=404, detail="Stock not found")
+        if max_points is not None:
+            arrays = downsampling.downsample(arrays, max_points, downsample)
+        return serialization.render(arrays, format, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/{symbol}/latest")
-async def get_latest_price(symbol: str):
+async def get_latest_price(symbol: str, request: Request, response: Response):
     """Get latest price for a stock"""
     try:
-        data = DataService.get_latest_price(symbol)
+        last_date = await run_in_threadpool(DataService.get_last_trade_date, symbol)
+        if last_date is None:
+            raise HTTPException(status_code=404, detail="Stock not found")
+        headers = http_cache.cache_headers(http_cache.make_etag(symbol, last_date, 'latest'), last_date)
+        if http_cache.is_not_modified(request, headers['ETag'], last_date):
+            return http_cache.not_modified(headers)
+
+        data = await run_in_threadpool(DataService.get_latest_price, symbol)
         if not data:
             raise HTTPException(status_code=404, detail="Stock not found")
+        response.headers.update(headers)
         return data
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
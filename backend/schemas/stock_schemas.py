@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 
 class StockInfo(BaseModel):
@@ -20,10 +20,19 @@ class HistoricalPrice(BaseModel):
 class PredictionRequest(BaseModel):
     symbol: str
     days_ahead: int = Field(default=5, ge=1, le=365)
+    # None = automatic (direct multi-horizon head for long horizons when available,
+    # the distilled student on STUDENT_ROUTES); 'student' = the student on request
+    method: Optional[Literal['direct', 'autoregressive', 'student']] = None
 
 
 class PredictionResponse(BaseModel):
     symbol: str
+    model_version: Optional[str] = None
+    method: Optional[str] = None
     current_price: float
     current_date: str
-    predictions: List[dict]
\ No newline at end of file
+    predictions: List[dict]
+
+class WatchlistBulkRequest(BaseModel):
+    add: List[str] = Field(default_factory=list, max_length=200)
+    remove: List[str] = Field(default_factory=list, max_length=200)
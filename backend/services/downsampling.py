@@ -0,0 +1,75 @@
+# backend/services/downsampling.py
+#
+# Reduce a price series to at most `max_points` for charting.
+#
+#   lttb  — Largest-Triangle-Three-Buckets on close_price. Keeps real rows
+#           (first and last always), so visual peaks and troughs survive.
+#   ohlc  — fixed buckets aggregated to one candle each: first open, max high,
+#           min low, last close, summed volume, dated at the bucket's first day.
+#
+# Both take and return a dict of equal-length NumPy arrays (see
+# DataService.get_historical_arrays).
+
+import numpy as np
+
+METHODS = ('lttb', 'ohlc')
+
+
+def lttb_indices(y, max_points):
+    """Row indices selected by LTTB, using the row position as the x axis."""
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    y     = np.asarray(y, dtype=np.float64)
+    x     = np.arange(n, dtype=np.float64)
+    # Interior points split into max_points - 2 buckets; first/last are fixed
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+    out    = np.empty(max_points, dtype=np.int64)
+    out[0] = 0
+    a      = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a          = lo + int(area.argmax())
+        out[i + 1] = a
+    out[-1] = n - 1
+    return out
+
+
+def lttb(arrays, max_points, value_key='close_price'):
+    idx = lttb_indices(arrays[value_key], max_points)
+    return {k: v[idx] for k, v in arrays.items()}
+
+
+def ohlc_buckets(arrays, max_points):
+    n = len(arrays['trade_date'])
+    if max_points >= n:
+        return arrays
+
+    starts = np.linspace(0, n, max_points, endpoint=False).astype(np.int64)
+    ends   = np.append(starts[1:], n) - 1
+    out    = {
+        'trade_date':  arrays['trade_date'][starts],
+        'open_price':  arrays['open_price'][starts],
+        'high_price':  np.maximum.reduceat(arrays['high_price'], starts),
+        'low_price':   np.minimum.reduceat(arrays['low_price'], starts),
+        'close_price': arrays['close_price'][ends],
+    }
+    if 'volume' in arrays:
+        out['volume'] = np.add.reduceat(arrays['volume'], starts)
+    return out
+
+
+def downsample(arrays, max_points, method='lttb'):
+    if method == 'ohlc':
+        return ohlc_buckets(arrays, max_points)
+    return lttb(arrays, max_points)
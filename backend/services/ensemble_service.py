@@ -2,61 +2,110 @@
 
 import os
 import sys
+import threading
 import numpy as np
+from datetime import datetime
 import joblib
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from data.data_loader import StockDataLoader
 from data.feature_engineering import FeatureEngineer
+from models.registry import ModelRegistry, MODEL_DIR, UNVERSIONED
+from models.trees import set_threads
+from backend.services.prediction_cache import PredictionCache
+from utils.metrics import span, cache_requests
 
-MODEL_DIR = 'saved_models'
+_signal_cache = PredictionCache(ttl_seconds=300)
+
+# Weighted XGB/LGBM P(UP) at or above UP_THRESHOLD is UP, at or below
+# DOWN_THRESHOLD is DOWN, anything between is SIDEWAYS. backtest/simulator.py
+# sweeps these against PnL.
+UP_THRESHOLD   = float(os.environ.get('ENSEMBLE_UP_THRESHOLD', 0.55))
+DOWN_THRESHOLD = float(os.environ.get('ENSEMBLE_DOWN_THRESHOLD', 0.45))
+
+
+def classify_signal(prob, up=UP_THRESHOLD, down=DOWN_THRESHOLD):
+    if prob >= up:
+        return "UP"
+    if prob <= down:
+        return "DOWN"
+    return "SIDEWAYS"
 
 
 class EnsemblePredictionService:
 
-    def __init__(self):
-        self.xgb    = joblib.load(f'{MODEL_DIR}/ensemble_xgb.pkl')
-        self.lgbm   = joblib.load(f'{MODEL_DIR}/ensemble_lgbm.pkl')
-        self.scaler = joblib.load(f'{MODEL_DIR}/ensemble_scaler.pkl')
-        self.feature_cols = joblib.load(f'{MODEL_DIR}/ensemble_feature_cols.pkl')
-        weights     = joblib.load(f'{MODEL_DIR}/ensemble_weights.pkl')
+    def __init__(self, model_dir=MODEL_DIR, version=UNVERSIONED):
+        self.version = version
+        self.xgb    = joblib.load(f'{model_dir}/ensemble_xgb.pkl')
+        self.lgbm   = joblib.load(f'{model_dir}/ensemble_lgbm.pkl')
+        self.scaler = joblib.load(f'{model_dir}/ensemble_scaler.pkl')
+        self.feature_cols = joblib.load(f'{model_dir}/ensemble_feature_cols.pkl')
+        weights     = joblib.load(f'{model_dir}/ensemble_weights.pkl')
         self.w_xgb  = weights['xgb_weight']
         self.w_lgbm = weights['lgbm_weight']
+        self.set_threads()
 
         self.loader   = StockDataLoader()
         self.engineer = FeatureEngineer()
         print("✓ Ensemble (XGBoost + LightGBM) loaded successfully")
 
+    def set_threads(self, n=None):
+        """OpenMP threads for both boosters (default INFERENCE_THREADS)."""
+        set_threads(self.xgb, n)
+        set_threads(self.lgbm, n)
+
+    def warm_up(self, runs=3):
+        """Run synthetic rows through scaler, XGBoost and LightGBM once loaded."""
+        n_features = getattr(self.scaler, 'n_features_in_', len(self.feature_cols))
+        X_sc       = self.scaler.transform(np.zeros((1, n_features)))
+        for _ in range(runs):
+            self.xgb.predict_proba(X_sc)
+            self.lgbm.predict_proba(X_sc)
+
     def predict(self, symbol):
+        cache_key = (self.version, symbol, datetime.now().date())
+        cached    = _signal_cache.get(cache_key)
+        if cached is not None:
+            cache_requests.inc('ensemble', 'hit')
+            return dict(cached)
+
+        cache_requests.inc('ensemble', 'miss')
+        with span('ensemble.total'):
+            result = self._predict_uncached(symbol)
+        if result is not None:
+            _signal_cache.set(cache_key, result)
+            return dict(result)
+        return None
+
+    def _predict_uncached(self, symbol):
         try:
             df = self.loader.load_stock_data(symbol)
             if df is None or len(df) < 100:
                 return None
 
-            df = self.engineer.add_technical_indicators(df)
-            df = df.dropna()
+            with span('ensemble.indicators'):
+                df = self.engineer.add_technical_indicators(df)
+                df = df.dropna()
 
             cols = [c for c in self.feature_cols if c in df.columns]
             X    = df[cols].values[-1:]          # latest row only
-            X_sc = self.scaler.transform(X)
+            with span('ensemble.scale'):
+                X_sc = self.scaler.transform(X)
 
-            xgb_prob  = self.xgb.predict_proba(X_sc)[0, 1]
-            lgbm_prob = self.lgbm.predict_proba(X_sc)[0, 1]
+            with span('ensemble.xgb'):
+                xgb_prob  = self.xgb.predict_proba(X_sc)[0, 1]
+            with span('ensemble.lgbm'):
+                lgbm_prob = self.lgbm.predict_proba(X_sc)[0, 1]
             avg_prob  = self.w_xgb * xgb_prob + self.w_lgbm * lgbm_prob
-
-            if avg_prob >= 0.55:
-                signal = "UP"
-            elif avg_prob <= 0.45:
-                signal = "DOWN"
-            else:
-                signal = "SIDEWAYS"
+            signal    = classify_signal(avg_prob)
 
             return {
-                'symbol':      symbol,
-                'signal':      signal,
-                'confidence':  round(float(avg_prob) * 100, 2),
-                'xgb_prob':    round(float(xgb_prob) * 100, 2),
-                'lgbm_prob':   round(float(lgbm_prob) * 100, 2),
+                'symbol':        symbol,
+                'model_version': self.version,
+                'signal':        signal,
+                'confidence':    round(float(avg_prob) * 100, 2),
+                'xgb_prob':      round(float(xgb_prob) * 100, 2),
+                'lgbm_prob':     round(float(lgbm_prob) * 100, 2),
             }
 
         except Exception as e:
@@ -66,10 +115,35 @@ class EnsemblePredictionService:
             return None
 
 
-_ensemble = None
+_registry      = ModelRegistry()
+_ensemble      = None
+_ensemble_lock = threading.Lock()
 
 def get_ensemble_predictor():
     global _ensemble
     if _ensemble is None:
-        _ensemble = EnsemblePredictionService()
-    return _ensemble
\ No newline at end of file
+        with _ensemble_lock:
+            if _ensemble is None:
+                version, model_dir = _registry.resolve()
+                _ensemble = EnsemblePredictionService(model_dir=model_dir, version=version)
+    return _ensemble
+
+
+def build_ensemble_predictor(version=None):
+    """Build + warm `version` without touching the live instance."""
+    version, model_dir = _registry.resolve(version)
+    predictor = EnsemblePredictionService(model_dir=model_dir, version=version)
+    predictor.warm_up()
+    return predictor
+
+
+def install_ensemble_predictor(predictor):
+    global _ensemble
+    with _ensemble_lock:
+        _ensemble = predictor
+    return predictor.version
+
+
+def reload_ensemble_predictor(version=None):
+    """Build + warm `version` alongside the live instance, then swap it in."""
+    return install_ensemble_predictor(build_ensemble_predictor(version))
\ No newline at end of file
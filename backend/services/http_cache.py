@@ -0,0 +1,83 @@
+# backend/services/http_cache.py
+#
+# Conditional-request helpers (ETag / Last-Modified / 304).
+#
+# Market data only changes when new bars are ingested: the routers build a
+# validator from those inputs (one cheap catalog query) and answer
+# revalidations with 304 before doing any real work. A forecast also embeds
+# the live price, so its ETag is a hash of the body, computed once when the
+# prediction service caches it and matched against that cache entry.
+
+import json
+import hashlib
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi.responses import Response
+
+# Browsers may reuse market data for a minute, then must revalidate
+MARKET_CACHE_CONTROL     = 'public, max-age=60, must-revalidate'
+# Forecasts depend on the live price too — per-user cache, always revalidate
+PREDICTION_CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """Weak ETag over the stringified validator parts."""
+    digest = hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def body_etag(kind, body):
+    """Weak ETag over a JSON-serialisable response body."""
+    return make_etag(kind, json.dumps(body, sort_keys=True, default=str))
+
+
+def _as_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime.combine(value, time.min, tzinfo=timezone.utc)
+    return None
+
+
+def http_date(value):
+    dt = _as_datetime(value)
+    return format_datetime(dt, usegmt=True) if dt else None
+
+
+def _etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    # Weak comparison: ignore the W/ prefix on both sides
+    wanted = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == wanted for tag in header.split(','))
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """RFC 9110 §13.2.2: If-None-Match wins; If-Modified-Since only without it."""
+    inm = request.headers.get('if-none-match')
+    if inm is not None:
+        return _etag_matches(inm, etag)
+
+    ims = request.headers.get('if-modified-since')
+    lm  = _as_datetime(last_modified)
+    if ims and lm:
+        try:
+            return lm <= parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cache_headers(etag, last_modified=None, cache_control=MARKET_CACHE_CONTROL):
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    lm = http_date(last_modified)
+    if lm:
+        headers['Last-Modified'] = lm
+    return headers
+
+
+def not_modified(headers):
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,62 @@
+# backend/services/metrics.py
+#
+# HTTP side of the metrics: per-route latency and the X-Debug-Timings
+# Server-Timing header. Spans, histograms and the registry live in
+# utils/metrics.py and are re-exported here.
+#
+#   app.add_middleware(MetricsMiddleware)
+
+import time
+from contextlib import nullcontext
+
+from utils.metrics import (                     # noqa: F401 — re-exported
+    Histogram, Counter, STAGE_BUCKETS, HTTP_BUCKETS,
+    stage_duration, http_duration, cache_requests,
+    span, collect_timings, server_timing, render_prometheus,
+)
+
+DEBUG_HEADER = 'x-debug-timings'
+
+
+# ── ASGI middleware ────────────────────────────────────────────────────────────
+
+class MetricsMiddleware:
+    """
+    Records http_request_duration_seconds per route template and, when the
+    request carries X-Debug-Timings, traces its spans into a Server-Timing
+    response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        debug  = any(k == DEBUG_HEADER.encode() for k, _ in scope.get('headers', ()))
+        start  = time.perf_counter()
+        status = 500
+
+        with collect_timings() if debug else nullcontext() as trace:
+            async def send_wrapper(message):
+                nonlocal status
+                if message['type'] == 'http.response.start':
+                    status = message['status']
+                    if trace is not None:
+                        total   = f'total;dur={(time.perf_counter() - start) * 1000:.2f}'
+                        headers = list(message.get('headers', []))
+                        headers.append((b'server-timing',
+                                        ', '.join(filter(None, [server_timing(trace), total])).encode()))
+                        message = {**message, 'headers': headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get('route')
+                # Route templates only — raw paths would make one series per symbol
+                label = getattr(route, 'path', None) or 'unmatched'
+                http_duration.observe(time.perf_counter() - start, scope['method'], label, str(status))
+
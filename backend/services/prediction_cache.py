@@ -0,0 +1,56 @@
+# backend/services/prediction_cache.py
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Small thread-safe TTL + LRU cache for prediction results.
+
+    Callers put the model version first in the key, so swapping in a new
+    version makes every old entry unreachable without an explicit flush;
+    stale entries simply age out of the LRU. An entry may carry a `tag`
+    (its HTTP validator) that get_tag() returns without copying the value.
+    """
+
+    def __init__(self, ttl_seconds=300, max_entries=2048):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries    = OrderedDict()
+        self._lock       = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_tag(self, key):
+        """The tag stored with a live entry, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[2]
+
+    def set(self, key, value, tag=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, tag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -2,6 +2,8 @@
 
 import os
 import sys
+import threading
+import contextlib
 sys.path.append('..')
 
 import torch
@@ -12,22 +14,59 @@ from datetime import datetime, timedelta, date
 from sklearn.preprocessing import StandardScaler
 
 from models.hybrid_lstm_gru import HybridLSTMGRU
+from models.registry import ModelRegistry, MODEL_DIR, UNVERSIONED
+from models.multi_horizon import MULTI_HORIZON_NAME, horizon_scale, interpolate_path
+from models.export import (
+    LSTM_TS_NAME, CNN_TS_NAME, load_torchscript, configure_threads,
+    quantize_dynamic_int8, cpu_supports_bf16
+)
+from models.student import STUDENT_TS_NAME, load_student
+from models.trees import set_threads
 from data.data_loader import StockDataLoader
+from data.quote_providers import get_quote_provider
+from backend.services.prediction_cache import PredictionCache
+from backend.services.http_cache import body_etag
+from utils.metrics import span, cache_requests
+
+
+# Keyed by (model version, symbol, days_ahead, date) — a hot swap to a new
+# version never serves forecasts produced by the old one.
+_prediction_cache = PredictionCache(ttl_seconds=300)
+
+
+def _cache_forecast(cache_key, result):
+    # The body's ETag is computed once here, not on every revalidation
+    _prediction_cache.set(cache_key, result, tag=body_etag('predict', result))
+
+# Horizons at or above this use the direct multi-horizon head when it is loaded
+DIRECT_MIN_DAYS = int(os.environ.get('DIRECT_FORECAST_MIN_DAYS', 30))
+
+# Routes ('predict', 'batch', 'stream') whose autoregressive forecasts use the
+# distilled student by default, e.g. STUDENT_ROUTES=batch,stream
+STUDENT_ROUTES = {r.strip() for r in os.environ.get('STUDENT_ROUTES', '').split(',') if r.strip()}
 
 
 class PredictionService:
     """Handle model inference — LSTM + optional XGBoost/CNN1D ensemble"""
 
-    def __init__(self, model_path='saved_models/returns_model.pth'):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        print(f"Loading model on device: {self.device}")
+    def __init__(self, model_dir=MODEL_DIR, version=UNVERSIONED, runtime=None, precision=None):
+        self.device    = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.model_dir = model_dir
+        self.version   = version
+        # 'eager' = nn.Module checkpoints, 'torchscript' = frozen artefacts from models/export.py
+        self.runtime   = runtime or os.environ.get('PREDICTION_RUNTIME', 'eager')
+        # 'fp32' (default) | 'int8' dynamic quantisation | 'bf16' CPU autocast
+        self.precision = precision or os.environ.get('PREDICTION_PRECISION', 'fp32')
+        n_threads      = configure_threads()
+        print(f"Loading model {version} on device: {self.device} | runtime={self.runtime} | "
+              f"precision={self.precision} | threads={n_threads}")
 
         # ── Feature columns ───────────────────────────────────────────────────
-        self.feature_cols = joblib.load('saved_models/returns_feature_cols.pkl')
+        self.feature_cols = joblib.load(os.path.join(model_dir, 'returns_feature_cols.pkl'))
         input_size        = len(self.feature_cols)
 
         # ── LSTM: handle both flat state_dict (old) and full checkpoint (new) ──
-        checkpoint = torch.load(model_path, map_location=self.device)
+        checkpoint = torch.load(os.path.join(model_dir, 'returns_model.pth'), map_location=self.device)
         if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
             cfg                  = checkpoint.get('config', {})
             input_size           = cfg.get('input_size',      input_size)
@@ -55,6 +94,11 @@ class PredictionService:
         self.cnn_model    = None
         self.meta_learner = None
         self._load_ensemble()
+        self._load_multi_horizon()
+        self._load_student()
+        if self.runtime == 'torchscript':
+            self._load_exported()
+        self._apply_precision()
 
         self.data_loader = StockDataLoader()
         ensemble_status  = "ON" if self.meta_learner is not None else "OFF (LSTM only)"
@@ -64,9 +108,9 @@ class PredictionService:
     # ── Ensemble loading ────────────────────────────────────────────────────────
 
     def _load_ensemble(self):
-        xgb_path  = 'saved_models/xgb_model.pkl'
-        cnn_path  = 'saved_models/cnn1d_model.pth'
-        meta_path = 'saved_models/meta_learner.pkl'
+        xgb_path  = os.path.join(self.model_dir, 'xgb_model.pkl')
+        cnn_path  = os.path.join(self.model_dir, 'cnn1d_model.pth')
+        meta_path = os.path.join(self.model_dir, 'meta_learner.pkl')
 
         if not all(os.path.exists(p) for p in [xgb_path, cnn_path, meta_path]):
             print("Ensemble models not found — running in LSTM-only mode.")
@@ -76,6 +120,7 @@ class PredictionService:
         try:
             self.xgb_model    = joblib.load(xgb_path)
             self.meta_learner = joblib.load(meta_path)
+            set_threads(self.xgb_model)
 
             cnn_ckpt = torch.load(cnn_path, map_location=self.device)
             cfg      = cnn_ckpt.get('config', {})
@@ -93,23 +138,168 @@ class PredictionService:
             self.xgb_model = self.cnn_model = self.meta_learner = None
 
 
+    def _load_multi_horizon(self):
+        """Optional direct multi-horizon head (training/trainlarge.py --multi-horizon)."""
+        self.mh_model = None
+        path = os.path.join(self.model_dir, MULTI_HORIZON_NAME)
+        if not os.path.exists(path):
+            return
+
+        try:
+            ckpt = torch.load(path, map_location=self.device)
+            cfg  = ckpt['config']
+            self.horizons   = list(cfg['horizons'])
+            self.mh_seq_len = cfg.get('sequence_length', self.sequence_length)
+            self.mh_scale   = (
+                horizon_scale(self.horizons) if cfg.get('target_scale') == 'sqrt_horizon'
+                else np.ones(len(self.horizons), dtype=np.float32)
+            )
+            self.mh_model = HybridLSTMGRU(
+                input_size=cfg['input_size'],
+                hidden_size=cfg.get('hidden_size', 256),
+                num_layers=cfg.get('num_layers', 3),
+                output_size=len(self.horizons),
+                dropout=cfg.get('dropout', 0.4)
+            )
+            self.mh_model.load_state_dict(ckpt['model_state_dict'])
+            self.mh_model.to(self.device).eval()
+            print(f"✓ Multi-horizon head loaded: {self.horizons}")
+        except Exception as e:
+            print(f"Multi-horizon load failed: {e} — long horizons stay autoregressive.")
+            self.mh_model = None
+
+    def _load_student(self):
+        """Optional distilled student (training/distill.py) for method='student'."""
+        self.student_model = None
+        try:
+            self.student_model, cfg = load_student(self.model_dir, self.device)
+        except Exception as e:
+            print(f"Student load failed: {e} — student routes use the full LSTM.")
+            return
+        if self.student_model is None:
+            return
+        if cfg.get('sequence_length', self.sequence_length) != self.sequence_length:
+            print("Student window differs from the LSTM's — student disabled.")
+            self.student_model = None
+            return
+        print(f"✓ Student loaded: {cfg['arch']} | routes={','.join(sorted(STUDENT_ROUTES)) or 'on request'}")
+
+    def _load_exported(self):
+        """Replace the eager LSTM / CNN with their frozen TorchScript exports."""
+        lstm_ts = os.path.join(self.model_dir, LSTM_TS_NAME)
+        cnn_ts  = os.path.join(self.model_dir, CNN_TS_NAME)
+
+        if not os.path.exists(lstm_ts):
+            print("TorchScript artefacts not found — run models/export.py. Using eager runtime.")
+            self.runtime = 'eager'
+            return
+
+        self.model = load_torchscript(lstm_ts, self.device)
+        if self.cnn_model is not None:
+            if os.path.exists(cnn_ts):
+                self.cnn_model = load_torchscript(cnn_ts, self.device)
+            else:
+                print("CNN1D TorchScript export missing — CNN stays eager.")
+        if self.student_model is not None:
+            student_ts = os.path.join(self.model_dir, STUDENT_TS_NAME)
+            if os.path.exists(student_ts):
+                self.student_model = load_torchscript(student_ts, self.device)
+            else:
+                print("Student TorchScript export missing — student stays eager.")
+        print("✓ TorchScript runtime loaded")
+
+
+    def _apply_precision(self):
+        """Opt-in reduced precision for CPU serving; falls back to fp32 where unsupported."""
+        if self.precision == 'fp32':
+            return
+        if self.device.type != 'cpu':
+            print(f"{self.precision} inference is CPU-only — using fp32 on {self.device}.")
+            self.precision = 'fp32'
+            return
+
+        if self.precision == 'int8':
+            if self.runtime != 'eager':
+                print("int8 quantisation applies to the eager runtime only — using fp32.")
+                self.precision = 'fp32'
+                return
+            self.model = quantize_dynamic_int8(self.model)
+            if self.cnn_model is not None:
+                self.cnn_model = quantize_dynamic_int8(self.cnn_model)
+            if self.mh_model is not None:
+                self.mh_model = quantize_dynamic_int8(self.mh_model)
+            if self.student_model is not None:
+                self.student_model = quantize_dynamic_int8(self.student_model)
+            print("✓ Dynamic int8 quantisation applied (LSTM/GRU/Linear)")
+        elif self.precision == 'bf16':
+            if not cpu_supports_bf16():
+                print("CPU lacks native bf16 support — using fp32.")
+                self.precision = 'fp32'
+                return
+            print("✓ bf16 autocast enabled")
+        else:
+            print(f"Unknown precision '{self.precision}' — using fp32.")
+            self.precision = 'fp32'
+
+    def _forward(self, model, X_tensor):
+        """Run `model` under the configured precision; always returns a float32 array."""
+        if self.precision == 'bf16':
+            ctx = torch.autocast('cpu', dtype=torch.bfloat16)
+        else:
+            ctx = contextlib.nullcontext()
+        with ctx:
+            out = model(X_tensor)
+        return out.float().cpu().numpy()
+
+
+    # ── Warm-up ─────────────────────────────────────────────────────────────────
+
+    def set_threads(self, n=None):
+        """Re-pin PyTorch and the ensemble's XGBoost to `n` threads (default INFERENCE_THREADS)."""
+        configure_threads(intra_op=n)
+        set_threads(self.xgb_model, n)
+
+    def warm_up(self, runs=3):
+        """
+        Push synthetic sequences through every loaded branch (LSTM, XGBoost,
+        CNN1D, meta-learner, student) so first-call allocations and kernel selection
+        happen at startup instead of on the first user request.
+        """
+        sequence = np.zeros((self.sequence_length, len(self.feature_cols)), dtype=np.float32)
+
+        with torch.no_grad():
+            for _ in range(runs):
+                X_tensor = torch.FloatTensor(sequence).unsqueeze(0).to(self.device)
+                lstm_raw = float(self._forward(self.model, X_tensor)[0, 0])
+
+                if self.meta_learner is not None:
+                    xgb_prob  = float(self.xgb_model.predict_proba(sequence[-1:, :])[0, 1])
+                    cnn_logit = float(self._forward(self.cnn_model, X_tensor)[0, 0])
+                    self.meta_learner.predict(np.array([[lstm_raw, xgb_prob, cnn_logit]]))
+
+                if self.mh_model is not None:
+                    self._forward(self.mh_model, X_tensor[:, -self.mh_seq_len:])
+
+                if self.student_model is not None:
+                    self._forward(self.student_model, X_tensor)
+
+
     # ── Live price fetch ────────────────────────────────────────────────────────
 
     def _fetch_live_price(self, symbol):
         """
-        Fetch today's actual NSE price via yfinance.
+        Fetch today's actual NSE price via the quote provider (yfinance by default).
         Returns float price, or None if unavailable / NaN.
         """
         try:
-            import yfinance as yf
-            ticker = yf.Ticker(f"{symbol}.NS")
-            hist   = ticker.history(period="2d")
+            hist = get_quote_provider().download(f"{symbol}.NS", period="2d", progress=False, auto_adjust=False)
 
             if hist is None or hist.empty:
                 print(f"Live price unavailable for {symbol} (empty response) — using DB price.")
                 return None
 
-            raw_price = hist['Close'].iloc[-1]
+            close     = hist['Close']
+            raw_price = (close.iloc[:, 0] if isinstance(close, pd.DataFrame) else close).iloc[-1]
 
             # ── FIX 1: explicit NaN check — float(NaN) is not None ────────────
             if pd.isna(raw_price) or np.isnan(float(raw_price)):
@@ -129,6 +319,36 @@ class PredictionService:
             return None
 
 
+    def _fetch_live_prices(self, symbols):
+        """
+        Batched _fetch_live_price: one provider download for all symbols.
+        Returns {symbol: price}; symbols without a usable price are omitted.
+        """
+        try:
+            tickers = [f"{s}.NS" for s in symbols]
+            hist    = get_quote_provider().download(tickers, period="2d", progress=False, auto_adjust=False)
+            if hist is None or hist.empty:
+                print(f"Live prices unavailable for {len(symbols)} symbols — using DB prices.")
+                return {}
+
+            close = hist['Close']
+            if isinstance(close, pd.Series):
+                close = close.to_frame(name=tickers[0])
+            last = close.iloc[-1]
+
+            prices = {}
+            for symbol, ticker in zip(symbols, tickers):
+                raw = last.get(ticker)
+                if raw is not None and not pd.isna(raw) and float(raw) > 0:
+                    prices[symbol] = float(raw)
+            print(f"✓ Live prices fetched for {len(prices)}/{len(symbols)} symbols")
+            return prices
+
+        except Exception as e:
+            print(f"Batched live price fetch failed: {e} — using DB prices.")
+            return {}
+
+
     # ── Business day helper ─────────────────────────────────────────────────────
 
     def _get_next_business_days(self, start_date, n):
@@ -146,104 +366,285 @@ class PredictionService:
 
     # ── Core prediction ─────────────────────────────────────────────────────────
 
-    def predict(self, symbol, days_ahead=5):
+    def predict(self, symbol, days_ahead=5, method=None):
         if days_ahead < 1 or days_ahead > 365:
             return None
 
+        method    = self._resolve_method(days_ahead, method, route='predict')
+        cache_key = (self.version, symbol, days_ahead, method, datetime.now().date())
+        cached    = _prediction_cache.get(cache_key)
+        if cached is not None:
+            cache_requests.inc('predict', 'hit')
+            return dict(cached)
+
+        cache_requests.inc('predict', 'miss')
+        with span(f'predict.total.{method}'):
+            result = self._predict_uncached(symbol, days_ahead, method)
+        if result is not None:
+            _cache_forecast(cache_key, result)
+            return dict(result)
+        return None
+
+    def predict_batch(self, symbols, days_ahead=5, method=None):
+        """
+        predict() for many symbols at once. Cached forecasts are reused; for the
+        rest, history comes from one DB query, live prices from one provider
+        call, and inference is a single (B, seq, F) forward pass per step.
+        Returns {symbol: result or None}.
+        """
+        if days_ahead < 1 or days_ahead > 365:
+            return {s: None for s in symbols}
+
+        method  = self._resolve_method(days_ahead, method, route='batch')
+        today   = datetime.now().date()
+        results = {}
+        pending = []
+        for symbol in symbols:
+            cached = _prediction_cache.get((self.version, symbol, days_ahead, method, today))
+            cache_requests.inc('predict', 'miss' if cached is None else 'hit')
+            if cached is not None:
+                results[symbol] = dict(cached)
+            else:
+                pending.append(symbol)
+        if not pending:
+            return results
+
+        with span('predict.live_price'):
+            live = self._fetch_live_prices(pending)
         try:
-            df = self.data_loader.load_stock_data(symbol)
-            if df is None or len(df) < self.sequence_length + 10:
-                return None
-
-            df['target_return'] = df['close_price'].pct_change().shift(-1)
-            df = df.dropna()
-
-            if len(df) < self.sequence_length + 10:
-                return None
-
-            context_window  = max(self.sequence_length * 3, 120)
-            recent_df       = df.tail(context_window).copy()
-            scaler          = StandardScaler()
-            scaled_features = scaler.fit_transform(recent_df[self.feature_cols].values)
+            frames = self.data_loader.load_many(pending)
+        except Exception as e:
+            print(f"Batch load error: {e}")
+            return {**results, **{s: None for s in pending}}
+        prepared = {}
+        for symbol in pending:
+            try:
+                prepared[symbol] = self._prepare_frame(symbol, frames.get(symbol),
+                                                       live_price=live.get(symbol), fetch_live=False)
+            except Exception as e:
+                print(f"Prediction error for {symbol}: {e}")
+                prepared[symbol] = None
+            if prepared[symbol] is None:
+                results[symbol] = None
+                del prepared[symbol]
+        if not prepared:
+            return results
+
+        batch      = list(prepared.values())
+        features   = [p['scaled_features'] for p in batch]
+        prices     = [p['current_price'] for p in batch]
+        pred_dates = self._get_next_business_days(today, days_ahead)
+        try:
+            if method == 'direct':
+                paths = self._direct_paths(features, prices, pred_dates)
+            else:
+                steps = list(self._iter_autoregressive_batch(list(prepared), features, prices, pred_dates,
+                                                             model=self._step_model(method)))
+                paths = [[step[b] for step in steps] for b in range(len(batch))]
+        except Exception as e:
+            print(f"Batch prediction error: {e}")
+            import traceback
+            traceback.print_exc()
+            return {**results, **{s: None for s in prepared}}
 
-            # ── FIX 2: drop any NaN that survived feature engineering ─────────
-            if np.any(np.isnan(scaled_features)):
-                scaled_features = np.nan_to_num(scaled_features, nan=0.0)
+        for (symbol, p), predictions in zip(prepared.items(), paths):
+            last_date = p['last_date']
+            result    = {
+                'symbol':        symbol,
+                'model_version': self.version,
+                'method':        method,
+                'current_price': round(p['current_price'], 2),
+                'current_date':  today.strftime('%Y-%m-%d'),
+                'data_as_of':    last_date.strftime('%Y-%m-%d') if hasattr(last_date, 'strftime') else str(last_date),
+                'price_source':  p['price_source'],
+                'predictions':   predictions
+            }
+            _cache_forecast((self.version, symbol, days_ahead, method, today), result)
+            results[symbol] = dict(result)
+        return results
 
-            db_price  = float(df['close_price'].iloc[-1])
-            last_date = df['trade_date'].iloc[-1]
+    def iter_predict(self, symbol, days_ahead=5, method=None, chunk_size=10, cancel_event=None):
+        """
+        Streaming variant of predict(). Yields ('meta', {...}) once, then
+        ('chunk', [predictions...]) every `chunk_size` steps, then ('done', {...}).
+        Setting `cancel_event` stops the loop before the next step, releasing
+        the worker thread. A completed stream is cached like predict().
+        """
+        if days_ahead < 1 or days_ahead > 365:
+            yield 'error', {'detail': 'days_ahead must be between 1 and 365'}
+            return
 
-            live_price    = self._fetch_live_price(symbol)
-            current_price = live_price if live_price is not None else db_price
-            price_source  = "live" if live_price is not None else (
-                f"db ({last_date.strftime('%Y-%m-%d') if hasattr(last_date, 'strftime') else last_date})"
-            )
+        method    = self._resolve_method(days_ahead, method, route='stream')
+        cache_key = (self.version, symbol, days_ahead, method, datetime.now().date())
+        cached    = _prediction_cache.get(cache_key)
+        if cached is not None:
+            meta = {k: v for k, v in cached.items() if k != 'predictions'}
+            yield 'meta', meta
+            for i in range(0, len(cached['predictions']), chunk_size):
+                yield 'chunk', cached['predictions'][i:i + chunk_size]
+            yield 'done', {'count': len(cached['predictions']), 'cached': True}
+            return
 
-            today      = datetime.now().date()
-            pred_dates = self._get_next_business_days(today, days_ahead)
+        # Headers are already sent by the time this runs — failures must
+        # become an 'error' event, not an exception that truncates the stream
+        try:
+            prepared = self._prepare(symbol)
+        except Exception as e:
+            print(f"Prediction error for {symbol}: {e}")
+            yield 'error', {'detail': f"Prediction failed for {symbol}"}
+            return
+        if prepared is None:
+            yield 'error', {'detail': f"Insufficient data for {symbol}"}
+            return
 
-            predictions = []
-            last_price  = current_price
-            sequence    = scaled_features[-self.sequence_length:].copy()
+        current_price = prepared['current_price']
+        last_date     = prepared['last_date']
+        today         = datetime.now().date()
+        pred_dates    = self._get_next_business_days(today, days_ahead)
+        meta = {
+            'symbol':        symbol,
+            'model_version': self.version,
+            'method':        method,
+            'current_price': round(current_price, 2),
+            'current_date':  today.strftime('%Y-%m-%d'),
+            'data_as_of':    last_date.strftime('%Y-%m-%d') if hasattr(last_date, 'strftime') else str(last_date),
+            'price_source':  prepared['price_source'],
+        }
+        yield 'meta', meta
+
+        predictions, chunk, steps = [], [], None
+        try:
+            if method == 'direct':
+                steps = iter(self._direct_path(prepared['scaled_features'], current_price, pred_dates))
+            else:
+                steps = self._iter_autoregressive(symbol, prepared['scaled_features'], current_price, pred_dates,
+                                                  model=self._step_model(method))
+            for step in steps:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                chunk.append(step)
+                if len(chunk) >= chunk_size:
+                    predictions.extend(chunk)
+                    yield 'chunk', chunk
+                    chunk = []
+        except Exception as e:
+            print(f"Prediction error for {symbol}: {e}")
+            yield 'error', {'detail': f"Prediction failed for {symbol}"}
+            return
+        finally:
+            if hasattr(steps, 'close'):
+                steps.close()
 
-            with torch.no_grad():
-                for i in range(days_ahead):
-                    X_tensor = torch.FloatTensor(sequence).unsqueeze(0).to(self.device)
+        if chunk:
+            predictions.extend(chunk)
+            yield 'chunk', chunk
+        _cache_forecast(cache_key, {**meta, 'predictions': predictions})
+        yield 'done', {'count': len(predictions), 'cached': False}
 
-                    lstm_raw = float(self.model(X_tensor).cpu().numpy()[0, 0])
+    def cached_etag(self, symbol, days_ahead=5, method=None):
+        """
+        ETag of the forecast predict() would return from its cache right now,
+        or None on a miss — lets a conditional GET answer 304 without
+        computing anything.
+        """
+        method = self._resolve_method(days_ahead, method, route='predict')
+        return _prediction_cache.get_tag((self.version, symbol, days_ahead, method, datetime.now().date()))
 
-                    if self.meta_learner is not None:
-                        try:
-                            xgb_input = sequence[-1:, :]
+    def _resolve_method(self, days_ahead, method=None, route=None):
+        """
+        'direct' = one pass of the multi-horizon head, 'autoregressive' = the
+        step-by-step LSTM + ensemble loop, 'student' = the same loop with the
+        distilled student in place of the LSTM. By default long horizons go
+        direct when the multi-horizon model is available, and routes listed in
+        STUDENT_ROUTES use the student for the rest.
+        """
+        if method == 'student':
+            return 'student' if self.student_model is not None else 'autoregressive'
+        if self.mh_model is not None:
+            if method in ('direct', 'autoregressive'):
+                return method
+            if method is None and days_ahead >= DIRECT_MIN_DAYS:
+                return 'direct'
+        if method is None and route in STUDENT_ROUTES and self.student_model is not None:
+            return 'student'
+        return 'autoregressive'
+
+    def _step_model(self, method):
+        """The per-step return model of the autoregressive loop for `method`."""
+        return self.student_model if method == 'student' else self.model
+
+    def _prepare(self, symbol, live_price=None, fetch_live=True):
+        """
+        Load + scale the recent feature window and resolve the starting price.
+        Batch callers pass an already-fetched `live_price` with fetch_live=False.
+        """
+        return self._prepare_frame(symbol, self.data_loader.load_stock_data(symbol), live_price, fetch_live)
 
-                            # ── FIX 3: sanitize each ensemble input ───────────
-                            if np.any(np.isnan(xgb_input)):
-                                xgb_input = np.nan_to_num(xgb_input, nan=0.0)
+    def _prepare_frame(self, symbol, df, live_price=None, fetch_live=True):
+        """_prepare on an already-loaded frame (predict_batch loads every symbol in one query)."""
+        if df is None or len(df) < self.sequence_length + 10:
+            return None
 
-                            xgb_prob  = float(self.xgb_model.predict_proba(xgb_input)[0, 1])
-                            cnn_logit = float(self.cnn_model(X_tensor).cpu().numpy()[0, 0])
+        df['target_return'] = df['close_price'].pct_change().shift(-1)
+        df = df.dropna()
 
-                            # Sanitize individual values before stacking
-                            lstm_raw  = 0.0 if np.isnan(lstm_raw)  else lstm_raw
-                            xgb_prob  = 0.5 if np.isnan(xgb_prob)  else xgb_prob
-                            cnn_logit = 0.0 if np.isnan(cnn_logit) else cnn_logit
+        if len(df) < self.sequence_length + 10:
+            return None
 
-                            meta_input = np.array([[lstm_raw, xgb_prob, cnn_logit]])
+        context_window  = max(self.sequence_length * 3, 120)
+        recent_df       = df.tail(context_window).copy()
+        with span('predict.scale'):
+            scaler          = StandardScaler()
+            scaled_features = scaler.fit_transform(recent_df[self.feature_cols].values)
 
-                            # ── FIX 4: final NaN guard before meta_learner ────
-                            if np.any(np.isnan(meta_input)):
-                                print(f"NaN in meta_input for {symbol} step {i} — using LSTM direction.")
-                                direction = 1 if lstm_raw > 0 else -1
-                            else:
-                                direction = 1 if self.meta_learner.predict(meta_input)[0] == 1 else -1
+        # ── FIX 2: drop any NaN that survived feature engineering ─────────
+        if np.any(np.isnan(scaled_features)):
+            scaled_features = np.nan_to_num(scaled_features, nan=0.0)
 
-                        except Exception as e:
-                            print(f"Ensemble step failed for {symbol}: {e} — using LSTM direction.")
-                            direction = 1 if lstm_raw > 0 else -1
-                    else:
-                        direction = 1 if lstm_raw > 0 else -1
+        db_price  = float(df['close_price'].iloc[-1])
+        last_date = df['trade_date'].iloc[-1]
 
-                    pred_return     = direction * abs(lstm_raw)
-                    predicted_price = last_price * (1 + pred_return)
+        if fetch_live:
+            with span('predict.live_price'):
+                live_price = self._fetch_live_price(symbol)
+        current_price = live_price if live_price is not None else db_price
+        price_source  = "live" if live_price is not None else (
+            f"db ({last_date.strftime('%Y-%m-%d') if hasattr(last_date, 'strftime') else last_date})"
+        )
+        return {
+            'scaled_features': scaled_features,
+            'current_price':   current_price,
+            'last_date':       last_date,
+            'price_source':    price_source,
+        }
+
+    def _predict_uncached(self, symbol, days_ahead, method='autoregressive'):
+        try:
+            prepared = self._prepare(symbol)
+            if prepared is None:
+                return None
 
-                    predictions.append({
-                        'date':             pred_dates[i].strftime('%Y-%m-%d'),
-                        'predicted_price':  round(float(predicted_price), 2),
-                        'predicted_return': round(float(pred_return * 100), 2)
-                    })
+            current_price = prepared['current_price']
+            last_date     = prepared['last_date']
+            today         = datetime.now().date()
+            pred_dates    = self._get_next_business_days(today, days_ahead)
 
-                    last_price   = predicted_price
-                    new_row      = sequence[-1].copy()
-                    price_change = (predicted_price - current_price) / (current_price + 1e-8)
-                    new_row[0]   = price_change
-                    sequence     = np.vstack([sequence[1:], new_row.reshape(1, -1)])
+            if method == 'direct':
+                predictions = self._direct_path(prepared['scaled_features'], current_price, pred_dates)
+            else:
+                predictions = list(self._iter_autoregressive(
+                    symbol, prepared['scaled_features'], current_price, pred_dates,
+                    model=self._step_model(method)
+                ))
 
             return {
                 'symbol':        symbol,
+                'model_version': self.version,
+                'method':        method,
                 'current_price': round(current_price, 2),
                 'current_date':  today.strftime('%Y-%m-%d'),
                 'data_as_of':    last_date.strftime('%Y-%m-%d') if hasattr(last_date, 'strftime') else str(last_date),
-                'price_source':  price_source,
+                'price_source':  prepared['price_source'],
                 'predictions':   predictions
             }
 
@@ -253,13 +654,142 @@ class PredictionService:
             traceback.print_exc()
             return None
 
+    def _iter_autoregressive(self, symbol, scaled_features, current_price, pred_dates, model=None):
+        """Yield one prediction dict per business day, feeding each step back into the window."""
+        for step in self._iter_autoregressive_batch([symbol], [scaled_features], [current_price], pred_dates,
+                                                    model=model):
+            yield step[0]
+
+    def _iter_autoregressive_batch(self, symbols, scaled_features, current_prices, pred_dates, model=None):
+        """
+        The autoregressive loop for B symbols at once — each step is one
+        (B, seq, F) forward per model. Yields a list of B prediction dicts
+        per business day. `model` replaces the LSTM as the return model
+        (the distilled student); XGBoost / CNN1D / meta-learner are unchanged.
+        """
+        if model is None or model is self.model:
+            model, stage = self.model, 'predict.lstm'
+        else:
+            stage = 'predict.student'
+        current    = np.asarray(current_prices, dtype=np.float64)
+        last_price = current.copy()
+        sequences  = np.stack([f[-self.sequence_length:] for f in scaled_features]).astype(np.float64)
+
+        with torch.no_grad():
+            for i in range(len(pred_dates)):
+                X_tensor = torch.from_numpy(sequences.astype(np.float32)).to(self.device)
+
+                with span(stage):
+                    lstm_raw = self._forward(model, X_tensor)[:, 0].astype(np.float64)
+
+                if self.meta_learner is not None:
+                    try:
+                        # ── FIX 3: sanitize each ensemble input ───────────
+                        xgb_input = np.nan_to_num(sequences[:, -1, :], nan=0.0)
+
+                        with span('predict.xgb'):
+                            xgb_prob  = self.xgb_model.predict_proba(xgb_input)[:, 1]
+                        with span('predict.cnn'):
+                            cnn_logit = self._forward(self.cnn_model, X_tensor)[:, 0]
+
+                        # Sanitize individual values before stacking
+                        lstm_raw  = np.nan_to_num(lstm_raw,  nan=0.0)
+                        xgb_prob  = np.nan_to_num(xgb_prob,  nan=0.5)
+                        cnn_logit = np.nan_to_num(cnn_logit, nan=0.0)
+
+                        meta_input = np.column_stack([lstm_raw, xgb_prob, cnn_logit])
+                        with span('predict.meta'):
+                            direction = np.where(self.meta_learner.predict(meta_input) == 1, 1, -1)
+
+                    except Exception as e:
+                        print(f"Ensemble step failed for {', '.join(symbols)}: {e} — using LSTM direction.")
+                        direction = np.where(lstm_raw > 0, 1, -1)
+                else:
+                    direction = np.where(lstm_raw > 0, 1, -1)
+
+                pred_return     = direction * np.abs(lstm_raw)
+                predicted_price = last_price * (1 + pred_return)
+
+                day = pred_dates[i].strftime('%Y-%m-%d')
+                yield [
+                    {
+                        'date':             day,
+                        'predicted_price':  round(float(p), 2),
+                        'predicted_return': round(float(r * 100), 2)
+                    }
+                    for p, r in zip(predicted_price, pred_return)
+                ]
+
+                last_price      = predicted_price
+                new_rows        = sequences[:, -1].copy()
+                new_rows[:, 0]  = (predicted_price - current) / (current + 1e-8)
+                sequences       = np.concatenate([sequences[:, 1:], new_rows[:, None, :]], axis=1)
+
+    def _direct_path(self, scaled_features, current_price, pred_dates):
+        """One multi-horizon forward pass, interpolated into a daily price path."""
+        return self._direct_paths([scaled_features], [current_price], pred_dates)[0]
+
+    def _direct_paths(self, scaled_features, current_prices, pred_dates):
+        """_direct_path for B symbols with a single (B, seq, F) forward pass."""
+        sequences = np.stack([f[-self.mh_seq_len:] for f in scaled_features]).astype(np.float32)
+        X_tensor  = torch.from_numpy(sequences).to(self.device)
+        with span('predict.direct_head'), torch.no_grad():
+            cum_log = self._forward(self.mh_model, X_tensor) * self.mh_scale
+
+        days  = [d.strftime('%Y-%m-%d') for d in pred_dates]
+        paths = []
+        for current_price, row in zip(current_prices, cum_log):
+            path   = interpolate_path(self.horizons, row, len(pred_dates))
+            prices = current_price * np.exp(path)
+            prev   = np.concatenate([[current_price], prices[:-1]])
+            daily  = prices / prev - 1
+            paths.append([
+                {
+                    'date':             d,
+                    'predicted_price':  round(float(p), 2),
+                    'predicted_return': round(float(r * 100), 2)
+                }
+                for d, p, r in zip(days, prices, daily)
+            ])
+        return paths
+
 
 # ── Singleton ───────────────────────────────────────────────────────────────────
 
-_predictor = None
+_registry       = ModelRegistry()
+_predictor      = None
+_predictor_lock = threading.Lock()
 
 def get_predictor():
     global _predictor
     if _predictor is None:
-        _predictor = PredictionService()
-    return _predictor
\ No newline at end of file
+        # Double-checked so concurrent first requests build a single instance
+        with _predictor_lock:
+            if _predictor is None:
+                version, model_dir = _registry.resolve()
+                _predictor = PredictionService(model_dir=model_dir, version=version)
+    return _predictor
+
+
+def build_predictor(version=None):
+    """Load + warm `version` (default: the registry's CURRENT) without touching the live instance."""
+    version, model_dir = _registry.resolve(version)
+    predictor = PredictionService(model_dir=model_dir, version=version)
+    predictor.warm_up()
+    return predictor
+
+
+def install_predictor(predictor):
+    """Swap the singleton. Requests already holding the old instance finish on it."""
+    global _predictor
+    with _predictor_lock:
+        _predictor = predictor
+    return predictor.version
+
+
+def reload_predictor(version=None):
+    """
+    Load + warm `version` next to the live instance, then swap the singleton.
+    Nothing is dropped while the new instance loads.
+    """
+    return install_predictor(build_predictor(version))
\ No newline at end of file
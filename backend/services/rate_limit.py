@@ -0,0 +1,72 @@
+# backend/services/rate_limit.py
+#
+# In-process token-bucket admission control, keyed by client IP / account.
+# Each bucket holds `burst` tokens and refills at `rate_per_minute`; a request
+# that finds it empty is rejected with 429 and a Retry-After hint.
+#
+# Per process — with several workers each enforces its own share.
+
+import os
+import math
+import time
+import threading
+
+from fastapi import HTTPException
+
+
+class RateLimiter:
+
+    def __init__(self, rate_per_minute, burst=None, max_keys=50000):
+        self.rate     = rate_per_minute / 60.0
+        self.burst    = float(burst if burst is not None else rate_per_minute)
+        self.max_keys = max_keys
+        self._buckets = {}           # key → (tokens, last_refill)
+        self._lock    = threading.Lock()
+
+    def acquire(self, key):
+        """Take one token for `key`. Returns 0 if admitted, else seconds until a token is free."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > self.max_keys:
+                    self._evict_full(now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def check(self, key, detail="Too many requests"):
+        """acquire() or raise 429."""
+        wait = self.acquire(key)
+        if wait > 0:
+            raise HTTPException(
+                status_code=429, detail=detail,
+                headers={'Retry-After': str(math.ceil(wait))}
+            )
+
+    def _evict_full(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full = [k for k, (t, last) in self._buckets.items()
+                if t + (now - last) * self.rate >= self.burst]
+        for k in full:
+            del self._buckets[k]
+
+
+# Only honour X-Forwarded-For behind a trusted reverse proxy — clients can forge it.
+# Each proxy appends the address it received the request from, so with N
+# trusted proxies in front of the app the client is the N-th hop from the
+# right; anything to its left was sent by the client.
+TRUST_PROXY_HEADERS = os.environ.get('TRUST_PROXY_HEADERS', '0') == '1'
+TRUSTED_PROXY_HOPS  = max(1, int(os.environ.get('TRUSTED_PROXY_HOPS', 1)))
+
+
+def client_ip(request):
+    """Address the outermost trusted proxy saw (X-Forwarded-For) when behind one, else the socket peer."""
+    forwarded = request.headers.get('x-forwarded-for') if TRUST_PROXY_HEADERS else None
+    if forwarded:
+        hops = [h.strip() for h in forwarded.split(',') if h.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else 'unknown'
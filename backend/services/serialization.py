@@ -0,0 +1,91 @@
+# backend/services/serialization.py
+#
+# Response encodings for array-shaped payloads (historical prices).
+#
+#   rows      — [{trade_date, open_price, ...}, ...]   (original shape)
+#   columnar  — {"trade_date": [...], "close_price": [...], ...}
+#   msgpack   — columnar, packed with msgpack                (optional dep)
+#   arrow     — Arrow IPC stream, one record batch             (optional dep)
+#
+# JSON goes through orjson when it is installed; the stdlib is the fallback.
+
+import json
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+FORMATS = ('rows', 'columnar', 'msgpack', 'arrow')
+
+MEDIA_TYPES = {
+    'rows':     'application/json',
+    'columnar': 'application/json',
+    'msgpack':  'application/msgpack',
+    'arrow':    'application/vnd.apache.arrow.stream',
+}
+
+
+def _plain(arr):
+    """NumPy array → list of JSON-native values (dates as ISO strings, NaN as null)."""
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return np.datetime_as_string(arr, unit='D').tolist()
+    if np.issubdtype(arr.dtype, np.floating) and np.isnan(arr).any():
+        return [None if v != v else v for v in arr.tolist()]
+    return arr.tolist()
+
+
+def to_columnar(arrays):
+    return {k: _plain(v) for k, v in arrays.items()}
+
+
+def to_rows(arrays):
+    cols = to_columnar(arrays)
+    keys = list(cols)
+    return [dict(zip(keys, vals)) for vals in zip(*cols.values())]
+
+
+def dumps_json(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def _arrow_bytes(arrays):
+    table = pa.table({k: pa.array(v) for k, v in arrays.items()})
+    sink  = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def render(arrays, fmt='rows', headers=None):
+    """Encode a dict of equal-length arrays as a Response in `fmt`."""
+    if fmt == 'msgpack' and msgpack is None:
+        raise HTTPException(status_code=406, detail="msgpack is not installed on the server")
+    if fmt == 'arrow' and pa is None:
+        raise HTTPException(status_code=406, detail="pyarrow is not installed on the server")
+
+    if fmt == 'rows':
+        body = dumps_json(to_rows(arrays))
+    elif fmt == 'columnar':
+        body = dumps_json(to_columnar(arrays))
+    elif fmt == 'msgpack':
+        body = msgpack.packb(to_columnar(arrays))
+    else:
+        body = _arrow_bytes(arrays)
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
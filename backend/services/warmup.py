@@ -0,0 +1,150 @@
+# backend/services/warmup.py
+
+import os
+import time
+import threading
+
+from models.registry import ModelRegistry
+from backend.services.prediction_service import get_predictor, build_predictor, install_predictor
+from backend.services.ensemble_service import (
+    get_ensemble_predictor, build_ensemble_predictor, install_ensemble_predictor
+)
+
+
+# Models loaded at startup. Only 'lstm' gates readiness — the XGBoost/LightGBM
+# signal service is optional and its endpoints already degrade on their own.
+_MODELS = {
+    'lstm':     get_predictor,
+    'ensemble': get_ensemble_predictor,
+}
+# Reloads build every new instance first and only then swap them all in
+_BUILDERS = {
+    'lstm':     build_predictor,
+    'ensemble': build_ensemble_predictor,
+}
+_INSTALLERS = {
+    'lstm':     install_predictor,
+    'ensemble': install_ensemble_predictor,
+}
+# Files a version must hold for each service to load from it
+_ARTEFACTS = {
+    'lstm':     ('returns_model.pth', 'returns_feature_cols.pkl'),
+    'ensemble': ('ensemble_xgb.pkl', 'ensemble_lgbm.pkl', 'ensemble_scaler.pkl',
+                 'ensemble_feature_cols.pkl', 'ensemble_weights.pkl'),
+}
+_REQUIRED = ('lstm',)
+
+_status      = {
+    name: {'state': 'pending', 'error': None, 'load_seconds': None, 'version': None}
+    for name in _MODELS
+}
+_status_lock = threading.Lock()
+_reload_lock = threading.Lock()
+
+
+def _set_status(name, **fields):
+    with _status_lock:
+        _status[name].update(fields)
+
+
+def warm_up_models():
+    """
+    Load every model singleton once and run synthetic inferences through it.
+    Blocking — call from a worker thread, not the event loop.
+    """
+    for name, factory in _MODELS.items():
+        _set_status(name, state='loading')
+        start = time.perf_counter()
+        try:
+            predictor = factory()
+            predictor.warm_up()
+            _set_status(
+                name, state='ready', version=predictor.version,
+                load_seconds=round(time.perf_counter() - start, 3)
+            )
+            print(f"✓ Warm-up {name}: {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            _set_status(name, state='failed', error=str(e))
+            print(f"Warm-up {name} failed: {e}")
+
+
+def set_threads(n):
+    """Re-pin the inference threads of every loaded model (serve.py workers, after the fork)."""
+    status = get_status()
+    for name, factory in _MODELS.items():
+        if status[name]['state'] == 'ready':
+            factory().set_threads(n)
+
+
+def reload_models(version=None):
+    """
+    Hot-swap the model services to `version` (default: the registry's
+    CURRENT), all together or not at all. A version missing the artefacts of
+    a service that is serving now — or of a required one — is refused, and
+    any load failure leaves every service on its old instance. Services that
+    are not serving and have no artefacts in the version are left as they are.
+    Returns the version swapped in, or None.
+    """
+    with _reload_lock:
+        try:
+            version, model_dir = ModelRegistry().resolve(version)
+        except (FileNotFoundError, ValueError) as e:
+            _fail_reload(f"reload failed: {e}")
+            return None
+
+        status  = get_status()
+        targets = []
+        missing = {}
+        for name, files in _ARTEFACTS.items():
+            absent = [f for f in files if not os.path.exists(os.path.join(model_dir, f))]
+            if not absent:
+                targets.append(name)
+            elif name in _REQUIRED or status[name]['state'] == 'ready':
+                missing[name] = absent
+        if missing:
+            _fail_reload(f"reload to {version} refused: missing {missing}")
+            return None
+
+        built = {}
+        for name in targets:
+            start = time.perf_counter()
+            try:
+                built[name] = (_BUILDERS[name](version), round(time.perf_counter() - start, 3))
+            except Exception as e:
+                _fail_reload(f"reload to {version} failed loading {name}: {e}")
+                return None
+
+        for name, (instance, seconds) in built.items():
+            _INSTALLERS[name](instance)
+            _set_status(name, state='ready', version=version, error=None, load_seconds=seconds)
+        print(f"✓ Reloaded {', '.join(built)} → {version}")
+        return version
+
+
+def _fail_reload(error):
+    for name in _MODELS:
+        _set_status(name, error=error)
+    print(f"{error} — keeping current versions")
+
+
+def watch_registry(stop_event, interval=30.0, registry=None):
+    """Poll the registry's CURRENT pointer and hot-reload whenever it moves."""
+    registry = registry or ModelRegistry()
+    seen     = registry.current_version()
+    while not stop_event.wait(interval):
+        current = registry.current_version()
+        if current and current != seen:
+            reload_models(current)
+            seen = current
+
+
+def get_status():
+    with _status_lock:
+        return {name: dict(fields) for name, fields in _status.items()}
+
+
+def is_ready(name=None):
+    """True once the named model (or every required model) is loaded and warm."""
+    names = (name,) if name else _REQUIRED
+    with _status_lock:
+        return all(_status[n]['state'] == 'ready' for n in names)
@@ -0,0 +1,100 @@
+# backtest/aggregators.py
+#
+# Streaming directional metrics. Each bucket keeps four confusion counts and
+# a signed-return sum, so a backtest over the whole universe never holds
+# per-prediction lists: workers update buckets with whole fold arrays, the
+# parent merges the buckets as results arrive.
+#
+#   book = MetricBook()
+#   book.update(('RELIANCE', 0, 5), y_up, pred_up, fwd_return)
+#   book.merge(other_book)
+#   book.rows(('symbol', 'fold', 'horizon'))     # → list of dicts
+
+import numpy as np
+
+
+class DirectionalStats:
+    """Confusion counts (UP = positive class) plus the mean return of trading the signal."""
+
+    __slots__ = ('tp', 'fp', 'tn', 'fn', 'signal_return')
+
+    def __init__(self):
+        self.tp = self.fp = self.tn = self.fn = 0
+        self.signal_return = 0.0
+
+    def update(self, y_up, pred_up, fwd_return=None):
+        y_up, pred_up = np.asarray(y_up, dtype=bool), np.asarray(pred_up, dtype=bool)
+        self.tp += int(np.count_nonzero(y_up & pred_up))
+        self.fp += int(np.count_nonzero(~y_up & pred_up))
+        self.tn += int(np.count_nonzero(~y_up & ~pred_up))
+        self.fn += int(np.count_nonzero(y_up & ~pred_up))
+        if fwd_return is not None:
+            # Long on UP, short on DOWN: sign(pred) × realised return
+            self.signal_return += float(np.sum(np.where(pred_up, fwd_return, -np.asarray(fwd_return))))
+        return self
+
+    def merge(self, other):
+        self.tp += other.tp
+        self.fp += other.fp
+        self.tn += other.tn
+        self.fn += other.fn
+        self.signal_return += other.signal_return
+        return self
+
+    @property
+    def n(self):
+        return self.tp + self.fp + self.tn + self.fn
+
+    def metrics(self):
+        """Same definitions as evaluate_test.directional_metrics (all in %), plus counts."""
+        n    = self.n
+        prec = self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+        rec  = self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+        return {
+            'samples':          n,
+            'acc':              (self.tp + self.tn) / n * 100 if n else 0.0,
+            'up_acc':           rec * 100,
+            'down_acc':         self.tn / (self.tn + self.fp) * 100 if self.tn + self.fp else 0.0,
+            'precision':        prec * 100,
+            'recall':           rec * 100,
+            'f1':               2 * prec * rec / (prec + rec) * 100 if prec + rec else 0.0,
+            'pred_up_pct':      (self.tp + self.fp) / n * 100 if n else 0.0,
+            'mean_signal_bps':  self.signal_return / n * 1e4 if n else 0.0,
+            'tp': self.tp, 'fp': self.fp, 'tn': self.tn, 'fn': self.fn,
+        }
+
+    def to_dict(self):
+        return {'tp': self.tp, 'fp': self.fp, 'tn': self.tn, 'fn': self.fn,
+                'signal_return': self.signal_return}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        stats.tp, stats.fp, stats.tn, stats.fn = d['tp'], d['fp'], d['tn'], d['fn']
+        stats.signal_return = d['signal_return']
+        return stats
+
+
+class MetricBook:
+    """DirectionalStats keyed by any hashable (symbol, fold, horizon, ...) tuple."""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def update(self, key, y_up, pred_up, fwd_return=None):
+        self.buckets.setdefault(key, DirectionalStats()).update(y_up, pred_up, fwd_return)
+
+    def merge(self, other):
+        for key, stats in other.buckets.items():
+            self.buckets.setdefault(key, DirectionalStats()).merge(stats)
+        return self
+
+    def rollup(self, index):
+        """A new book keyed by key[index] (e.g. horizon only), summing the rest."""
+        book = MetricBook()
+        for key, stats in self.buckets.items():
+            book.buckets.setdefault(tuple(key[i] for i in index), DirectionalStats()).merge(stats)
+        return book
+
+    def rows(self, names):
+        return [{**dict(zip(names, key)), **stats.metrics()} for key, stats in self.buckets.items()]
@@ -0,0 +1,394 @@
+# backtest/simulator.py
+#
+# What the ensemble signals are worth as trades. A (dates × symbols) matrix
+# of P(UP) and one of prices go in; positions, transaction costs, the
+# equity curve, drawdowns and turnover come out, all as NumPy array
+# operations — one threshold pair or a whole sweep of them at once.
+#
+#   python backtest/simulator.py --source ensemble                  # sweep bands around 0.5
+#   python backtest/simulator.py --source meta --long-only --cost-bps 15
+#   python backtest/simulator.py --source ensemble --up 0.55 --down 0.45   # one run + equity curve
+#   python backtest/simulator.py --grid full --min 0.40 --max 0.70 --step 0.01
+#
+# Sources:
+#   ensemble  EnsemblePredictionService — weighted XGBoost / LightGBM P(UP)
+#             (UP ≥ 0.55, DOWN ≤ 0.45 in the service) on each stock's test
+#             split from training/train_trees.py, the rows the trees never saw
+#   meta      PredictionService's meta-learner P(UP) over LSTM / XGBoost /
+#             CNN1D, scored walk-forward (backtest/walk_forward.py folds,
+#             point-in-time scaling, out-of-sample rows by default)
+#
+# The panel is built once per source, model version and --from-frac in
+# worker processes and cached under
+# saved_models/backtests/panel-<source>-<version>-from-<frac>/; sweeps
+# then run on the memory-mapped matrices. Prices are the raw DB closes, not
+# the wavelet-denoised series the models see.
+#
+# Conventions: a signal dated t is known after the close of t; with
+# lag=1 the position is entered at the close of t+1 and earns t+1 → t+2.
+# UP is long, DOWN is short (flat with --long-only), SIDEWAYS is flat.
+# Active positions are equal-weighted to gross exposure 1, and costs are
+# cost_bps per unit of traded weight.
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from backtest import walk_forward
+from backtest.walk_forward import BACKTEST_DIR, write_report, raw_closes
+
+SOURCES          = ('ensemble', 'meta')
+PERIODS_PER_YEAR = 252
+SWEEP_CHUNK_MB   = 512        # signal matrices per sweep chunk
+
+
+# ── Signals → PnL ──────────────────────────────────────────────────────────────
+
+def signals_from_probs(prob, up, down):
+    """
+    +1 / 0 / -1 for P(UP) ≥ up, between, ≤ down. `up` / `down` may be arrays
+    of shape (K,) — the result is then (K, dates, symbols). NaN → 0.
+    """
+    up   = np.asarray(up,   dtype=np.float32)[..., None, None]
+    down = np.asarray(down, dtype=np.float32)[..., None, None]
+    prob = np.nan_to_num(prob, nan=0.5).astype(np.float32, copy=False)
+    return (prob >= up).astype(np.int8) - (prob <= down).astype(np.int8)
+
+
+def simulate(signals, prices, cost_bps=10.0, lag=1, long_only=False):
+    """
+    signals  (..., D, S) in {-1, 0, 1};  prices (D, S), NaN where not traded.
+    Returns arrays over the leading dims: weights (..., D, S), daily net and
+    gross returns, costs and turnover (..., D - 1), equity and drawdown (..., D - 1).
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    pos    = np.asarray(signals, dtype=np.float32)
+    if long_only:
+        pos = np.maximum(pos, 0)
+    if lag:
+        pos = np.concatenate([np.zeros_like(pos[..., :lag, :]), pos[..., :-lag, :]], axis=-2)
+
+    # A position can only be held over t → t+1 when both closes exist
+    tradable = np.isfinite(prices[:-1]) & np.isfinite(prices[1:])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.where(tradable, prices[1:] / prices[:-1] - 1, 0.0)
+    pos = pos[..., :-1, :] * tradable
+
+    gross   = np.abs(pos).sum(axis=-1, keepdims=True)
+    weights = pos / np.maximum(gross, 1)
+
+    # Turnover includes entering from flat on the first day
+    prev     = np.concatenate([np.zeros_like(weights[..., :1, :]), weights[..., :-1, :]], axis=-2)
+    turnover = np.abs(weights - prev).sum(axis=-1, dtype=np.float64)
+    costs    = turnover * cost_bps / 1e4
+
+    gross_ret = np.einsum('...ds,ds->...d', weights.astype(np.float64), returns)
+    net       = gross_ret - costs
+    equity    = np.cumprod(1 + net, axis=-1)
+    drawdown  = equity / np.maximum.accumulate(equity, axis=-1) - 1
+    return {
+        'weights':   weights,
+        'gross':     gross_ret,
+        'net':       net,
+        'costs':     costs,
+        'turnover':  turnover,
+        'exposure':  np.abs(weights).sum(axis=-1),
+        'equity':    equity,
+        'drawdown':  drawdown,
+    }
+
+
+def summarize(result, periods_per_year=PERIODS_PER_YEAR):
+    """Headline statistics, one value per leading index (scalars for a single run)."""
+    net    = result['net']
+    days   = net.shape[-1]
+    final  = result['equity'][..., -1]
+    mean   = net.mean(axis=-1)
+    vol    = net.std(axis=-1)
+    active = result['exposure'] > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe = np.where(vol > 0, mean / vol * np.sqrt(periods_per_year), 0.0)
+        win    = np.where(active.any(axis=-1),
+                          ((net > 0) & active).sum(axis=-1) / np.maximum(active.sum(axis=-1), 1), 0.0)
+    return {
+        'total_return':  final - 1,
+        'cagr':          np.maximum(final, 1e-12) ** (periods_per_year / max(days, 1)) - 1,
+        'ann_vol':       vol * np.sqrt(periods_per_year),
+        'sharpe':        sharpe,
+        'max_drawdown':  result['drawdown'].min(axis=-1),
+        'avg_turnover':  result['turnover'].mean(axis=-1),
+        'avg_exposure':  result['exposure'].mean(axis=-1),
+        'cost_drag':     result['costs'].sum(axis=-1),
+        'win_rate':      win,
+    }
+
+
+def threshold_grid(kind, lo, hi, step):
+    """(up, down) pairs: 'symmetric' = (u, 1 - u) for u in [max(lo, 0.5), hi]; 'full' = every down ≤ up."""
+    values = np.round(np.arange(lo, hi + step / 2, step), 6)
+    if kind == 'symmetric':
+        ups = values[values >= 0.5]
+        return np.column_stack([ups, 1 - ups])
+    up, down = np.meshgrid(values, values, indexing='ij')
+    keep = down <= up
+    return np.column_stack([up[keep], down[keep]])
+
+
+def sweep(prob, prices, pairs, cost_bps=10.0, lag=1, long_only=False):
+    """summarize(simulate(...)) for every (up, down) pair, in memory-bounded chunks. Returns rows."""
+    per_config = prob.size * 4 * 4          # signals, positions, weights, turnover temporaries (float32)
+    chunk      = max(1, int(SWEEP_CHUNK_MB * 2**20 // per_config))
+    rows = []
+    for i in range(0, len(pairs), chunk):
+        up, down = pairs[i:i + chunk, 0], pairs[i:i + chunk, 1]
+        stats    = summarize(simulate(signals_from_probs(prob, up, down), prices,
+                                      cost_bps=cost_bps, lag=lag, long_only=long_only))
+        for j in range(len(up)):
+            rows.append({'up': float(up[j]), 'down': float(down[j]),
+                         **{k: float(v[j]) for k, v in stats.items()}})
+    return rows
+
+
+# ── Panel: P(UP) and prices per (date, symbol) ─────────────────────────────────
+
+_source = None
+_models = None
+
+
+def _init_worker(source, model_dir, threads):
+    global _source, _models
+    import torch
+    torch.set_num_threads(threads)
+    with contextlib.suppress(RuntimeError):
+        torch.set_num_interop_threads(1)
+    _source = source
+    if source == 'meta':
+        walk_forward._init_worker(model_dir, threads)
+    else:
+        import joblib
+        weights = joblib.load(os.path.join(model_dir, 'ensemble_weights.pkl'))
+        _models = {
+            'xgb':          joblib.load(os.path.join(model_dir, 'ensemble_xgb.pkl')),
+            'lgbm':         joblib.load(os.path.join(model_dir, 'ensemble_lgbm.pkl')),
+            'scaler':       joblib.load(os.path.join(model_dir, 'ensemble_scaler.pkl')),
+            'feature_cols': joblib.load(os.path.join(model_dir, 'ensemble_feature_cols.pkl')),
+            'w_xgb':        weights['xgb_weight'],
+            'w_lgbm':       weights['lgbm_weight'],
+        }
+
+
+def _ensemble_probs(symbol, from_frac=None):
+    """
+    Weighted XGB / LGBM P(UP), computed as EnsemblePredictionService does,
+    on the rows the trees never saw: the test split of train_trees.py (or
+    later, from `from_frac` of the stock's rows).
+    """
+    from data.data_loader import StockDataLoader
+    from data.feature_engineering import FeatureEngineer
+    from training.train_trees import symbol_rows, split_bounds
+
+    rows, _, dates = symbol_rows(StockDataLoader(), FeatureEngineer(), symbol, _models['feature_cols'])
+    if rows is None or len(rows) < 100:
+        return None, None
+    start = split_bounds(len(rows))[2]
+    if from_frac is not None:
+        start = max(start, int(len(rows) * from_frac))
+    if start >= len(rows):
+        return None, None
+    X_sc = _models['scaler'].transform(rows[start:])
+    prob = (_models['w_xgb'] * _models['xgb'].predict_proba(X_sc)[:, 1]
+            + _models['w_lgbm'] * _models['lgbm'].predict_proba(X_sc)[:, 1])
+    return dates[start:], prob
+
+
+def _meta_probs(symbol, task):
+    """Walk-forward meta-learner P(UP), dated at the last row of each window."""
+    df = walk_forward.load_frame(symbol)
+    if df is None or not set(walk_forward._models['feature_cols']) <= set(df.columns):
+        return None, None
+    dates = pd.to_datetime(df['trade_date']).values.astype('datetime64[D]')
+    parts = [(np.arange(start, end) - 1, prob)
+             for _, _, start, end, prob in walk_forward.fold_predictions(df, walk_forward._models, task)]
+    if not parts:
+        return None, None
+    rows = np.concatenate([p[0] for p in parts])
+    return dates[rows], np.concatenate([p[1] for p in parts])
+
+
+def panel_symbol(task):
+    symbol = task['symbol']
+    try:
+        if _source == 'meta':
+            dates, prob = _meta_probs(symbol, task)
+        else:
+            dates, prob = _ensemble_probs(symbol, task['from_frac'])
+        if dates is None:
+            return symbol, None, 'no usable data'
+        return symbol, {'dates': dates, 'prob': prob, 'price': raw_closes(symbol)}, None
+    except Exception as e:
+        return symbol, None, str(e)
+
+
+def build_panel(panel_dir, source, model_dir, version, symbols, workers, threads, task):
+    """Score every symbol in parallel and save the aligned (dates × symbols) matrices."""
+    from training.engine import save_arrays
+
+    parts = {}
+    ctx   = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(source, model_dir, threads)) as pool:
+        futures = [pool.submit(panel_symbol, {**task, 'symbol': s}) for s in symbols]
+        for i, future in enumerate(as_completed(futures), 1):
+            symbol, part, error = future.result()
+            if error:
+                print(f"  {i}/{len(symbols)} {symbol:<12} SKIP - {error}")
+                continue
+            parts[symbol] = part
+            print(f"  {i}/{len(symbols)} {symbol:<12} {len(part['prob']):>6,} signals")
+    if not parts:
+        raise SystemExit("No symbols produced signals")
+
+    kept  = sorted(parts)
+    dates = np.unique(np.concatenate([parts[s]['price'][0] for s in kept]))
+    prob  = np.full((len(dates), len(kept)), np.nan, dtype=np.float32)
+    price = np.full((len(dates), len(kept)), np.nan, dtype=np.float64)
+    for j, s in enumerate(kept):
+        p_dates, p_close = parts[s]['price']
+        price[np.searchsorted(dates, p_dates), j] = p_close
+        idx = np.searchsorted(dates, parts[s]['dates'])
+        ok  = (idx < len(dates)) & (dates[np.minimum(idx, len(dates) - 1)] == parts[s]['dates'])
+        prob[idx[ok], j] = parts[s]['prob'][ok]
+
+    save_arrays(panel_dir, meta={'source': source, 'version': version, 'symbols': kept,
+                                 'from_frac': task['from_frac']},
+                prob=prob, price=price, dates=dates.astype(np.int64))
+    print(f"✓ Panel → {panel_dir} ({len(dates):,} dates × {len(kept)} symbols)")
+
+
+# ── CLI ────────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorised signal → PnL simulator and threshold sweep")
+    parser.add_argument('--source',    choices=SOURCES, default='ensemble')
+    parser.add_argument('--version',   default=None, help="registry version (default CURRENT)")
+    parser.add_argument('--symbols',   nargs='+', default=None, help="default: every stock with --min-days")
+    parser.add_argument('--min-days',  type=int, default=1500)
+    parser.add_argument('--rebuild',   action='store_true', help="rebuild the cached signal panel")
+    parser.add_argument('--workers',   type=int, default=None)
+    parser.add_argument('--threads',   type=int, default=None)
+    parser.add_argument('--from-frac', type=float, default=None,
+                        help="first scored fraction of each stock's rows — meta: first walk-forward fold; "
+                             "ensemble: never before the trees' test split (the default)")
+    parser.add_argument('--up',        type=float, default=None, help="single run: UP threshold")
+    parser.add_argument('--down',      type=float, default=None, help="single run: DOWN threshold")
+    parser.add_argument('--grid',      choices=('symmetric', 'full'), default='symmetric')
+    parser.add_argument('--min',       type=float, default=0.30)
+    parser.add_argument('--max',       type=float, default=0.70)
+    parser.add_argument('--step',      type=float, default=0.01)
+    parser.add_argument('--cost-bps',  type=float, default=10.0, help="cost per unit of traded weight")
+    parser.add_argument('--lag',       type=int, default=1, help="days between a signal and the trade")
+    parser.add_argument('--long-only', action='store_true')
+    parser.add_argument('--top',       type=int, default=15)
+    parser.add_argument('--out',       default=None)
+    args = parser.parse_args()
+
+    from models.registry import ModelRegistry
+    from training.engine import load_arrays
+    from training.trainlarge import TRAIN_SPLIT, VAL_SPLIT
+    from backend.services.ensemble_service import UP_THRESHOLD, DOWN_THRESHOLD
+
+    version, model_dir = ModelRegistry().resolve(args.version)
+    frac_key  = 'default' if args.from_frac is None else f"{args.from_frac:g}"
+    panel_dir = os.path.join(BACKTEST_DIR, f"panel-{args.source}-{version}-from-{frac_key}")
+    if args.symbols:
+        panel_dir += '-' + '-'.join(sorted(args.symbols))
+    arrays, meta = (None, None) if args.rebuild else load_arrays(panel_dir, mmap=True)
+    if arrays is None:
+        symbols = args.symbols
+        if symbols is None:
+            from data.data_loader import StockDataLoader
+            symbols = sorted(StockDataLoader().get_stocks_with_min_history(min_days=args.min_days))
+        cores   = os.cpu_count() or 1
+        workers = min(args.workers or min(cores, 8), len(symbols))
+        threads = args.threads or max(1, cores // workers)
+        if args.from_frac is not None:
+            from_frac = args.from_frac
+        else:
+            # ensemble: None = the trees' own test split
+            from_frac = TRAIN_SPLIT + VAL_SPLIT if args.source == 'meta' else None
+        task    = {'scheme': 'expanding', 'train_days': 750, 'test_days': 125, 'horizons': [1],
+                   'from_frac': from_frac}
+        print(f"Building {args.source} signal panel for {len(symbols)} stocks | "
+              f"{workers} workers × {threads} threads")
+        build_panel(panel_dir, args.source, model_dir, version, symbols, workers, threads, task)
+        arrays, meta = load_arrays(panel_dir, mmap=True)
+
+    # Trim to dates with at least one signal — the meta panel starts at the first fold
+    prob, price = arrays['prob'], arrays['price']
+    has_signal  = np.isfinite(prob).any(axis=1)
+    first, last = np.argmax(has_signal), len(has_signal) - np.argmax(has_signal[::-1])
+    prob, price = np.asarray(prob[first:last]), np.asarray(price[first:last + args.lag + 1])
+    prob        = np.concatenate([prob, np.full((len(price) - len(prob), prob.shape[1]), np.nan, np.float32)])
+    dates       = arrays['dates'][first:first + len(price)].astype('datetime64[D]')
+    print(f"Panel: {meta['source']} @ {meta['version']} | {len(dates):,} dates ({dates[0]} → {dates[-1]}) × "
+          f"{prob.shape[1]} symbols | cost {args.cost_bps:g} bps | lag {args.lag} | "
+          f"{'long-only' if args.long_only else 'long/short'}")
+
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    if args.up is not None or args.down is not None:
+        up   = args.up if args.up is not None else UP_THRESHOLD
+        down = args.down if args.down is not None else DOWN_THRESHOLD
+        res  = simulate(signals_from_probs(prob, up, down), price, args.cost_bps, args.lag, args.long_only)
+        stats = summarize(res)
+        print("=" * 60)
+        print(f"  UP ≥ {up:.2f}  |  DOWN ≤ {down:.2f}")
+        for k, v in stats.items():
+            print(f"  {k:<14}: {float(v):>10.4f}")
+        print("=" * 60)
+        curve = pd.DataFrame({'date': dates[1:].astype(str), 'net': res['net'], 'equity': res['equity'],
+                              'drawdown': res['drawdown'], 'turnover': res['turnover'],
+                              'exposure': res['exposure']})
+        out = args.out or os.path.join(BACKTEST_DIR, f"pnl-{args.source}-{version}-{stamp}.parquet")
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        print(f"✓ Equity curve → {write_report(curve.to_dict('records'), out)}")
+        return
+
+    pairs = threshold_grid(args.grid, args.min, args.max, args.step)
+    start = time.perf_counter()
+    rows  = sweep(prob, price, pairs, args.cost_bps, args.lag, args.long_only)
+    secs  = time.perf_counter() - start
+    rows.sort(key=lambda r: -r['sharpe'])
+    print(f"Swept {len(pairs)} threshold pairs over {prob.size:,} cells in {secs:.2f}s")
+
+    service = next((r for r in rows if np.isclose(r['up'], UP_THRESHOLD) and np.isclose(r['down'], DOWN_THRESHOLD)),
+                   None)
+    print("=" * 92)
+    print(f"  {'up':>5}{'down':>6}{'total':>10}{'CAGR':>9}{'vol':>8}{'sharpe':>8}{'maxDD':>9}"
+          f"{'turnover':>10}{'exposure':>10}{'costs':>8}")
+    print("=" * 92)
+    for r in rows[:args.top] + ([service] if service and service not in rows[:args.top] else []):
+        mark = '  ← service' if r is service else ''
+        print(f"  {r['up']:>5.2f}{r['down']:>6.2f}{r['total_return'] * 100:>9.1f}%{r['cagr'] * 100:>8.1f}%"
+              f"{r['ann_vol'] * 100:>7.1f}%{r['sharpe']:>8.2f}{r['max_drawdown'] * 100:>8.1f}%"
+              f"{r['avg_turnover']:>10.3f}{r['avg_exposure']:>10.2f}{r['cost_drag'] * 100:>7.1f}%{mark}")
+    print("=" * 92)
+
+    out = args.out or os.path.join(BACKTEST_DIR, f"sweep-{args.source}-{version}-{stamp}.parquet")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    for r in rows:
+        r.update({'source': args.source, 'model_version': version, 'cost_bps': args.cost_bps,
+                  'lag': args.lag, 'long_only': args.long_only})
+    print(f"✓ Sweep → {write_report(rows, out)}")
+
+
+if __name__ == '__main__':
+    main()
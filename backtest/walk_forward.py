@@ -0,0 +1,335 @@
+# backtest/walk_forward.py
+#
+# Walk-forward evaluation of the LSTM + XGBoost + CNN1D + meta-learner
+# ensemble across the whole universe.
+#
+#   python backtest/walk_forward.py                                  # expanding, every stock
+#   python backtest/walk_forward.py --scheme rolling --train-days 750 --test-days 125
+#   python backtest/walk_forward.py --symbols RELIANCE TCS --horizons 1 5 20 --workers 4
+#   python backtest/walk_forward.py --version 20261019-153000 --from-frac 0.5
+#
+# Each stock's history is cut into consecutive test folds of `test_days`
+# windows starting at `from_frac` of its history. The feature scaler for a
+# fold is fitted only on rows before the fold — everything before it
+# (expanding) or the last `train_days` rows (rolling) — unlike
+# evaluate_test.py which scales each stock on its full history. The models
+# themselves are the registry version's; folds that start inside
+# trainlarge's train/val share of a stock are flagged `in_sample` (the
+# default from_frac starts at the first out-of-sample row).
+#
+# A prediction is scored against the sign of the 1..h day forward return for
+# every requested horizon h — the next-day signal's hit rate by horizon.
+# Returns come from the raw DB closes: the features are built on the
+# wavelet-denoised close_price like the service's, and that series is
+# denoised over the whole history, so it still carries some future prices
+# into every fold's inputs. A label taken from it would leak them outright.
+#
+# Stocks are evaluated in spawned worker processes that load the models once
+# (initializer) and return one MetricBook per stock — confusion counts per
+# (symbol, fold, horizon), not prediction lists. The parent merges them as
+# they finish and writes one row per bucket to
+# saved_models/backtests/walk-forward-<version>-<timestamp>.parquet
+# (CSV if pyarrow is missing).
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from backtest.aggregators import DirectionalStats, MetricBook
+
+BACKTEST_DIR = 'saved_models/backtests'
+SCHEMES      = ('expanding', 'rolling')
+KEY_NAMES    = ('symbol', 'fold', 'horizon')
+
+
+# ── Worker state: models loaded once per process ───────────────────────────────
+
+_models = None
+
+
+def load_ensemble(model_dir):
+    """Every model the autoregressive serving path uses, from `model_dir`."""
+    import joblib
+    from models.export import load_checkpoint_models
+
+    lstm, cfg, cnn, _ = load_checkpoint_models(model_dir)
+    models = {
+        'feature_cols': joblib.load(os.path.join(model_dir, 'returns_feature_cols.pkl')),
+        'seq_len':      cfg.get('sequence_length', 20),
+        'lstm':         lstm.eval(),
+        'cnn':          cnn.eval() if cnn is not None else None,
+        'xgb':          None,
+        'meta':         None,
+    }
+    xgb_path  = os.path.join(model_dir, 'xgb_model.pkl')
+    meta_path = os.path.join(model_dir, 'meta_learner.pkl')
+    if cnn is not None and os.path.exists(xgb_path) and os.path.exists(meta_path):
+        models['xgb']  = joblib.load(xgb_path)
+        models['meta'] = joblib.load(meta_path)
+    return models
+
+
+def _init_worker(model_dir, threads):
+    global _models
+    import torch
+    torch.set_num_threads(threads)
+    with contextlib.suppress(RuntimeError):
+        torch.set_num_interop_threads(1)
+    _models = load_ensemble(model_dir)
+
+
+def predict_prob(models, X):
+    """
+    Meta-learner P(UP) for windows X; > 0.5 is the ensemble's UP call.
+    Without a meta-learner the LSTM sign is returned as 1.0 / 0.0.
+    """
+    from models.inference import predict_array
+
+    lstm_out = predict_array(models['lstm'], X)
+    if models['meta'] is None:
+        return (lstm_out > 0).astype(np.float64)
+    xgb_prob = models['xgb'].predict_proba(np.ascontiguousarray(X[:, -1, :]))[:, 1]
+    cnn_out  = predict_array(models['cnn'], X)
+    return models['meta'].predict_proba(np.column_stack([lstm_out, xgb_prob, cnn_out]))[:, 1]
+
+
+# ── Folds ──────────────────────────────────────────────────────────────────────
+
+def fold_bounds(n_rows, seq_len, scheme, from_frac, test_days, train_days):
+    """
+    [(fold, train_start, test_start, test_end)] in row indices. Windows are
+    anchored like trainlarge: the window rows [a - seq_len, a) predict the
+    return from row a to a + 1, and a test fold holds anchors [test_start, test_end).
+    """
+    first = max(int(n_rows * from_frac), seq_len, train_days if scheme == 'rolling' else seq_len)
+    folds = []
+    for k, start in enumerate(range(first, n_rows - 1, test_days)):
+        end         = min(start + test_days, n_rows - 1)
+        train_start = max(0, start - train_days) if scheme == 'rolling' else 0
+        folds.append((k, train_start, start, end))
+    return folds
+
+
+def load_frame(symbol):
+    """One stock's engineered frame, cut like evaluate_test.py — None if unusable."""
+    from data.data_loader import StockDataLoader
+
+    df = StockDataLoader().load_stock_data(symbol)
+    if df is None:
+        return None
+    df['target_return'] = df['close_price'].pct_change().shift(-1)
+    return df.dropna().reset_index(drop=True)
+
+
+def raw_closes(symbol):
+    """Undenoised closes from the DB as (datetime64[D] dates, float64 prices)."""
+    from sqlalchemy import text
+    from data.backends import get_engine
+
+    with get_engine().connect() as conn:
+        df = pd.read_sql(text("SELECT trade_date, close_price FROM stock_prices "
+                              "WHERE symbol = :symbol ORDER BY trade_date"),
+                         conn, params={'symbol': symbol})
+    return (pd.to_datetime(df['trade_date']).values.astype('datetime64[D]'),
+            df['close_price'].values.astype(np.float64))
+
+
+def raw_close_at(symbol, trade_dates):
+    """The raw DB close on each of `trade_dates`, NaN where the DB has none."""
+    dates            = pd.to_datetime(trade_dates).values.astype('datetime64[D]')
+    raw_dates, raw   = raw_closes(symbol)
+    close            = np.full(len(dates), np.nan)
+    if len(raw_dates):
+        idx          = np.minimum(np.searchsorted(raw_dates, dates), len(raw_dates) - 1)
+        hit          = raw_dates[idx] == dates
+        close[hit]   = raw[idx[hit]]
+    return close
+
+
+def fold_predictions(df, models, task):
+    """
+    Yield (fold, train_start, test_start, test_end, P(UP) per anchor) for
+    every fold of one stock, scaling each fold with training-row statistics only.
+    """
+    from sklearn.preprocessing import StandardScaler
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    seq_len  = models['seq_len']
+    features = df[models['feature_cols']].values
+    for k, train_start, start, end in fold_bounds(len(df), seq_len, task['scheme'], task['from_frac'],
+                                                  task['test_days'], task['train_days']):
+        if start - train_start < seq_len:
+            continue
+        # Point-in-time scaling: statistics from the training rows only
+        scaler = StandardScaler().fit(features[train_start:start])
+        block  = np.nan_to_num(scaler.transform(features[start - seq_len:end])).astype(np.float32)
+        # (end - start, seq_len, F) zero-copy view; window j ends just before anchor start + j
+        X      = sliding_window_view(block, seq_len, axis=0)[:end - start].transpose(0, 2, 1)
+        yield k, train_start, start, end, predict_prob(models, X)
+
+
+def evaluate_symbol(task):
+    """All folds of one stock, in a worker. Returns (symbol, MetricBook buckets, n_windows, error)."""
+    from training.trainlarge import TRAIN_SPLIT, VAL_SPLIT
+
+    symbol = task['symbol']
+    try:
+        df = load_frame(symbol)
+        if df is None:
+            return symbol, {}, 0, 'no data'
+        if not set(_models['feature_cols']) <= set(df.columns):
+            return symbol, {}, 0, 'missing features'
+
+        # Labels from raw closes: close_price is denoised over the whole history
+        close    = raw_close_at(symbol, df['trade_date'])
+        n        = len(df)
+        oos_from = int(n * (TRAIN_SPLIT + VAL_SPLIT))
+        book     = MetricBook()
+        folds    = {}
+        windows  = 0
+
+        for k, train_start, start, end, prob in fold_predictions(df, _models, task):
+            up     = prob > 0.5
+            anchor = np.arange(start, end)
+            windows += len(anchor)
+
+            for h in task['horizons']:
+                ok      = anchor + h < n
+                ok[ok] &= np.isfinite(close[anchor[ok]]) & np.isfinite(close[anchor[ok] + h])
+                if not ok.any():
+                    continue
+                fwd = close[anchor[ok] + h] / close[anchor[ok]] - 1
+                book.update((symbol, k, h), fwd > 0, up[ok], fwd)
+
+            dates    = df['trade_date'].iloc[[start, end - 1]]
+            folds[k] = {
+                'test_from':  str(pd.Timestamp(dates.iloc[0]).date()),
+                'test_to':    str(pd.Timestamp(dates.iloc[1]).date()),
+                'train_rows': start - train_start,
+                'in_sample':  start < oos_from,
+            }
+
+        return symbol, {'stats': {key: s.to_dict() for key, s in book.buckets.items()},
+                        'folds': folds}, windows, None
+    except Exception as e:
+        return symbol, {}, 0, str(e)
+
+
+# ── Report ─────────────────────────────────────────────────────────────────────
+
+def print_summary(book, n_symbols, windows, seconds):
+    by_horizon = book.rollup((2,))
+    print("\n" + "=" * 84)
+    print(f"  {'horizon':>7}{'samples':>11}{'acc':>8}{'UP':>8}{'DOWN':>8}{'F1':>8}"
+          f"{'pred UP':>9}{'signal bps':>12}{'balance':>10}")
+    print("=" * 84)
+    for (h,), stats in sorted(by_horizon.buckets.items()):
+        m = stats.metrics()
+        print(f"  {h:>6}d{m['samples']:>11,}{m['acc']:>7.2f}%{m['up_acc']:>7.1f}%{m['down_acc']:>7.1f}%"
+              f"{m['f1']:>7.1f}%{m['pred_up_pct']:>8.1f}%{m['mean_signal_bps']:>12.2f}"
+              f"{abs(m['up_acc'] - m['down_acc']):>9.1f}%")
+    print("=" * 84)
+    print(f"  {n_symbols} stocks | {windows:,} windows | {seconds:.1f}s "
+          f"({windows / max(seconds, 1e-9):,.0f} windows/s)")
+
+
+def write_report(rows, path):
+    """Parquet when pyarrow is available, otherwise CSV next to it. Returns the written path."""
+    df = pd.DataFrame(rows)
+    try:
+        df.to_parquet(path, index=False)
+    except ImportError:
+        path = os.path.splitext(path)[0] + '.csv'
+        print("pyarrow not installed — writing CSV instead of Parquet.")
+        df.to_csv(path, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the ensemble")
+    parser.add_argument('--version',    default=None, help="registry version (default CURRENT)")
+    parser.add_argument('--symbols',    nargs='+', default=None, help="default: every stock with --min-days")
+    parser.add_argument('--min-days',   type=int, default=1500)
+    parser.add_argument('--scheme',     choices=SCHEMES, default='expanding')
+    parser.add_argument('--train-days', type=int, default=750, help="rolling scaler window (rows)")
+    parser.add_argument('--test-days',  type=int, default=125, help="windows per fold")
+    parser.add_argument('--from-frac',  type=float, default=None,
+                        help="first fold at this fraction of each stock's history "
+                             "(default: trainlarge's TRAIN_SPLIT + VAL_SPLIT, i.e. out-of-sample only)")
+    parser.add_argument('--horizons',   type=int, nargs='+', default=[1, 5, 10, 20])
+    parser.add_argument('--workers',    type=int, default=None, help="worker processes (default cores, max 8)")
+    parser.add_argument('--threads',    type=int, default=None, help="intra-op threads per worker")
+    parser.add_argument('--out',        default=None)
+    args = parser.parse_args()
+
+    from models.registry import ModelRegistry
+    from training.trainlarge import TRAIN_SPLIT, VAL_SPLIT
+
+    version, model_dir = ModelRegistry().resolve(args.version)
+    symbols = args.symbols
+    if symbols is None:
+        from data.data_loader import StockDataLoader
+        symbols = sorted(StockDataLoader().get_stocks_with_min_history(min_days=args.min_days))
+    if not symbols:
+        raise SystemExit("No symbols to backtest")
+
+    cores   = os.cpu_count() or 1
+    workers = min(args.workers or min(cores, 8), len(symbols))
+    threads = args.threads or max(1, cores // workers)
+    base    = {
+        'scheme':     args.scheme,
+        'train_days': args.train_days,
+        'test_days':  args.test_days,
+        'from_frac':  args.from_frac if args.from_frac is not None else TRAIN_SPLIT + VAL_SPLIT,
+        'horizons':   sorted(set(args.horizons)),
+    }
+    print(f"Walk-forward backtest: model {version} | {len(symbols)} stocks | {args.scheme} | "
+          f"{args.test_days}-day folds from {base['from_frac']:.0%} | horizons {base['horizons']} | "
+          f"{workers} workers × {threads} threads")
+
+    book, rows, windows, done = MetricBook(), [], 0, 0
+    start = time.perf_counter()
+    ctx   = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(model_dir, threads)) as pool:
+        futures = [pool.submit(evaluate_symbol, {**base, 'symbol': s}) for s in symbols]
+        for i, future in enumerate(as_completed(futures), 1):
+            symbol, result, n, error = future.result()
+            if error:
+                print(f"  {i}/{len(symbols)} {symbol:<12} SKIP - {error}")
+                continue
+            part = MetricBook()
+            for key, d in result['stats'].items():
+                part.buckets[key] = DirectionalStats.from_dict(d)
+            book.merge(part)
+            rows.extend({**row, **result['folds'][row['fold']]} for row in part.rows(KEY_NAMES))
+            windows += n
+            done    += 1
+            acc = part.rollup((2,)).buckets.get((base['horizons'][0],))
+            print(f"  {i}/{len(symbols)} {symbol:<12} {n:>6,} windows  "
+                  f"acc@{base['horizons'][0]}d {acc.metrics()['acc'] if acc else 0:.1f}%")
+
+    if not rows:
+        raise SystemExit("No folds evaluated")
+    print_summary(book, done, windows, time.perf_counter() - start)
+
+    out = args.out or os.path.join(
+        BACKTEST_DIR, f"walk-forward-{version}-{datetime.now():%Y%m%d-%H%M%S}.parquet"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    for row in rows:
+        row.update({'model_version': version, 'scheme': args.scheme})
+    print(f"✓ Report → {write_report(rows, out)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_runtime.py
+#
+# Eager PyTorch vs frozen TorchScript latency for HybridLSTMGRU and CNN1DModel.
+#
+#   python benchmarks/bench_runtime.py                       # random weights
+#   python benchmarks/bench_runtime.py --dir saved_models    # real checkpoints
+#   python benchmarks/bench_runtime.py --threads 4
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+
+from models.hybrid_lstm_gru import HybridLSTMGRU
+from models.cnn1d_model import CNN1DModel
+from models.export import (
+    export_lstm, export_cnn, load_torchscript, load_checkpoint_models,
+    configure_threads, LSTM_TS_NAME, CNN_TS_NAME
+)
+
+BATCH_SIZES = (1, 32, 512)
+
+
+def time_model(model, X, repeats, warmup=3):
+    """Median / p95 wall time per forward pass, in milliseconds."""
+    with torch.inference_mode():
+        for _ in range(warmup):
+            model(X)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(X)
+            times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), float(np.percentile(times, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eager vs TorchScript inference latency")
+    parser.add_argument('--dir', help="Checkpoint directory (default: random-init models)")
+    parser.add_argument('--input-size', type=int, default=38)
+    parser.add_argument('--seq-len',    type=int, default=20)
+    parser.add_argument('--repeats',    type=int, default=30)
+    parser.add_argument('--threads',    type=int, default=None)
+    args = parser.parse_args()
+
+    n_threads = configure_threads(intra_op=args.threads)
+
+    if args.dir:
+        lstm, cfg, cnn, _ = load_checkpoint_models(args.dir)
+        input_size        = cfg['input_size']
+        seq_len           = cfg.get('sequence_length', args.seq_len)
+    else:
+        input_size, seq_len = args.input_size, args.seq_len
+        lstm = HybridLSTMGRU(input_size=input_size, hidden_size=256, num_layers=3, dropout=0.4)
+        cnn  = CNN1DModel(input_size=input_size, seq_len=seq_len)
+    lstm.eval()
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        export_lstm(lstm, seq_len, input_size, out_dir)
+        models = {'HybridLSTMGRU': (lstm, load_torchscript(os.path.join(out_dir, LSTM_TS_NAME), 'cpu'))}
+        if cnn is not None:
+            cnn.eval()
+            export_cnn(cnn, seq_len, input_size, out_dir)
+            models['CNN1DModel'] = (cnn, load_torchscript(os.path.join(out_dir, CNN_TS_NAME), 'cpu'))
+
+        print(f"CPU threads: {n_threads} | seq_len={seq_len} | features={input_size}")
+        print("=" * 78)
+        print(f"{'model':<15}{'batch':>7}{'eager p50':>12}{'ts p50':>10}{'eager p95':>12}{'ts p95':>10}{'speedup':>10}")
+        for name, (eager, scripted) in models.items():
+            for batch in BATCH_SIZES:
+                X = torch.randn(batch, seq_len, input_size)
+                repeats = max(5, args.repeats // (1 + batch // 128))
+                e50, e95 = time_model(eager, X, repeats)
+                t50, t95 = time_model(scripted, X, repeats)
+                print(f"{name:<15}{batch:>7}{e50:>10.2f}ms{t50:>8.2f}ms{e95:>10.2f}ms{t95:>8.2f}ms{e50 / t50:>9.2f}x")
+        print("=" * 78)
+
+
+if __name__ == '__main__':
+    main()
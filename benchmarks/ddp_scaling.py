@@ -0,0 +1,145 @@
+# benchmarks/ddp_scaling.py
+#
+# Strong-scaling report for distributed trainlarge training: the same
+# HybridLSTMGRU epoch over the same synthetic sequences with 1, 2, 4 … N
+# gloo processes (training/distributed.py), each process getting
+# cores / N intra-op threads.
+#
+#   python benchmarks/ddp_scaling.py                       # 1, 2, 4 … cpu_count processes
+#   python benchmarks/ddp_scaling.py --procs 1 2 4 8 --train-samples 32768
+#
+# speedup    = samples/s at N  /  samples/s at 1
+# efficiency = speedup / N
+# The 1-process row is a plain single-process run with every core, so the
+# efficiency column answers "is DDP worth it on this box" rather than
+# "does DDP scale against itself".
+
+import os
+import sys
+import json
+import platform
+import argparse
+import tempfile
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR   = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def _worker(data_dir, out_path, epochs, precision):
+    import torch
+    from models.hybrid_lstm_gru import HybridLSTMGRU
+    from training import trainlarge
+    from training.dataset import StockSequenceDataset
+    from training.engine import Trainer, load_arrays
+    from training.distributed import world, shard_loader
+
+    rank, world_size = world()
+    arrays, _ = load_arrays(data_dir, mmap=True)
+    loader    = shard_loader(StockSequenceDataset(arrays['X'], arrays['y']),
+                             trainlarge.BATCH_SIZE, train=True)
+
+    torch.manual_seed(0)
+    model   = HybridLSTMGRU(input_size=arrays['X'].shape[2], hidden_size=trainlarge.HIDDEN_SIZE,
+                            num_layers=trainlarge.NUM_LAYERS, dropout=trainlarge.DROPOUT)
+    # Same trainer, loss and optimizer as trainlarge.train()
+    trainer = Trainer(model, trainlarge.DirectionalLoss(mse_weight=0.4, dir_weight=0.6),
+                      torch.optim.Adam(model.parameters(), lr=trainlarge.LEARNING_RATE),
+                      device='cpu', precision=precision)
+
+    stats = []
+    for epoch in range(1, epochs + 1):
+        trainer.epoch = epoch
+        stats.append(trainer.train_epoch(loader))
+
+    if rank == 0:
+        best = max(stats, key=lambda s: s['samples_per_sec'])
+        with open(out_path, 'w') as f:
+            json.dump({
+                'procs':           world_size,
+                'threads':         torch.get_num_threads(),
+                'precision':       trainer.precision,
+                'samples':         best['samples'],
+                'samples_per_sec': best['samples_per_sec'],
+                'step_time_ms':    best['step_time_ms'],
+                'epoch_seconds':   best['train_seconds'],
+                'peak_rss_mb':     best['peak_rss_mb'],
+            }, f)
+
+
+def print_table(rows):
+    print("=" * 78)
+    print(f"{'procs':>5} {'threads':>8} {'samples/s':>12} {'step ms':>9} {'epoch s':>9} "
+          f"{'speedup':>8} {'efficiency':>11}")
+    print("-" * 78)
+    for r in rows:
+        print(f"{r['procs']:>5} {r['threads']:>8} {r['samples_per_sec']:>12,.0f} {r['step_time_ms']:>9.1f} "
+              f"{r['epoch_seconds']:>9.2f} {r['speedup']:>7.2f}x {r['efficiency'] * 100:>10.0f}%")
+    print("=" * 78)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data-parallel training scaling report")
+    parser.add_argument('--procs', type=int, nargs='+', default=None,
+                        help="Process counts to run (default 1, 2, 4 … cpu_count)")
+    parser.add_argument('--train-samples', type=int, default=8192, help="global samples per epoch")
+    parser.add_argument('--rows',          type=int, default=2500, help="bars per synthetic symbol")
+    parser.add_argument('--epochs',        type=int, default=2, help="epochs per run; the fastest counts")
+    parser.add_argument('--precision',     default='auto')
+    parser.add_argument('--work-dir',      default=os.path.join(tempfile.gettempdir(), 'stock-bench'))
+    parser.add_argument('--out',           default=None)
+    args = parser.parse_args()
+
+    from benchmarks.fixtures import training_set
+    from training.engine import save_arrays, load_arrays
+    from training.distributed import launch
+
+    cores = os.cpu_count() or 1
+    procs = args.procs
+    if procs is None:
+        procs = [1]
+        while procs[-1] * 2 <= cores:
+            procs.append(procs[-1] * 2)
+        if procs[-1] != cores:
+            procs.append(cores)
+    if 1 not in procs:
+        procs = [1] + procs
+
+    data_dir = os.path.join(args.work_dir, f"ddp-{args.train_samples}x{args.rows}")
+    if load_arrays(data_dir, mmap=True)[0] is None:
+        print(f"Building {args.train_samples:,} training windows → {data_dir}")
+        X, y = training_set(args.train_samples, args.rows)
+        save_arrays(data_dir, X=X, y=y)
+
+    rows = []
+    for n in sorted(set(procs)):
+        out_path = os.path.join(args.work_dir, f"ddp-result-{n}.json")
+        print(f"  {n} process{'es' if n > 1 else ''}...", flush=True)
+        launch(_worker, n, data_dir=data_dir, out_path=out_path,
+               epochs=args.epochs, precision=args.precision)
+        with open(out_path) as f:
+            rows.append(json.load(f))
+
+    base = rows[0]['samples_per_sec']
+    for r in rows:
+        r['speedup']    = round(r['samples_per_sec'] / base, 3)
+        r['efficiency'] = round(r['speedup'] / r['procs'], 3)
+    print_table(rows)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"ddp-scaling-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'machine': {'python': platform.python_version(), 'cpu_count': cores,
+                        'processor': platform.processor() or platform.machine()},
+            'config':  {'train_samples': args.train_samples, 'rows': args.rows,
+                        'epochs': args.epochs, 'precision': args.precision},
+            'results': rows,
+        }, f, indent=2)
+    print(f"✓ Results → {out}")
+
+
+if __name__ == '__main__':
+    main()
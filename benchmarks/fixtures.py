@@ -0,0 +1,164 @@
+# benchmarks/fixtures.py
+#
+# Throwaway market-data databases and model directories for benchmarks and
+# load tests, so neither needs Postgres, yfinance or trained checkpoints.
+#
+#   db_url    = build_database('/tmp/bench/md.sqlite', n_symbols=20, rows=2500)
+#   model_dir = build_model_dir('/tmp/bench/models')
+#   use_local_stack(db_url)        # before importing backend.services.*
+#
+# Model weights are random — latency and memory are representative of the
+# production architecture, forecasts are not.
+
+import os
+import sys
+from datetime import date
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import joblib
+
+from data import synthetic
+
+# Bars end on a fixed day so every run sees the same data; the fake quote
+# provider still continues the series up to today for live-price lookups.
+FIXTURE_END = date(2024, 1, 1)
+
+
+def calendar_start(rows, end=FIXTURE_END):
+    """First business day of a `rows`-bar window ending before `end`."""
+    return (pd.Timestamp(end) - pd.tseries.offsets.BDay(rows)).date()
+
+
+def raw_bars(symbol='RELIANCE', rows=2500, end=FIXTURE_END):
+    """One symbol's synthetic OHLCV in the stock_prices layout (what load_stock_data reads)."""
+    return synthetic.symbol_bars(symbol, calendar_start(rows, end), end)
+
+
+def use_local_stack(db_url):
+    """Point data.backends / quote_providers at the fixture DB and the fake provider."""
+    os.environ['DATABASE_URL']   = db_url
+    os.environ['QUOTE_PROVIDER'] = 'fake'
+
+
+def build_database(path, n_symbols=20, rows=2500, end=FIXTURE_END):
+    """SQLite file with `n_symbols` synthetic symbols × ~`rows` bars. Reused if already built."""
+    from data.backends import get_engine
+
+    url = f"sqlite:///{os.path.abspath(path)}"
+    if os.path.exists(path):
+        return url
+    engine = get_engine(url)
+    synthetic.write_universe(engine, synthetic.universe(n_symbols), calendar_start(rows, end), end)
+    return url
+
+
+def offline_loader():
+    """StockDataLoader on an empty in-memory DB — for the denoise / feature steps only."""
+    from data.data_loader import StockDataLoader
+    return StockDataLoader(db_url='sqlite://')
+
+
+def engineered_frame(rows=2500, symbol='RELIANCE'):
+    """raw_bars() through the same steps as StockDataLoader.load_stock_data."""
+    from data.data_loader import wavelet_denoise
+
+    loader = offline_loader()
+    df     = raw_bars(symbol, rows)
+    df['close_price'] = wavelet_denoise(df['close_price'].values)
+    df['volume']      = wavelet_denoise(df['volume'].values.astype(float)).clip(min=0)
+    df = loader.feature_engineer.add_technical_indicators(df)
+    return loader._add_extra_features(df)
+
+
+def training_set(n_samples=8192, rows=2500):
+    """(X, y) of n_samples real return windows, built from as many synthetic symbols as needed."""
+    from training.trainlarge import create_return_sequences, detect_feature_cols
+
+    X_parts, y_parts, n = [], [], 0
+    for symbol in synthetic.universe(10_000):
+        df   = engineered_frame(rows=rows, symbol=symbol)
+        X, y = create_return_sequences(df, detect_feature_cols(df))
+        X_parts.append(X)
+        y_parts.append(y)
+        n += len(X)
+        if n >= n_samples:
+            break
+    return np.concatenate(X_parts)[:n_samples], np.concatenate(y_parts)[:n_samples]
+
+
+def build_model_dir(path, seed=0):
+    """
+    Every artefact PredictionService and EnsemblePredictionService load,
+    with the production architecture and random weights. Reused if present.
+    """
+    import torch
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBClassifier
+    from lightgbm import LGBMClassifier
+
+    from models.hybrid_lstm_gru import HybridLSTMGRU
+    from models.cnn1d_model import CNN1DModel
+    from models.multi_horizon import HORIZONS, MULTI_HORIZON_NAME
+    from models.export import export_lstm, export_cnn
+    from training import trainlarge
+
+    if os.path.exists(os.path.join(path, 'returns_model.pth')):
+        return path
+    os.makedirs(path, exist_ok=True)
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+
+    df           = engineered_frame(rows=400)
+    feature_cols = trainlarge.detect_feature_cols(df)
+    n_features   = len(feature_cols)
+    seq_len      = trainlarge.SEQUENCE_LENGTH
+    lstm_cfg     = {
+        'input_size':      n_features,
+        'hidden_size':     trainlarge.HIDDEN_SIZE,
+        'num_layers':      trainlarge.NUM_LAYERS,
+        'dropout':         trainlarge.DROPOUT,
+        'sequence_length': seq_len,
+    }
+
+    lstm = HybridLSTMGRU(input_size=n_features, hidden_size=lstm_cfg['hidden_size'],
+                         num_layers=lstm_cfg['num_layers'], dropout=lstm_cfg['dropout'])
+    torch.save({'model_state_dict': lstm.state_dict(), 'config': lstm_cfg},
+               os.path.join(path, 'returns_model.pth'))
+    export_lstm(lstm.eval(), seq_len, n_features, path)
+
+    mh = HybridLSTMGRU(input_size=n_features, hidden_size=lstm_cfg['hidden_size'],
+                       num_layers=lstm_cfg['num_layers'], output_size=len(HORIZONS),
+                       dropout=lstm_cfg['dropout'])
+    torch.save({'model_state_dict': mh.state_dict(),
+                'config': {**lstm_cfg, 'horizons': list(HORIZONS), 'target_scale': 'sqrt_horizon'}},
+               os.path.join(path, MULTI_HORIZON_NAME))
+
+    cnn = CNN1DModel(input_size=n_features, seq_len=seq_len)
+    torch.save({'model_state_dict': cnn.state_dict(),
+                'config': {'input_size': n_features, 'seq_len': seq_len}},
+               os.path.join(path, 'cnn1d_model.pth'))
+    export_cnn(cnn.eval(), seq_len, n_features, path)
+
+    # Tree models sized like train_ensemble.py's (400 rounds, depth 5)
+    X = rng.standard_normal((4000, n_features))
+    y = (X[:, 0] + rng.standard_normal(4000) > 0).astype(int)
+    tree_args = dict(n_estimators=400, max_depth=5, learning_rate=0.05, n_jobs=1, random_state=seed)
+    joblib.dump(XGBClassifier(tree_method='hist', **tree_args).fit(X, y),
+                os.path.join(path, 'xgb_model.pkl'))
+    joblib.dump(LogisticRegression().fit(rng.standard_normal((4000, 3)), y),
+                os.path.join(path, 'meta_learner.pkl'))
+    joblib.dump(feature_cols, os.path.join(path, 'returns_feature_cols.pkl'))
+    joblib.dump(synthetic.universe(20), os.path.join(path, 'trained_stocks.pkl'))
+
+    # Ensemble service: scaled latest-row features, XGBoost + LightGBM
+    joblib.dump(XGBClassifier(tree_method='hist', **tree_args).fit(X, y),
+                os.path.join(path, 'ensemble_xgb.pkl'))
+    joblib.dump(LGBMClassifier(verbose=-1, **tree_args).fit(X, y),
+                os.path.join(path, 'ensemble_lgbm.pkl'))
+    joblib.dump(StandardScaler().fit(X), os.path.join(path, 'ensemble_scaler.pkl'))
+    joblib.dump(feature_cols, os.path.join(path, 'ensemble_feature_cols.pkl'))
+    joblib.dump({'xgb_weight': 0.5, 'lgbm_weight': 0.5}, os.path.join(path, 'ensemble_weights.pkl'))
+    return path
@@ -0,0 +1,359 @@
+# benchmarks/loadtest.py
+#
+# Closed-loop HTTP load generator replaying the frontend flows in
+# benchmarks/scenarios.yaml. Reports throughput and p50 / p95 / p99 latency
+# per route and per flow, and saves them for run-to-run comparison.
+#
+#   python benchmarks/loadtest.py                                  # in-process ASGI, 16 users, 60 s
+#   python benchmarks/loadtest.py --serve --workers 1 -c 32        # uvicorn on localhost
+#   python benchmarks/loadtest.py --url http://127.0.0.1:8001      # an already running server
+#   python benchmarks/loadtest.py --compare benchmarks/results/loadtest-<ts>.json
+#
+# In-process and --serve run against the local stand-ins: a synthetic SQLite
+# market DB, the fake quote provider and random-weight models
+# (benchmarks/fixtures.py). With --url the server must share this process's
+# DATABASE_URL / MARKET_DATA_BACKEND, since load-test users are created
+# directly in that database.
+#
+# In-process mode shares one event loop between the client and the app, so
+# it measures the app's own overhead; --serve measures what a browser sees.
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import httpx
+import yaml
+
+BENCH_DIR      = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR    = os.path.join(BENCH_DIR, 'results')
+SCENARIOS_PATH = os.path.join(BENCH_DIR, 'scenarios.yaml')
+PROJECT_ROOT   = os.path.dirname(BENCH_DIR)
+
+LOADTEST_PASSWORD = 'loadtest-password'
+
+
+# ── Scenario expansion ─────────────────────────────────────────────────────────
+
+def draw_vars(spec, symbols, rng):
+    out = {}
+    for name, gen in (spec or {}).items():
+        if 'pick' in gen:
+            out[name] = rng.choice(symbols)
+        elif 'sample' in gen:
+            out[name] = rng.sample(symbols, min(gen['sample'], len(symbols)))
+        elif 'choice' in gen:
+            out[name] = rng.choice(gen['choice'])
+        else:
+            raise ValueError(f"Unknown generator for var '{name}': {gen}")
+    return out
+
+
+def render(value, env):
+    if isinstance(value, str):
+        key = value[1:-1] if value.startswith('{') and value.endswith('}') else None
+        if key in env:
+            return env[key]
+        return value.format(**env)
+    if isinstance(value, dict):
+        return {k: render(v, env) for k, v in value.items()}
+    if isinstance(value, list):
+        return [render(v, env) for v in value]
+    return value
+
+
+def expand_steps(flow, env):
+    """(route label, method, path, params, json, auth) for every request of one flow run."""
+    for step in flow['steps']:
+        label = f"{step['method']} {step['path']}"
+        if 'each' in step:
+            singular = step['each'].rstrip('s')
+            bindings = [{**env, singular: item} for item in env[step['each']]]
+        else:
+            bindings = [env]
+        for b in bindings:
+            yield (label, step['method'], render(step['path'], b), render(step.get('params'), b),
+                   render(step.get('json'), b), step.get('auth', False))
+
+
+# ── Recording ──────────────────────────────────────────────────────────────────
+
+class Recorder:
+    """Latencies per route and per flow, counted only inside the measurement window."""
+
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.routes       = defaultdict(list)      # label → [ms]
+        self.flows        = defaultdict(list)
+        self.errors       = defaultdict(lambda: defaultdict(int))   # label → status → n
+
+    def request(self, label, started, ms, status):
+        if started < self.measure_from:
+            return
+        self.routes[label].append(ms)
+        if status is None or status >= 400:
+            self.errors[label][str(status or 'exception')] += 1
+
+    def flow(self, name, started, ms):
+        if started >= self.measure_from:
+            self.flows[name].append(ms)
+
+
+def summarize(latencies, errors, window_s):
+    ms = np.asarray(latencies, dtype=np.float64)
+    if not len(ms):
+        return {'requests': 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    out = {
+        'requests':   int(len(ms)),
+        'throughput': round(len(ms) / window_s, 2),
+        'mean_ms':    round(float(ms.mean()), 2),
+        'p50_ms':     round(float(p50), 2),
+        'p95_ms':     round(float(p95), 2),
+        'p99_ms':     round(float(p99), 2),
+        'max_ms':     round(float(ms.max()), 2),
+    }
+    if errors is not None:
+        out['errors'] = dict(errors)
+    return out
+
+
+# ── Virtual users ──────────────────────────────────────────────────────────────
+
+async def virtual_user(client, scenario, token, symbols, rng, deadline, recorder):
+    flows   = scenario['flows']
+    weights = [f.get('weight', 1) for f in flows]
+    think   = float(scenario.get('think_time', 0))
+    auth    = {'Authorization': f"Bearer {token}"} if token else {}
+
+    while time.perf_counter() < deadline:
+        flow       = rng.choices(flows, weights)[0]
+        env        = draw_vars(flow.get('vars'), symbols, rng)
+        flow_start = time.perf_counter()
+        for label, method, path, params, body, needs_auth in expand_steps(flow, env):
+            started = time.perf_counter()
+            try:
+                resp   = await client.request(method, path, params=params, json=body,
+                                              headers=auth if needs_auth else None)
+                status = resp.status_code
+            except httpx.HTTPError:
+                status = None
+            recorder.request(label, started, (time.perf_counter() - started) * 1000, status)
+        recorder.flow(flow['name'], flow_start, (time.perf_counter() - flow_start) * 1000)
+        if think:
+            await asyncio.sleep(think)
+
+
+async def run_load(client, scenario, tokens, symbols, concurrency, duration, warmup, seed):
+    start    = time.perf_counter()
+    recorder = Recorder(measure_from=start + warmup)
+    deadline = start + warmup + duration
+    await asyncio.gather(*[
+        virtual_user(client, scenario, tokens[i % len(tokens)] if tokens else None,
+                     symbols, random.Random(seed + i), deadline, recorder)
+        for i in range(concurrency)
+    ])
+    # Requests in flight at the deadline finish late; count the real window
+    window = max(time.perf_counter() - recorder.measure_from, 1e-9)
+    return recorder, window
+
+
+# ── Local stack & users ────────────────────────────────────────────────────────
+
+def prepare_local_stack(args):
+    """Fixture DB + models; returns the symbol universe. Must run before backend imports."""
+    from benchmarks import fixtures
+    from data.synthetic import universe
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    db_url    = fixtures.build_database(
+        os.path.join(args.work_dir, f"md-{args.db_symbols}x{args.rows}.sqlite"), args.db_symbols, args.rows
+    )
+    model_dir = fixtures.build_model_dir(os.path.join(args.work_dir, 'models'))
+    fixtures.use_local_stack(db_url)
+    os.environ['MODEL_DIR'] = model_dir
+    return universe(args.db_symbols)
+
+
+def create_users(n):
+    """n load-test accounts (reused across runs) and a bearer token for each."""
+    from backend.services import authservice
+
+    hashed, tokens = None, []
+    for i in range(n):
+        email = f"loadtest{i:03d}@example.com"
+        user  = authservice.get_user_by_email(email)
+        if user is None:
+            hashed = hashed or authservice.get_password_hash(LOADTEST_PASSWORD)
+            user   = authservice.insert_user(f"loadtest{i:03d}", email, hashed)
+        tokens.append(authservice.create_access_token({'sub': str(user['id'])}))
+    return tokens
+
+
+async def seed_watchlists(client, tokens, symbols, size):
+    add = symbols[:size]
+    for token in tokens:
+        resp = await client.post('/api/watchlist/bulk', json={'add': add, 'remove': []},
+                                 headers={'Authorization': f"Bearer {token}"})
+        resp.raise_for_status()
+
+
+def start_server(port, workers):
+    cmd = [sys.executable, '-m', 'uvicorn', 'backend.main:app',
+           '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--log-level', 'warning']
+    return subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=os.environ.copy())
+
+
+async def wait_ready(client, timeout):
+    """Poll /health/ready until the models are warm."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get('/health/ready')).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"server not ready after {timeout}s")
+
+
+# ── Reporting ──────────────────────────────────────────────────────────────────
+
+def print_table(title, rows, count='reqs'):
+    print(f"{title:<34}{count:>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  errors")
+    for name, r in rows.items():
+        if not r.get('requests'):
+            print(f"{name:<34}{0:>7}")
+            continue
+        errors = ', '.join(f"{k}×{v}" for k, v in r.get('errors', {}).items()) or '—'
+        print(f"{name:<34}{r['requests']:>7}{r['throughput']:>9.1f}{r['p50_ms']:>7.0f}ms"
+              f"{r['p95_ms']:>7.0f}ms{r['p99_ms']:>7.0f}ms{r['max_ms']:>7.0f}ms  {errors}")
+
+
+def compare(current, previous):
+    print(f"{'route':<34}{'req/s':>14}{'p50':>16}{'p95':>16}{'p99':>16}")
+    for name, cur in current['routes'].items():
+        prev = previous.get('routes', {}).get(name)
+        if not prev or not prev.get('requests') or not cur.get('requests'):
+            continue
+        cells = [f"{cur['throughput']:>7.1f} {cur['throughput'] / prev['throughput'] - 1:>+5.0%}"]
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            cells.append(f"{cur[key]:>7.0f}ms {cur[key] / max(prev[key], 1e-9) - 1:>+5.0%}")
+        print(f"{name:<34}" + ''.join(f"{c:>16}" for c in cells))
+
+
+# ── Main ───────────────────────────────────────────────────────────────────────
+
+async def main_async(args):
+    with open(args.scenarios) as f:
+        scenario = yaml.safe_load(f)
+    setup = scenario.get('setup', {})
+
+    server = None
+    if args.url:
+        base_url  = args.url.rstrip('/')
+        transport = None
+    else:
+        prepare_local_stack(args)
+        if args.serve:
+            base_url  = f"http://127.0.0.1:{args.port}"
+            transport = None
+            server    = start_server(args.port, args.workers)
+        else:
+            from backend.main import app
+            from backend.services import warmup
+            # ASGITransport does not run the lifespan — warm the models here instead
+            await asyncio.to_thread(warmup.warm_up_models)
+            base_url  = 'http://loadtest'
+            transport = httpx.ASGITransport(app=app)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits,
+                                     timeout=args.timeout) as client:
+            if server is not None or args.url:
+                await wait_ready(client, args.ready_timeout)
+            symbols = [s['symbol'] for s in (await client.get('/api/stocks/')).json()]
+            tokens  = await asyncio.to_thread(create_users, setup.get('users', 1))
+            await seed_watchlists(client, tokens, symbols, setup.get('watchlist_size', 5))
+
+            print(f"Target {base_url} | {len(symbols)} symbols | {len(tokens)} users | "
+                  f"concurrency {args.concurrency} | {args.warmup:.0f}s warm-up + {args.duration:.0f}s")
+            recorder, window = await run_load(
+                client, scenario, tokens, symbols, args.concurrency,
+                args.duration, args.warmup, args.seed
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    total = sum(len(v) for v in recorder.routes.values())
+    results = {
+        'created':  datetime.now().isoformat(timespec='seconds'),
+        'target':   'in-process' if transport is not None else base_url,
+        'config':   {'concurrency': args.concurrency, 'duration': args.duration, 'warmup': args.warmup,
+                     'workers': args.workers if args.serve else None, 'scenarios': os.path.basename(args.scenarios),
+                     'seed': args.seed},
+        'window_s': round(window, 2),
+        'total':    {'requests': total, 'throughput': round(total / window, 2)},
+        'routes':   {k: summarize(v, recorder.errors.get(k, {}), window) for k, v in sorted(recorder.routes.items())},
+        'flows':    {k: summarize(v, None, window) for k, v in sorted(recorder.flows.items())},
+    }
+
+    print("=" * 94)
+    print_table('route', results['routes'])
+    print("-" * 94)
+    print_table('flow', results['flows'], count='runs')
+    print("=" * 94)
+    print(f"Total {total} requests in {window:.1f}s → {results['total']['throughput']:.1f} req/s")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✓ Results → {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"\nvs {args.compare} (concurrency {previous['config']['concurrency']})")
+        compare(results, previous)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay frontend flows against the API under load")
+    parser.add_argument('--scenarios',         default=SCENARIOS_PATH)
+    parser.add_argument('-c', '--concurrency', type=int,   default=16, help="virtual users")
+    parser.add_argument('--duration',          type=float, default=60, help="measured seconds")
+    parser.add_argument('--warmup',            type=float, default=10, help="unmeasured seconds first")
+    parser.add_argument('--url',               default=None, help="existing server (default: in-process)")
+    parser.add_argument('--serve',             action='store_true', help="start uvicorn on localhost")
+    parser.add_argument('--workers',           type=int,   default=1)
+    parser.add_argument('--port',              type=int,   default=8011)
+    parser.add_argument('--db-symbols',        type=int,   default=50, help="symbols in the fixture DB")
+    parser.add_argument('--rows',              type=int,   default=2500, help="bars per fixture symbol")
+    parser.add_argument('--work-dir',          default=os.path.join(tempfile.gettempdir(), 'stock-bench'))
+    parser.add_argument('--timeout',           type=float, default=120, help="per-request timeout")
+    parser.add_argument('--ready-timeout',     type=float, default=300)
+    parser.add_argument('--seed',              type=int,   default=0)
+    parser.add_argument('--out',               default=None, help="results JSON (default benchmarks/results/loadtest-<ts>.json)")
+    parser.add_argument('--compare',           default=None, help="previous results JSON")
+    args = parser.parse_args()
+    if args.url and args.serve:
+        parser.error("--url and --serve are mutually exclusive")
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+# benchmarks/suite.py
+#
+# Hot-path benchmarks on synthetic data: denoising, feature engineering,
+# sequence building, one training epoch per network and the two prediction
+# services. Each case runs in a fresh process so its peak RSS is its own.
+#
+#   python benchmarks/suite.py                                   # all cases → benchmarks/results/<ts>.json
+#   python benchmarks/suite.py --only 'predict*' --repeats 10
+#   python benchmarks/suite.py --rows 5000 --train-samples 32768
+#   python benchmarks/suite.py --baseline benchmarks/baseline.json   # exit 1 on regression
+#   python benchmarks/suite.py --save-baseline                   # overwrite benchmarks/baseline.json
+#
+# Nothing here touches Postgres, yfinance or saved_models/: the market DB is
+# a throwaway SQLite file seeded by data/synthetic.py and the models are
+# random-weight copies of the production architectures (benchmarks/fixtures.py).
+
+import io
+import os
+import sys
+import json
+import time
+import fnmatch
+import contextlib
+import platform
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+BENCH_DIR     = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR   = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+MIN_SAMPLE_S  = 0.2
+
+CASES = {}
+
+
+def case(name, unit, max_repeats=None):
+    """
+    Register a benchmark. The decorated setup(cfg) runs untimed and returns
+    (fn, units): fn() is the timed call, units how many `unit`s one call processes.
+    """
+    def register(setup):
+        CASES[name] = {'setup': setup, 'unit': unit, 'max_repeats': max_repeats}
+        return setup
+    return register
+
+
+# ── Data & features ────────────────────────────────────────────────────────────
+
+@case('wavelet_denoise', 'rows')
+def _wavelet(cfg):
+    from benchmarks.fixtures import raw_bars
+    from data.data_loader import wavelet_denoise
+
+    close = raw_bars(rows=cfg['rows'])['close_price'].values
+    return (lambda: wavelet_denoise(close)), len(close)
+
+
+@case('add_technical_indicators', 'rows')
+def _indicators(cfg):
+    from benchmarks.fixtures import raw_bars
+    from data.feature_engineering import FeatureEngineer
+
+    df, engineer = raw_bars(rows=cfg['rows']), FeatureEngineer()
+    return (lambda: engineer.add_technical_indicators(df)), len(df)
+
+
+@case('add_extra_features', 'rows')
+def _extra_features(cfg):
+    from benchmarks.fixtures import raw_bars, offline_loader
+
+    loader = offline_loader()
+    df     = loader.feature_engineer.add_technical_indicators(raw_bars(rows=cfg['rows']))
+    return (lambda: loader._add_extra_features(df.copy())), len(df)
+
+
+@case('load_stock_data', 'rows')
+def _load_stock_data(cfg):
+    # SQL read + denoise + indicators + extra features, as the services call it
+    from data.data_loader import StockDataLoader
+
+    loader = StockDataLoader()
+    rows   = len(loader.load_stock_data(cfg['symbol']))
+    return (lambda: loader.load_stock_data(cfg['symbol'])), rows
+
+
+# ── Sequence builders ──────────────────────────────────────────────────────────
+
+def _sequence_inputs(cfg):
+    from benchmarks.fixtures import engineered_frame
+    from training.trainlarge import detect_feature_cols
+
+    df = engineered_frame(rows=cfg['rows'])
+    return df, detect_feature_cols(df)
+
+
+@case('create_return_sequences', 'sequences')
+def _return_sequences(cfg):
+    from training.trainlarge import create_return_sequences
+
+    df, cols = _sequence_inputs(cfg)
+    return (lambda: create_return_sequences(df, cols)), len(create_return_sequences(df, cols)[0])
+
+
+@case('create_multi_horizon_sequences', 'sequences')
+def _multi_horizon_sequences(cfg):
+    from training.trainlarge import create_multi_horizon_sequences
+
+    df, cols = _sequence_inputs(cfg)
+    return (lambda: create_multi_horizon_sequences(df, cols)), len(create_multi_horizon_sequences(df, cols)[0])
+
+
+@case('create_sequences_ensemble', 'sequences')
+def _ensemble_sequences(cfg):
+    from training.train_ensemble import create_sequences
+
+    df, cols = _sequence_inputs(cfg)
+    return (lambda: create_sequences(df, cols)), len(create_sequences(df, cols)[0])
+
+
+# ── Training epochs ────────────────────────────────────────────────────────────
+
+def _training_set(cfg):
+    from benchmarks.fixtures import training_set
+    return training_set(cfg['train_samples'], cfg['rows'])
+
+
+@case('train_epoch_lstm', 'samples', max_repeats=3)
+def _train_lstm(cfg):
+    import torch
+    from torch.utils.data import DataLoader
+    from models.hybrid_lstm_gru import HybridLSTMGRU
+    from training import trainlarge
+    from training.dataset import StockSequenceDataset
+    from training.engine import Trainer
+
+    torch.manual_seed(0)
+    X, y   = _training_set(cfg)
+    loader = DataLoader(StockSequenceDataset(X, y), batch_size=trainlarge.BATCH_SIZE, shuffle=True)
+    model  = HybridLSTMGRU(input_size=X.shape[2], hidden_size=trainlarge.HIDDEN_SIZE,
+                           num_layers=trainlarge.NUM_LAYERS, dropout=trainlarge.DROPOUT)
+    # Same trainer, loss and optimizer as trainlarge.train()
+    trainer = Trainer(model, trainlarge.DirectionalLoss(mse_weight=0.4, dir_weight=0.6),
+                      torch.optim.Adam(model.parameters(), lr=trainlarge.LEARNING_RATE),
+                      device='cpu', precision=cfg['precision'])
+    return (lambda: trainer.train_epoch(loader)), len(X)
+
+
+@case('train_epoch_cnn', 'samples', max_repeats=3)
+def _train_cnn(cfg):
+    import torch
+    from torch.utils.data import DataLoader, TensorDataset
+    from models.cnn1d_model import CNN1DModel
+    from training import train_ensemble
+    from training.engine import Trainer
+
+    torch.manual_seed(0)
+    X, y   = _training_set(cfg)
+    loader = DataLoader(TensorDataset(torch.FloatTensor(X), torch.FloatTensor((y > 0).astype(np.float32))),
+                        batch_size=train_ensemble.BATCH_SIZE, shuffle=True)
+    model   = CNN1DModel(input_size=X.shape[2], seq_len=train_ensemble.SEQUENCE_LENGTH)
+    # Same trainer, loss and optimizer as train_ensemble.train_cnn()
+    trainer = Trainer(model, torch.nn.BCEWithLogitsLoss(), torch.optim.Adam(model.parameters(), lr=0.001),
+                      device='cpu', precision=cfg['precision'], target_threshold=0.5)
+    return (lambda: trainer.train_epoch(loader)), len(X)
+
+
+# ── Serving ────────────────────────────────────────────────────────────────────
+
+def _predict_case(days_ahead):
+    def setup(cfg):
+        from backend.services import prediction_service
+        from backend.services.prediction_service import PredictionService
+
+        service = PredictionService(model_dir=cfg['model_dir'], version='bench')
+        service.warm_up()
+        symbols = cfg['predict_symbols']
+
+        def run():
+            # Uncached path: the TTL cache would otherwise turn repeats into dict copies
+            for symbol in symbols:
+                prediction_service._prediction_cache.clear()
+                if service.predict(symbol, days_ahead) is None:
+                    raise RuntimeError(f"predict({symbol}, {days_ahead}) returned None")
+        return run, len(symbols)
+    return setup
+
+
+for _days in (5, 30, 365):
+    case(f'predict_h{_days}', 'predictions')(_predict_case(_days))
+
+
+@case('ensemble_predict', 'predictions')
+def _ensemble_predict(cfg):
+    from backend.services import ensemble_service
+    from backend.services.ensemble_service import EnsemblePredictionService
+
+    service = EnsemblePredictionService(model_dir=cfg['model_dir'], version='bench')
+    service.warm_up()
+    symbols = cfg['predict_symbols']
+
+    def run():
+        for symbol in symbols:
+            ensemble_service._signal_cache.clear()
+            if service.predict(symbol) is None:
+                raise RuntimeError(f"ensemble predict({symbol}) returned None")
+    return run, len(symbols)
+
+
+# ── Runner ─────────────────────────────────────────────────────────────────────
+
+def _memory_mb(field):
+    """
+    VmRSS / VmHWM from /proc on Linux. ru_maxrss is not used there: it keeps
+    the high-water mark of the parent the worker was forked from.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss     # bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(name, cfg):
+    """Runs in a fresh worker process: setup, one warm-up call, then `repeats` timed calls."""
+    from benchmarks.fixtures import use_local_stack
+
+    use_local_stack(cfg['db_url'])
+    if cfg['threads']:
+        os.environ['INFERENCE_THREADS'] = str(cfg['threads'])
+        import torch
+        torch.set_num_threads(cfg['threads'])
+
+    spec    = CASES[name]
+    repeats = min(cfg['repeats'], spec['max_repeats'] or cfg['repeats'])
+    # Service start-up / per-call prints would interleave with the table
+    with contextlib.redirect_stdout(sys.stdout if cfg['verbose'] else io.StringIO()):
+        fn, units  = spec['setup'](cfg)
+        rss_before = _memory_mb('VmRSS')
+        # Sub-millisecond calls are looped so each sample spans MIN_SAMPLE_S
+        start = time.perf_counter()
+        fn()
+        number = max(1, int(MIN_SAMPLE_S / max(time.perf_counter() - start, 1e-9)))
+        times  = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+
+    wall = float(np.median(times))
+    return {
+        'wall_s':        round(wall, 6),
+        'wall_min_s':    round(float(np.min(times)), 6),
+        'repeats':       repeats,
+        'number':        number,
+        'units':         int(units),
+        'unit':          spec['unit'],
+        'throughput':    round(units / wall, 3),
+        'setup_rss_mb':  round(rss_before, 1),
+        'peak_rss_mb':   round(_memory_mb('VmHWM'), 1),
+    }
+
+
+def machine_info():
+    import torch
+    return {
+        'platform':  platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus':      os.cpu_count(),
+        'python':    platform.python_version(),
+        'numpy':     np.__version__,
+        'torch':     torch.__version__,
+    }
+
+
+def compare(results, baseline, tolerance, rss_tolerance):
+    """Print current vs baseline per case. Returns the names of regressed cases."""
+    base_results = baseline.get('results', {})
+    if baseline.get('config', {}).get('sizes') != results['config']['sizes']:
+        print(f"⚠ Baseline was recorded with different sizes: {baseline.get('config', {}).get('sizes')}")
+    if baseline.get('machine', {}).get('processor') != results['machine']['processor']:
+        print("⚠ Baseline was recorded on a different machine — timings are not comparable")
+
+    regressed = []
+    print(f"{'case':<32}{'wall':>10}{'baseline':>10}{'Δ wall':>9}{'peak RSS':>10}{'Δ RSS':>8}")
+    for name, cur in results['results'].items():
+        base = base_results.get(name)
+        if base is None or 'error' in cur or 'error' in base:
+            print(f"{name:<32}{'—':>10}")
+            continue
+        d_wall = cur['wall_s'] / base['wall_s'] - 1
+        d_rss  = cur['peak_rss_mb'] / base['peak_rss_mb'] - 1
+        flag   = d_wall > tolerance or d_rss > rss_tolerance
+        if flag:
+            regressed.append(name)
+        print(f"{name:<32}{cur['wall_s'] * 1000:>8.1f}ms{base['wall_s'] * 1000:>8.1f}ms"
+              f"{d_wall:>+8.0%}{cur['peak_rss_mb']:>8.0f}MB{d_rss:>+7.0%}{'  ✗ REGRESSION' if flag else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data, feature, training and serving hot paths")
+    parser.add_argument('--only',          action='append', help="fnmatch pattern(s) of cases to run")
+    parser.add_argument('--rows',          type=int, default=2500, help="bars per symbol")
+    parser.add_argument('--symbols',       type=int, default=5, help="symbols per prediction repeat")
+    parser.add_argument('--train-samples', type=int, default=8192, help="sequences per training epoch")
+    parser.add_argument('--repeats',       type=int, default=5)
+    parser.add_argument('--threads',       type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--precision',     default='auto', help="training precision (training/engine.py)")
+    parser.add_argument('--work-dir',      default=os.path.join(tempfile.gettempdir(), 'stock-bench'),
+                        help="fixture DB / model cache")
+    parser.add_argument('--out',           default=None, help="results JSON (default benchmarks/results/<ts>.json)")
+    parser.add_argument('--baseline',      default=None, help="compare against this results file")
+    parser.add_argument('--tolerance',     type=float, default=0.20, help="allowed wall-time slowdown")
+    parser.add_argument('--rss-tolerance', type=float, default=0.10, help="allowed peak-RSS growth")
+    parser.add_argument('--save-baseline', action='store_true', help=f"also write {BASELINE_PATH}")
+    parser.add_argument('--verbose',       action='store_true', help="show the services' own output")
+    parser.add_argument('--list',          action='store_true')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(CASES))
+        return
+    names = [n for n in CASES if not args.only or any(fnmatch.fnmatch(n, p) for p in args.only)]
+    if not names:
+        parser.error(f"no case matches {args.only}")
+
+    from benchmarks import fixtures
+    from data.synthetic import universe
+
+    n_db_symbols = max(args.symbols, 5)
+    os.makedirs(args.work_dir, exist_ok=True)
+    t0        = time.perf_counter()
+    db_url    = fixtures.build_database(
+        os.path.join(args.work_dir, f"md-{n_db_symbols}x{args.rows}.sqlite"), n_db_symbols, args.rows
+    )
+    model_dir = fixtures.build_model_dir(os.path.join(args.work_dir, 'models'))
+    print(f"Fixtures ready in {time.perf_counter() - t0:.1f}s ({args.work_dir})")
+
+    sizes = {'rows': args.rows, 'symbols': args.symbols, 'train_samples': args.train_samples}
+    cfg   = {
+        **sizes,
+        'repeats':         args.repeats,
+        'threads':         args.threads,
+        'precision':       args.precision,
+        'verbose':         args.verbose,
+        'db_url':          db_url,
+        'model_dir':       model_dir,
+        'symbol':          universe(1)[0],
+        'predict_symbols': universe(n_db_symbols)[:args.symbols],
+    }
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'config':  {'sizes': sizes, 'repeats': args.repeats, 'threads': args.threads,
+                    'precision': args.precision},
+        'results': {},
+    }
+    ctx = multiprocessing.get_context('spawn')
+    print("=" * 78)
+    print(f"{'case':<32}{'wall p50':>11}{'throughput':>22}{'peak RSS':>16}")
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            try:
+                r = pool.submit(run_case, name, cfg).result()
+            except Exception as e:
+                results['results'][name] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"{name:<32}  ERROR {e}")
+                continue
+        results['results'][name] = r
+        print(f"{name:<32}{r['wall_s'] * 1000:>9.1f}ms{r['throughput']:>12,.0f} {r['unit'] + '/s':<14}"
+              f"{r['peak_rss_mb']:>9.0f}MB")
+    print("=" * 78)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✓ Results → {out}")
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Baseline → {BASELINE_PATH}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        regressed = compare(results, baseline, args.tolerance, args.rss_tolerance)
+        if regressed:
+            print(f"✗ {len(regressed)} regression(s): {', '.join(regressed)}")
+            sys.exit(1)
+        print("✓ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# data/quote_providers.py
+#
+# Price / quote source behind the yfinance call signature, so ingestion and
+# live-price lookups can run offline.
+#
+#   QUOTE_PROVIDER=yfinance   (default) Yahoo Finance
+#   QUOTE_PROVIDER=fake       deterministic synthetic bars (data/synthetic.py),
+#                             continuous with a database seeded by the same module
+#
+#   provider = get_quote_provider()
+#   df = provider.download("TCS.NS", start=..., end=..., progress=False, auto_adjust=False)
+#   df = provider.download(["TCS.NS", "INFY.NS"], period="2d")
+#
+# download() returns the yfinance layout: DatetimeIndex named 'Date' and
+# (Price, Ticker) MultiIndex columns with Open / High / Low / Close /
+# Adj Close / Volume.
+
+import os
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+
+from data import synthetic
+
+
+class YFinanceProvider:
+    name = 'yfinance'
+
+    def download(self, tickers, **kwargs):
+        import yfinance as yf
+        return yf.download(tickers, **kwargs)
+
+
+class FakeQuoteProvider:
+    """
+    Synthetic OHLCV for any ticker. Bars for a symbol are a fixed function
+    of (symbol, date), so repeated and overlapping requests agree with each
+    other and with `python -m data.synthetic`.
+    """
+    name = 'fake'
+
+    _PERIOD_DAYS = {'1d': 1, '2d': 2, '5d': 5, '1mo': 31, '3mo': 92, '6mo': 183,
+                    '1y': 366, '2y': 731, '5y': 1827, '10y': 3653}
+
+    def download(self, tickers, start=None, end=None, period=None, **_ignored):
+        single  = isinstance(tickers, str)
+        tickers = [tickers] if single else list(tickers)
+        end     = pd.Timestamp(end or date.today() + timedelta(days=1)).normalize()
+        if start is None:
+            days  = self._PERIOD_DAYS.get(period or '1mo', 31)
+            # `period` counts trading days for the short ones ('2d' = last two bars)
+            start = (end - pd.tseries.offsets.BDay(days)) if days <= 5 else end - pd.Timedelta(days=days)
+        start = pd.Timestamp(start).normalize()
+
+        frames = {}
+        for ticker in tickers:
+            bars = synthetic.symbol_bars(ticker.removesuffix('.NS'), start.date(), end.date())
+            bars = bars.set_index(pd.DatetimeIndex(pd.to_datetime(bars['trade_date']), name='Date'))
+            frames[ticker] = pd.DataFrame({
+                'Adj Close': bars['close_price'],
+                'Close':     bars['close_price'],
+                'High':      bars['high_price'],
+                'Low':       bars['low_price'],
+                'Open':      bars['open_price'],
+                'Volume':    bars['volume'],
+            })
+
+        out = pd.concat(frames, axis=1, names=['Ticker', 'Price']).swaplevel(axis=1)
+        return out.sort_index(axis=1, level=0, sort_remaining=False)
+
+
+_PROVIDERS = {'yfinance': YFinanceProvider, 'fake': FakeQuoteProvider}
+_provider  = None
+_lock      = threading.Lock()
+
+
+def get_quote_provider():
+    global _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                name = os.environ.get('QUOTE_PROVIDER', 'yfinance').lower()
+                if name not in _PROVIDERS:
+                    raise ValueError(f"Unknown QUOTE_PROVIDER '{name}' (expected {' | '.join(_PROVIDERS)})")
+                _provider = _PROVIDERS[name]()
+    return _provider
@@ -0,0 +1,208 @@
+# data/synthetic.py
+#
+# Synthetic NSE-like daily OHLCV for offline development, benchmarks and load
+# tests. Each symbol is a one-factor model:
+#
+#   r_t = β·m_t + ε_t,   ε_t = σ_t·z_t,   σ²_t = ω + α·ε²_{t-1} + b·σ²_{t-1}
+#
+# with Student-t (ν=4) shocks for fat tails, GARCH(1,1) volatility
+# clustering, a shared market factor m_t (itself GARCH), overnight gaps,
+# intraday ranges that scale with σ_t and volume that spikes with |r_t|.
+# Some symbols list part-way through the calendar.
+#
+# Every series is a pure function of (seed, symbol) over a fixed business-day
+# calendar starting CALENDAR_START, so any date slice is reproducible — the
+# fake quote provider (data/quote_providers.py) continues exactly the bars a
+# seeded database holds.
+#
+#   python -m data.synthetic                                   # 480 symbols since 1990 → ~4.2M rows
+#   python -m data.synthetic --symbols 50 --start 2015-01-01
+#   MARKET_DATA_BACKEND=sqlite python -m data.synthetic        # into local_data/market_data.sqlite
+
+import os
+import sys
+import time
+import zlib
+import argparse
+from datetime import date
+from functools import lru_cache
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_START = date(1990, 1, 1)
+SEED           = int(os.environ.get('SYNTHETIC_SEED', 7))
+T_DOF          = 4
+
+# Real tickers first so scripts that hard-code them (evaluate_test.py, ...) find data
+NAMED_SYMBOLS = (
+    'RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'ICICIBANK', 'SBIN', 'WIPRO', 'TITAN',
+    'MARUTI', 'BAJFINANCE', 'AXISBANK', 'LT', 'SUNPHARMA', 'HCLTECH', 'KOTAKBANK',
+    'ITC', 'HINDUNILVR', 'BHARTIARTL', 'ASIANPAINT', 'NESTLEIND',
+)
+# Late listings are placed within this span so they don't move as the calendar grows
+LISTING_SPAN = int(np.busday_count(CALENDAR_START, date(2024, 1, 1)))
+
+
+def universe(n_symbols):
+    names = list(NAMED_SYMBOLS[:n_symbols])
+    names += [f"SYN{i:04d}" for i in range(1, n_symbols - len(names) + 1)]
+    return names
+
+
+def _rng(*keys):
+    """Independent, reproducible stream per (seed, keys…)."""
+    return np.random.default_rng([SEED] + [zlib.crc32(str(k).encode()) for k in keys])
+
+
+def _calendar_len(end):
+    """Business days in [CALENDAR_START, end)."""
+    return int(np.busday_count(CALENDAR_START, end))
+
+
+def _garch(z, omega, alpha, beta):
+    """σ_t path and returns for innovations z (prefix-stable: σ_t only depends on z[:t])."""
+    n      = len(z)
+    sigma2 = np.empty(n)
+    eps    = np.empty(n)
+    s2     = omega / (1 - alpha - beta)
+    for t in range(n):
+        sigma2[t] = s2
+        eps[t]    = np.sqrt(s2) * z[t]
+        s2        = omega + alpha * eps[t] ** 2 + beta * s2
+    return np.sqrt(sigma2), eps
+
+
+def _t_shocks(rng, n):
+    # Unit-variance Student-t
+    return rng.standard_t(T_DOF, size=n) / np.sqrt(T_DOF / (T_DOF - 2))
+
+
+@lru_cache(maxsize=4)
+def _market(n):
+    """Shared market-factor daily returns (~16% annual vol, clustered)."""
+    z = _t_shocks(_rng('MARKET', 'z'), n)
+    _, eps = _garch(z, omega=1.0e-6, alpha=0.09, beta=0.90)
+    return eps + 0.10 / 252
+
+
+@lru_cache(maxsize=512)
+def _symbol_path(symbol, n):
+    """Full-calendar OHLCV arrays for `symbol` over the first `n` business days."""
+    out_n = n
+    n     = max(n, LISTING_SPAN)     # always simulate through the price anchor
+    p     = _rng(symbol, 'params')
+    beta       = p.uniform(0.5, 1.5)
+    idio_vol   = p.uniform(0.12, 0.35) / np.sqrt(252)
+    drift      = p.normal(0.05, 0.06) / 252
+    alpha      = p.uniform(0.05, 0.12)
+    persist    = p.uniform(0.85, 0.97 - alpha)
+    omega      = idio_vol ** 2 * (1 - alpha - persist)
+    # Price level is pinned at the end of LISTING_SPAN so 36 years of drift
+    # can't leave a symbol at ₹0.01 or ₹10⁶
+    anchor_px  = float(np.exp(p.uniform(np.log(20), np.log(3000))))
+    base_vol   = float(np.exp(p.uniform(np.log(5e4), np.log(2e7))))
+    # ~30% of the universe lists part-way through the calendar
+    listing    = int(p.uniform(0, 0.6) * LISTING_SPAN) if p.random() < 0.3 else 0
+
+    sigma, eps = _garch(_t_shocks(_rng(symbol, 'z'), n), omega, alpha, persist)
+    market     = _market(n)
+    ret        = beta * market + eps + drift
+    total_sig  = np.sqrt(sigma ** 2 + (beta * 0.01) ** 2)
+    typical    = np.sqrt(idio_vol ** 2 + (beta * 0.01) ** 2)
+
+    # Separate streams per quantity keep every array prefix-stable in n
+    log_px   = np.cumsum(ret)
+    start_px = anchor_px * np.exp(-log_px[LISTING_SPAN - 1])
+    close    = start_px * np.exp(log_px)
+    gap   = _rng(symbol, 'gap').normal(0, 0.3, n) * total_sig
+    open_ = np.concatenate([[start_px], close[:-1]]) * np.exp(gap)
+    high  = np.maximum(open_, close) * np.exp(np.abs(_rng(symbol, 'high').normal(0, 0.5, n)) * total_sig)
+    low   = np.minimum(open_, close) * np.exp(-np.abs(_rng(symbol, 'low').normal(0, 0.5, n)) * total_sig)
+
+    noise  = _rng(symbol, 'volume').normal(0, 0.35, n)
+    volume = base_vol * np.exp(noise) * (1 + 6 * np.abs(ret) / typical)
+
+    return {
+        'listing': listing,
+        'open_price': open_[:out_n], 'high_price': high[:out_n], 'low_price': low[:out_n],
+        'close_price': close[:out_n], 'volume': volume[:out_n].astype(np.int64),
+    }
+
+
+def symbol_bars(symbol, start, end):
+    """DataFrame of bars for business days in [start, end), in stock_prices column layout."""
+    start = max(pd.Timestamp(start).date(), CALENDAR_START)
+    end   = pd.Timestamp(end).date()
+    n     = _calendar_len(end)
+    cols  = ['symbol', 'trade_date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume']
+    if n <= 0 or start >= end:
+        return pd.DataFrame(columns=cols)
+
+    path  = _symbol_path(symbol, n)
+    first = max(_calendar_len(start), path['listing'])
+    dates = np.busday_offset(CALENDAR_START, np.arange(first, n), roll='forward')
+    df    = pd.DataFrame({k: path[k][first:n] for k in cols[2:]})
+    df.insert(0, 'trade_date', dates.astype('datetime64[D]').astype(object))
+    df.insert(0, 'symbol', symbol)
+    return df.round({'open_price': 2, 'high_price': 2, 'low_price': 2, 'close_price': 2})
+
+
+def write_universe(engine, symbols, start, end, chunk_rows=200_000):
+    """Replace `symbols` in stock_master / stock_prices with synthetic bars. Returns rows written."""
+    from sqlalchemy import text
+
+    # Driver-level executemany with plain tuples — dict-per-row binding dominates otherwise
+    ph     = '?' if engine.dialect.paramstyle == 'qmark' else '%s'
+    insert = (
+        "INSERT INTO stock_prices (symbol, trade_date, open_price, high_price, "
+        f"low_price, close_price, volume) VALUES ({', '.join([ph] * 7)})"
+    )
+    total, pending = 0, []
+
+    def flush(conn):
+        if pending:
+            conn.exec_driver_sql(insert, pending)
+            pending.clear()
+
+    with engine.begin() as conn:
+        for symbol in symbols:
+            conn.execute(text("DELETE FROM stock_prices WHERE symbol = :s"), {'s': symbol})
+            conn.execute(text("DELETE FROM stock_master WHERE symbol = :s"), {'s': symbol})
+            conn.execute(
+                text("INSERT INTO stock_master (symbol, ysymbol) VALUES (:s, :y)"),
+                {'s': symbol, 'y': f"{symbol}.NS"}
+            )
+            bars = symbol_bars(symbol, start, end)
+            bars['trade_date'] = pd.to_datetime(bars['trade_date']).dt.strftime('%Y-%m-%d')
+            bars['volume']     = bars['volume'].astype(object)    # plain int for the driver
+            pending.extend(bars.itertuples(index=False, name=None))
+            total += len(bars)
+            if len(pending) >= chunk_rows:
+                flush(conn)
+        flush(conn)
+    return total
+
+
+def main():
+    from data.backends import get_engine
+
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic OHLCV")
+    parser.add_argument('--symbols', type=int, default=480)
+    parser.add_argument('--start',   default=CALENDAR_START.isoformat())
+    parser.add_argument('--end',     default=date.today().isoformat(), help="exclusive")
+    parser.add_argument('--db',      default=None, help="SQLAlchemy URL (default: data.backends.get_db_url())")
+    args = parser.parse_args()
+
+    engine  = get_engine(args.db)
+    symbols = universe(args.symbols)
+    print(f"Generating {len(symbols)} symbols {args.start} → {args.end} into {engine.url!r}")
+
+    t0   = time.perf_counter()
+    rows = write_universe(engine, symbols, args.start, args.end)
+    print(f"✓ {rows:,} rows in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# evaluate_precision.py
+#
+# Accuracy-parity check for reduced-precision CPU serving. Scores the same
+# out-of-sample windows as evaluate_test.py with fp32, dynamic-int8 and (where
+# the CPU supports it) bf16 LSTM/CNN models, and reports the directional
+# metrics, agreement with fp32, latency and model size for each.
+#
+#   python evaluate_precision.py
+#   python evaluate_precision.py --max-acc-drop 0.5     # non-zero exit if exceeded
+
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import io
+import time
+import argparse
+
+import torch
+import numpy as np
+
+from data.data_loader import StockDataLoader
+from models.export import quantize_dynamic_int8, cpu_supports_bf16
+from evaluate_test import (
+    TEST_SYMBOLS, load_models, build_test_set, ensemble_predict, directional_metrics
+)
+
+
+class _BF16(torch.nn.Module):
+    """Wrap a model so its forward pass runs under CPU bf16 autocast."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        with torch.autocast('cpu', dtype=torch.bfloat16):
+            return self.model(x)
+
+
+def model_size_mb(model):
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell() / 1e6
+
+
+def step_latency_ms(model, n_features, seq_len, repeats=50):
+    """Median latency of the per-step (batch=1) forward used by PredictionService, on `seq_len`-day windows."""
+    X = torch.zeros(1, seq_len, n_features)
+    with torch.inference_mode():
+        for _ in range(5):
+            model(X)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(X)
+            times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 vs int8 / bf16 accuracy parity")
+    parser.add_argument('--max-acc-drop', type=float, default=None,
+                        help="Fail if any variant loses more than this many accuracy points")
+    args = parser.parse_args()
+
+    device = torch.device('cpu')
+    models = load_models(device)
+    n_feat = len(models['feature_cols'])
+
+    variants = {'fp32': (models['lstm'], models['cnn'])}
+    variants['int8'] = (quantize_dynamic_int8(models['lstm']), quantize_dynamic_int8(models['cnn']))
+    if cpu_supports_bf16():
+        variants['bf16'] = (_BF16(models['lstm']), _BF16(models['cnn']))
+    else:
+        print("CPU lacks native bf16 — skipping bf16 variant.")
+
+    loader = StockDataLoader()
+    y_true = []
+    y_pred = {name: [] for name in variants}
+
+    for symbol in TEST_SYMBOLS:
+        df = loader.load_stock_data(symbol)
+        if df is None or len(df) < 300:
+            continue
+        X_test, y_test = build_test_set(df, models['feature_cols'])
+        if len(X_test) < 20:
+            continue
+        y_true.extend(y_test)
+        for name, (lstm, cnn) in variants.items():
+            y_pred[name].extend(ensemble_predict(models, X_test, device, lstm_model=lstm, cnn_model=cnn))
+        print(f"  {symbol:<12} n={len(y_test)}")
+
+    y_true = np.array(y_true)
+    base   = np.array(y_pred['fp32'])
+    base_m = directional_metrics(y_true, base)
+
+    print("\n" + "=" * 86)
+    print(f"  {'variant':<8}{'acc':>8}{'Δacc':>8}{'UP':>8}{'DOWN':>8}{'F1':>8}"
+          f"{'agree':>9}{'lstm ms':>10}{'cnn ms':>9}{'size MB':>10}")
+    print("=" * 86)
+    worst_drop = 0.0
+    for name, (lstm, cnn) in variants.items():
+        pred  = np.array(y_pred[name])
+        m     = directional_metrics(y_true, pred)
+        delta = m['acc'] - base_m['acc']
+        worst_drop = max(worst_drop, -delta)
+        agree = (pred == base).mean() * 100
+        size  = model_size_mb(lstm) + model_size_mb(cnn)
+        lstm_ms = step_latency_ms(lstm, n_feat, models['lstm_seq_len'])
+        cnn_ms  = step_latency_ms(cnn,  n_feat, models['cnn_seq_len'])
+        print(f"  {name:<8}{m['acc']:>7.2f}%{delta:>+7.2f}{m['up_acc']:>7.1f}%{m['down_acc']:>7.1f}%"
+              f"{m['f1']:>7.1f}%{agree:>8.2f}%{lstm_ms:>10.2f}{cnn_ms:>9.2f}{size:>10.1f}")
+    print("=" * 86)
+    print(f"  Samples: {len(y_true):,}  |  worst accuracy drop vs fp32: {worst_drop:.2f} pts")
+
+    if args.max_acc_drop is not None and worst_drop > args.max_acc_drop:
+        print(f"  FAIL — exceeds --max-acc-drop {args.max_acc_drop}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# evaluate_student.py
+#
+# Latency / accuracy report for the distilled student (training/distill.py)
+# against its HybridLSTMGRU teacher, on the same out-of-sample windows as
+# evaluate_test.py. The student is scored alone (sign of its return output)
+# and inside the ensemble in place of the teacher LSTM, which is how
+# PredictionService serves it.
+#
+#   python evaluate_student.py
+#   python evaluate_student.py --max-acc-drop 1.0      # non-zero exit if exceeded
+
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import argparse
+
+import torch
+import numpy as np
+
+from data.data_loader import StockDataLoader
+from models.hybrid_lstm_gru import count_parameters
+from models.export import load_torchscript
+from models.inference import predict_array
+from models.student import STUDENT_TS_NAME, load_student
+from evaluate_precision import model_size_mb, step_latency_ms
+from evaluate_test import (
+    TEST_SYMBOLS, load_models, build_test_set, ensemble_predict, directional_metrics
+)
+
+
+def batch_latency_ms(model, n_features, seq_len, batch_size=64, repeats=20):
+    """Median latency of one batched forward (the watchlist / batch routes) on `seq_len`-day windows."""
+    X = torch.zeros(batch_size, seq_len, n_features)
+    with torch.inference_mode():
+        for _ in range(3):
+            model(X)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(X)
+            times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def report(model_dir='saved_models', max_acc_drop=None):
+    """Print the teacher-vs-student table; returns the worst ensemble accuracy drop in points."""
+    device  = torch.device('cpu')
+    models  = load_models(device)
+    student, cfg = load_student(model_dir, device)
+    if student is None:
+        print(f"No student in {model_dir} — run training/distill.py first.")
+        return None
+    n_feat = len(models['feature_cols'])
+
+    variants = {'teacher': models['lstm'], f"student-{cfg['arch']}": student}
+    ts_path  = os.path.join(model_dir, STUDENT_TS_NAME)
+    if os.path.exists(ts_path):
+        variants[f"student-{cfg['arch']}-ts"] = load_torchscript(ts_path, device)
+    # Window length each variant was trained on — the latency columns time that shape
+    seq_lens = {name: cfg.get('sequence_length', models['lstm_seq_len']) for name in variants}
+    seq_lens['teacher'] = models['lstm_seq_len']
+
+    loader  = StockDataLoader()
+    y_true  = []
+    alone   = {name: [] for name in variants}
+    y_pred  = {name: [] for name in variants}
+
+    for symbol in TEST_SYMBOLS:
+        df = loader.load_stock_data(symbol)
+        if df is None or len(df) < 300:
+            continue
+        X_test, y_test = build_test_set(df, models['feature_cols'])
+        if len(X_test) < 20:
+            continue
+        y_true.extend(y_test)
+        for name, lstm in variants.items():
+            alone[name].extend((predict_array(lstm, X_test, device) > 0).astype(int))
+            y_pred[name].extend(ensemble_predict(models, X_test, device, lstm_model=lstm))
+        print(f"  {symbol:<12} n={len(y_test)}")
+
+    if not y_true:
+        print("No test windows — is the database populated?")
+        return None
+
+    y_true = np.array(y_true)
+    base   = np.array(y_pred['teacher'])
+    base_m = directional_metrics(y_true, base)
+
+    print("\n" + "=" * 96)
+    print(f"  {'model':<18}{'params':>10}{'MB':>7}{'alone':>8}{'ens acc':>9}{'Δacc':>7}"
+          f"{'F1':>7}{'agree':>8}{'b=1 ms':>9}{'b=64 ms':>9}{'speedup':>9}")
+    print("=" * 96)
+    teacher_ms = step_latency_ms(models['lstm'], n_feat, models['lstm_seq_len'])
+    worst_drop = 0.0
+    for name, lstm in variants.items():
+        pred   = np.array(y_pred[name])
+        m      = directional_metrics(y_true, pred)
+        alone_acc = (np.array(alone[name]) == y_true).mean() * 100
+        delta  = m['acc'] - base_m['acc']
+        worst_drop = max(worst_drop, -delta)
+        agree  = (pred == base).mean() * 100
+        ms     = step_latency_ms(lstm, n_feat, seq_lens[name])
+        eager  = not isinstance(lstm, torch.jit.ScriptModule)
+        params = f"{count_parameters(lstm):>10,}" if eager else f"{'':>10}"
+        size   = f"{model_size_mb(lstm):>7.2f}" if eager else f"{'':>7}"
+        print(f"  {name:<18}{params}{size}{alone_acc:>7.2f}%{m['acc']:>8.2f}%{delta:>+7.2f}"
+              f"{m['f1']:>6.1f}%{agree:>7.2f}%{ms:>9.3f}{batch_latency_ms(lstm, n_feat, seq_lens[name]):>9.2f}"
+              f"{teacher_ms / ms:>8.1f}x")
+    print("=" * 96)
+    print(f"  Samples: {len(y_true):,}  |  alone = sign of the model's own output  |  "
+          f"agree = ensemble agreement with the teacher")
+    print(f"  Worst ensemble accuracy drop vs teacher: {worst_drop:.2f} pts")
+
+    if max_acc_drop is not None and worst_drop > max_acc_drop:
+        print(f"  FAIL — exceeds --max-acc-drop {max_acc_drop}")
+        sys.exit(1)
+    return worst_drop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distilled student vs HybridLSTMGRU teacher")
+    parser.add_argument('--dir', default='saved_models')
+    parser.add_argument('--max-acc-drop', type=float, default=None,
+                        help="Fail if the student ensemble loses more than this many accuracy points")
+    args = parser.parse_args()
+    report(args.dir, args.max_acc_drop)
+
+
+if __name__ == '__main__':
+    main()
@@ -94,23 +94,23 @@ function Watchlist() {
     setError(null);
     setFailedStocks({});
 
-    const results = await Promise.allSettled(
-      watchlist.map(stock =>
-        axios.post(`${API_URL}/api/predict/`, { symbol: stock.value, days_ahead: 7 })
-          .then(res => ({ symbol: stock.value, data: res.data }))
-      )
-    );
-
+    // One request: watchlist + latest prices + batched 7-day forecasts
     const predictionsMap = {};
     const failedMap      = {};
-    results.forEach((result, idx) => {
-      const symbol = watchlist[idx].value;
-      if (result.status === 'fulfilled') {
-        predictionsMap[symbol] = result.value.data;
-      } else {
-        failedMap[symbol] = result.reason?.response?.data?.detail || 'Insufficient data';
-      }
-    });
+    try {
+      const response = await axios.get(`${API_URL}/api/watchlist/forecasts`, {
+        params: { days: 7 }, headers: authHeaders
+      });
+      response.data.items.forEach(item => {
+        if (item.prediction) {
+          predictionsMap[item.symbol] = item.prediction;
+        } else {
+          failedMap[item.symbol] = item.error || 'Insufficient data';
+        }
+      });
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to fetch predictions');
+    }
 
     setPredictions(predictionsMap);
     setFailedStocks(failedMap);
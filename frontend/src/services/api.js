@@ -9,11 +9,17 @@ const api = axios.create({
 
 export const stockAPI = {
   getAllStocks:     ()                      => api.get('/api/stocks'),
-  getHistoricalData: (symbol, limit = 365) => api.get(`/api/stocks/${symbol}/historical`, { params: { limit } }),
+  getHistoricalData: (symbol, limit = 365, opts = {}) =>
+    api.get(`/api/stocks/${symbol}/historical`, { params: { limit, ...opts } }),   // opts: { max_points, downsample, format }
   getLatestPrice:  (symbol)                => api.get(`/api/stocks/${symbol}/latest`),
   predictPrice:    (symbol, daysAhead, headers = {}) =>
     api.post('/api/predict', { symbol, daysahead: daysAhead }, { headers }),
+  // GET form — the browser revalidates with If-None-Match and gets a 304 until new bars / model
+  getPrediction:   (symbol, daysAhead)     => api.get(`/api/predict/${symbol}`, { params: { days_ahead: daysAhead } }),
   checkHealth:     ()                      => api.get('/api/predict/health'),
+  // SSE: 'meta' once, then 'chunk' events with arrays of predictions, then 'done'
+  streamPrediction: (symbol, daysAhead, chunkSize = 10) =>
+    new EventSource(`${API_BASE_URL}/api/predict/${symbol}/stream?days_ahead=${daysAhead}&chunk_size=${chunkSize}`),
 };
 
 export const authAPI = {
@@ -30,6 +36,8 @@ export const watchlistAPI = {
   addToWatchlist:      (symbol, headers) => api.post(`/api/watchlist/${symbol}`, {}, { headers }),
   removeFromWatchlist: (symbol, headers) => api.delete(`/api/watchlist/${symbol}`,   { headers }),
   clearWatchlist:      (headers) => api.delete('/api/watchlist/',        { headers }),
+  getForecasts:        (days, headers) => api.get('/api/watchlist/forecasts', { params: { days }, headers }),
+  bulkUpdate:          (add, remove, headers) => api.post('/api/watchlist/bulk', { add, remove }, { headers }),
 };
 
 export default api;
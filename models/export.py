@@ -0,0 +1,152 @@
+# models/export.py
+#
+# Export HybridLSTMGRU / CNN1DModel to frozen TorchScript for CPU serving.
+#
+#   python models/export.py                 # export from saved_models/
+#   python models/export.py --dir <path>    # export from a registry version
+#
+# Output files (next to the eager checkpoints):
+#   returns_model.ts.pt
+#   cnn1d_model.ts.pt     ← BatchNorm folded into the convolutions
+
+import os
+import sys
+import copy
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from models.hybrid_lstm_gru import HybridLSTMGRU
+from models.cnn1d_model import CNN1DModel
+
+LSTM_TS_NAME = 'returns_model.ts.pt'
+CNN_TS_NAME  = 'cnn1d_model.ts.pt'
+
+
+def fold_batchnorm(cnn_model: CNN1DModel) -> CNN1DModel:
+    """
+    Return an eval-mode copy of the CNN with each BatchNorm1d folded into the
+    preceding Conv1d (w' = w·γ/σ, b' = (b-μ)·γ/σ + β). The BN modules become
+    Identity so forward() is unchanged and three ops per block disappear.
+    """
+    model = copy.deepcopy(cnn_model).eval()
+    for conv_name, bn_name in (('conv1', 'bn1'), ('conv2', 'bn2'), ('conv3', 'bn3')):
+        conv = getattr(model, conv_name)
+        bn   = getattr(model, bn_name)
+        setattr(model, conv_name, fuse_conv_bn_eval(conv, bn))
+        setattr(model, bn_name, nn.Identity())
+    return model
+
+
+def export_torchscript(model, example_input, path):
+    """Trace, freeze and optimise a CPU copy of `model`, then save it to `path`."""
+    model = copy.deepcopy(model).cpu().eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input.cpu())
+        frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    torch.jit.save(frozen, path)
+    return path
+
+
+def export_lstm(model, seq_len, input_size, out_dir):
+    example = torch.zeros(1, seq_len, input_size)
+    return export_torchscript(model, example, os.path.join(out_dir, LSTM_TS_NAME))
+
+
+def export_cnn(model, seq_len, input_size, out_dir):
+    example = torch.zeros(1, seq_len, input_size)
+    return export_torchscript(fold_batchnorm(model), example, os.path.join(out_dir, CNN_TS_NAME))
+
+
+def quantize_dynamic_int8(model):
+    """
+    Dynamic int8 quantisation of the LSTM / GRU / Linear layers (weights int8,
+    activations quantised on the fly). CPU only; Conv1d layers stay fp32.
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    return torch.ao.quantization.quantize_dynamic(
+        model, {nn.LSTM, nn.GRU, nn.Linear}, dtype=torch.qint8
+    )
+
+
+def cpu_supports_bf16():
+    """True when the CPU has native bf16 matmul (AVX512-BF16 or AMX) — otherwise autocast is slower."""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+
+def load_torchscript(path, device):
+    module = torch.jit.load(path, map_location=device)
+    module.eval()
+    return module
+
+
+def configure_threads(intra_op=None, inter_op=None):
+    """
+    Pin PyTorch's CPU thread pools. Defaults come from INFERENCE_THREADS /
+    INFERENCE_INTEROP_THREADS; 0 or unset leaves PyTorch's own default.
+    """
+    intra_op = intra_op if intra_op is not None else int(os.environ.get('INFERENCE_THREADS', 0))
+    inter_op = inter_op if inter_op is not None else int(os.environ.get('INFERENCE_INTEROP_THREADS', 0))
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work starts
+            pass
+    return torch.get_num_threads()
+
+
+def load_checkpoint_models(model_dir):
+    """Rebuild the eager LSTM (and CNN, if present) from the checkpoints in `model_dir`."""
+    ckpt = torch.load(os.path.join(model_dir, 'returns_model.pth'), map_location='cpu')
+    cfg  = ckpt.get('config', {})
+    lstm = HybridLSTMGRU(
+        input_size=cfg['input_size'],
+        hidden_size=cfg.get('hidden_size', 256),
+        num_layers=cfg.get('num_layers', 3),
+        dropout=cfg.get('dropout', 0.4)
+    )
+    lstm.load_state_dict(ckpt['model_state_dict'])
+    seq_len = cfg.get('sequence_length', 20)
+
+    cnn, cnn_cfg = None, {}
+    cnn_path = os.path.join(model_dir, 'cnn1d_model.pth')
+    if os.path.exists(cnn_path):
+        cnn_ckpt = torch.load(cnn_path, map_location='cpu')
+        cnn_cfg  = cnn_ckpt.get('config', {})
+        cnn = CNN1DModel(
+            input_size=cnn_cfg.get('input_size', cfg['input_size']),
+            seq_len=cnn_cfg.get('seq_len', seq_len)
+        )
+        cnn.load_state_dict(cnn_ckpt['model_state_dict'])
+    return lstm, cfg, cnn, cnn_cfg
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export saved models to TorchScript")
+    parser.add_argument('--dir', default='saved_models')
+    args = parser.parse_args()
+
+    lstm, cfg, cnn, cnn_cfg = load_checkpoint_models(args.dir)
+    seq_len = cfg.get('sequence_length', 20)
+    print(f"LSTM → {export_lstm(lstm, seq_len, cfg['input_size'], args.dir)}")
+    if cnn is not None:
+        path = export_cnn(
+            cnn, cnn_cfg.get('seq_len', seq_len),
+            cnn_cfg.get('input_size', cfg['input_size']), args.dir
+        )
+        print(f"CNN1D (BN folded) → {path}")
+
+
+if __name__ == '__main__':
+    main()
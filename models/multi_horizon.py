@@ -0,0 +1,49 @@
+# models/multi_horizon.py
+#
+# Direct multi-horizon forecasting helpers. A HybridLSTMGRU with
+# output_size=len(HORIZONS) predicts the cumulative log return to each
+# horizon in one forward pass; the daily path is interpolated between them.
+
+import numpy as np
+
+# Trading-day horizons the direct head is trained on
+HORIZONS = (1, 5, 10, 20, 60, 120, 250)
+
+MULTI_HORIZON_NAME = 'multi_horizon_model.pth'
+
+
+def horizon_scale(horizons=HORIZONS):
+    """Per-horizon target scale — √h keeps long-horizon targets on the same order as 1-day ones."""
+    return np.sqrt(np.asarray(horizons, dtype=np.float32))
+
+
+def horizon_targets(close, horizons=HORIZONS):
+    """
+    (N, H) cumulative log returns log(close[t+h] / close[t]) for every row t.
+    Rows whose horizon runs past the end of the series are NaN.
+    """
+    log_close = np.log(np.asarray(close, dtype=np.float64))
+    n   = len(log_close)
+    out = np.full((n, len(horizons)), np.nan)
+    for j, h in enumerate(horizons):
+        if h < n:
+            out[:n - h, j] = log_close[h:] - log_close[:n - h]
+    return out
+
+
+def interpolate_path(horizons, cum_log_returns, n_days):
+    """
+    Daily cumulative log-return path for days 1..n_days. Linear between the
+    anchor (0, 0) and each predicted horizon; past the last horizon the final
+    segment's slope is carried forward.
+    """
+    h    = np.concatenate([[0.0], np.asarray(horizons, dtype=np.float64)])
+    c    = np.concatenate([[0.0], np.asarray(cum_log_returns, dtype=np.float64)])
+    days = np.arange(1, n_days + 1, dtype=np.float64)
+
+    path   = np.interp(days, h, c)
+    beyond = days > h[-1]
+    if beyond.any():
+        slope        = (c[-1] - c[-2]) / (h[-1] - h[-2])
+        path[beyond] = c[-1] + (days[beyond] - h[-1]) * slope
+    return path
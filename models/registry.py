@@ -0,0 +1,227 @@
+# models/registry.py
+#
+# Versioned model registry over saved_models/.
+#
+#   saved_models/
+#     versions/
+#       20261019-153000/
+#         returns_model.pth, cnn1d_model.pth, *.pkl ...
+#         manifest.json      ← config, feature-cols hash, metrics, file hashes
+#     CURRENT                ← name of the active version (swapped atomically)
+#
+# A tree without CURRENT is treated as the legacy flat layout: artefacts are
+# read straight from saved_models/ and reported as version 'unversioned'.
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from datetime import datetime
+
+import joblib
+
+MODEL_DIR     = os.environ.get('MODEL_DIR', 'saved_models')
+UNVERSIONED   = 'unversioned'
+MANIFEST_NAME = 'manifest.json'
+POINTER_NAME  = 'CURRENT'
+# Version names are single path components: timestamps by default, or a
+# --version label. Anything else (separators, '..') never reaches os.path.
+VERSION_RE    = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+# Every artefact the prediction / ensemble services read
+ARTEFACTS = [
+    'returns_model.pth',
+    'returns_model.ts.pt',
+    'returns_feature_cols.pkl',
+    'multi_horizon_model.pth',
+    'xgb_model.pkl',
+    'cnn1d_model.pth',
+    'cnn1d_model.ts.pt',
+    'student_model.pth',
+    'student_model.ts.pt',
+    'meta_learner.pkl',
+    'trained_stocks.pkl',
+    'ensemble_xgb.pkl',
+    'ensemble_lgbm.pkl',
+    'ensemble_scaler.pkl',
+    'ensemble_feature_cols.pkl',
+    'ensemble_weights.pkl',
+]
+
+
+def _sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def feature_cols_hash(feature_cols):
+    """Order-sensitive hash — a reordered column list is a different model input."""
+    return hashlib.sha256(json.dumps(list(feature_cols)).encode('utf-8')).hexdigest()[:16]
+
+
+def _read_checkpoint_config(path):
+    import torch
+    ckpt = torch.load(path, map_location='cpu')
+    if isinstance(ckpt, dict):
+        return ckpt.get('config', {})
+    return {}
+
+
+class ModelRegistry:
+    """Versioned artefact directories under saved_models/ with an atomic CURRENT pointer"""
+
+    def __init__(self, root=MODEL_DIR):
+        self.root         = root
+        self.versions_dir = os.path.join(root, 'versions')
+        self.pointer_path = os.path.join(root, POINTER_NAME)
+
+    # ── Lookup ──────────────────────────────────────────────────────────────────
+
+    def current_version(self):
+        try:
+            with open(self.pointer_path) as f:
+                version = f.read().strip()
+            return version or None
+        except FileNotFoundError:
+            return None
+
+    def version_dir(self, version):
+        if version == UNVERSIONED:
+            return self.root
+        if not isinstance(version, str) or not VERSION_RE.match(version) or '..' in version:
+            raise ValueError(f"Invalid model version: {version!r}")
+        return os.path.join(self.versions_dir, version)
+
+    def resolve(self, version=None):
+        """
+        Return (version, directory) for `version`, defaulting to CURRENT or the
+        flat layout. Only published versions resolve — FileNotFoundError otherwise.
+        """
+        version = version or self.current_version() or UNVERSIONED
+        if version != UNVERSIONED and version not in self.list_versions():
+            raise FileNotFoundError(f"Model version not found: {version}")
+        path = self.version_dir(version)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Model version not found: {version}")
+        return version, path
+
+    def list_versions(self):
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(
+            v for v in os.listdir(self.versions_dir)
+            if not v.startswith('.') and os.path.isdir(os.path.join(self.versions_dir, v))
+        )
+
+    def read_manifest(self, version):
+        path = os.path.join(self.version_dir(version), MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    # ── Publishing ──────────────────────────────────────────────────────────────
+
+    def publish(self, source_dir=None, version=None, metrics=None, activate=True):
+        """
+        Snapshot the artefacts in `source_dir` (default: the flat saved_models/
+        written by the training scripts) into a new immutable version directory.
+        The copy is staged in a hidden directory and renamed into place, so a
+        half-written version is never visible to the services.
+        """
+        source_dir = source_dir or self.root
+        version    = version or datetime.now().strftime('%Y%m%d-%H%M%S')
+        final_dir  = self.version_dir(version)
+        if os.path.exists(final_dir):
+            raise FileExistsError(f"Model version already exists: {version}")
+
+        present = [a for a in ARTEFACTS if os.path.exists(os.path.join(source_dir, a))]
+        if 'returns_model.pth' not in present or 'returns_feature_cols.pkl' not in present:
+            raise FileNotFoundError(f"No LSTM model / feature cols in {source_dir}")
+
+        staging = os.path.join(self.versions_dir, f'.staging-{version}')
+        os.makedirs(staging, exist_ok=False)
+        try:
+            for name in present:
+                shutil.copy2(os.path.join(source_dir, name), os.path.join(staging, name))
+
+            feature_cols = joblib.load(os.path.join(staging, 'returns_feature_cols.pkl'))
+            manifest = {
+                'version':           version,
+                'created_at':        datetime.now().isoformat(timespec='seconds'),
+                'config':            _read_checkpoint_config(os.path.join(staging, 'returns_model.pth')),
+                'feature_cols_hash': feature_cols_hash(feature_cols),
+                'n_features':        len(feature_cols),
+                'metrics':           metrics or {},
+                'files':             {name: _sha256(os.path.join(staging, name)) for name in present},
+            }
+            if 'ensemble_feature_cols.pkl' in present:
+                manifest['ensemble_feature_cols_hash'] = feature_cols_hash(
+                    joblib.load(os.path.join(staging, 'ensemble_feature_cols.pkl'))
+                )
+            with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            os.rename(staging, final_dir)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Point CURRENT at `version` with a single atomic rename."""
+        if version != UNVERSIONED and version not in self.list_versions():
+            raise FileNotFoundError(f"Model version not found: {version}")
+        tmp_path = f'{self.pointer_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pointer_path)
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned model artefacts in saved_models/")
+    parser.add_argument('--root', default=MODEL_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('list', help="List versions (* = current)")
+
+    pub = sub.add_parser('publish', help="Snapshot saved_models/ artefacts as a new version")
+    pub.add_argument('--version')
+    pub.add_argument('--metrics', help="JSON object of evaluation metrics")
+    pub.add_argument('--no-activate', action='store_true')
+
+    act = sub.add_parser('activate', help="Make a version current")
+    act.add_argument('version')
+
+    args     = parser.parse_args(argv)
+    registry = ModelRegistry(args.root)
+
+    if args.command == 'list':
+        current = registry.current_version()
+        for v in registry.list_versions():
+            manifest = registry.read_manifest(v) or {}
+            print(f"{'*' if v == current else ' '} {v}  metrics={manifest.get('metrics', {})}")
+    elif args.command == 'publish':
+        metrics = json.loads(args.metrics) if args.metrics else None
+        version = registry.publish(version=args.version, metrics=metrics, activate=not args.no_activate)
+        print(f"Published {version}{'' if args.no_activate else ' (current)'}")
+    elif args.command == 'activate':
+        registry.activate(args.version)
+        print(f"Current → {args.version}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# models/student.py
+#
+# Compact students distilled from HybridLSTMGRU (training/distill.py) for
+# the per-step autoregressive loop in PredictionService.
+#
+#   gru  — one GRU layer + linear head
+#   tcn  — dilated causal Conv1d stack (receptive field ≥ the window) + linear head
+#
+# Both map (B, seq_len, F) → (B, 1) like the teacher, so they drop into the
+# same loop, meta-learner input and TorchScript export.
+
+import os
+
+import torch
+import torch.nn as nn
+
+STUDENT_NAME    = 'student_model.pth'
+STUDENT_TS_NAME = 'student_model.ts.pt'
+ARCHS           = ('gru', 'tcn')
+
+
+class GRUStudent(nn.Module):
+
+    def __init__(self, input_size, hidden_size=64):
+        super().__init__()
+        self.gru  = nn.GRU(input_size, hidden_size, batch_first=True)
+        self.head = nn.Linear(hidden_size, 1)
+
+    def forward(self, x):
+        out, _ = self.gru(x)
+        return self.head(out[:, -1, :])
+
+
+class _CausalBlock(nn.Module):
+    """Conv1d padded on the left only, so step t never sees t+1; residual + ReLU."""
+
+    def __init__(self, channels, kernel_size, dilation):
+        super().__init__()
+        self.pad  = (kernel_size - 1) * dilation
+        self.conv = nn.Conv1d(channels, channels, kernel_size, dilation=dilation)
+        self.act  = nn.ReLU()
+
+    def forward(self, x):
+        return self.act(x + self.conv(nn.functional.pad(x, (self.pad, 0))))
+
+
+class TCNStudent(nn.Module):
+
+    def __init__(self, input_size, channels=32, kernel_size=3, levels=4):
+        super().__init__()
+        self.input_proj = nn.Conv1d(input_size, channels, 1)
+        # Dilations 1, 2, 4, 8 with k=3 → receptive field 31 ≥ the 20-day window
+        self.blocks     = nn.Sequential(*[_CausalBlock(channels, kernel_size, 2 ** i) for i in range(levels)])
+        self.head       = nn.Linear(channels, 1)
+
+    def forward(self, x):
+        h = self.blocks(self.input_proj(x.transpose(1, 2)))
+        return self.head(h[:, :, -1])
+
+
+def build_student(cfg):
+    """Instantiate from the `config` dict stored in student_model.pth."""
+    if cfg['arch'] == 'gru':
+        return GRUStudent(cfg['input_size'], hidden_size=cfg.get('hidden_size', 64))
+    if cfg['arch'] == 'tcn':
+        return TCNStudent(cfg['input_size'], channels=cfg.get('channels', 32),
+                          kernel_size=cfg.get('kernel_size', 3), levels=cfg.get('levels', 4))
+    raise ValueError(f"Unknown student arch '{cfg['arch']}' (expected {' | '.join(ARCHS)})")
+
+
+def load_student(model_dir, device='cpu'):
+    """(eval-mode model, config) from `model_dir`, or (None, None) if there is no student."""
+    path = os.path.join(model_dir, STUDENT_NAME)
+    if not os.path.exists(path):
+        return None, None
+    ckpt  = torch.load(path, map_location=device)
+    model = build_student(ckpt['config'])
+    model.load_state_dict(ckpt['model_state_dict'])
+    return model.to(device).eval(), ckpt['config']
@@ -0,0 +1,66 @@
+# models/trees.py
+#
+# The XGBoost / LightGBM boosters behind EnsemblePredictionService, trained
+# with the native APIs in training/train_trees.py (QuantileDMatrix /
+# lightgbm.Dataset built from memory-mapped rows) and pickled as
+# ensemble_xgb.pkl / ensemble_lgbm.pkl.
+#
+#   clf = BoosterClassifier(booster, best_iteration=212)
+#   clf.predict_proba(X_sc)[:, 1]        # same call as XGBClassifier / LGBMClassifier
+#
+# predict_proba goes straight to the booster — XGBoost's inplace_predict,
+# LightGBM's Booster.predict — so serving a row builds no DMatrix / Dataset.
+#
+# set_threads(model) caps a loaded model (this wrapper or an sklearn
+# XGBClassifier / LGBMClassifier) at INFERENCE_THREADS OpenMP threads.
+
+import os
+
+import numpy as np
+
+
+class BoosterClassifier:
+    """Binary xgboost.Booster or lightgbm.Booster with the sklearn predict_proba / predict surface."""
+
+    def __init__(self, booster, best_iteration=None):
+        self.booster        = booster
+        self.best_iteration = best_iteration
+        self.library        = 'xgboost' if type(booster).__module__.startswith('xgboost') else 'lightgbm'
+        self.classes_       = np.array([0, 1])
+        self.n_features_in_ = booster.num_features() if self.library == 'xgboost' else booster.num_feature()
+
+    def set_threads(self, n):
+        self.num_threads = n
+        if self.library == 'xgboost':
+            self.booster.set_param({'nthread': n})
+
+    def _up_prob(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if self.library == 'xgboost':
+            rounds = (0, self.best_iteration + 1) if self.best_iteration is not None else (0, 0)
+            return self.booster.inplace_predict(X, iteration_range=rounds)
+        # Pickles from before set_threads() existed have no num_threads
+        threads = getattr(self, 'num_threads', 0)
+        params  = {'num_threads': threads} if threads else {}
+        return self.booster.predict(X, num_iteration=self.best_iteration, **params)
+
+    def predict_proba(self, X):
+        p = np.asarray(self._up_prob(X), dtype=np.float64)
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X):
+        return (self._up_prob(X) > 0.5).astype(np.int64)
+
+
+def set_threads(model, n=None):
+    """
+    Cap the OpenMP threads `model` predicts with. `n` defaults to
+    INFERENCE_THREADS; 0 or unset leaves the library default (every core).
+    """
+    n = n if n is not None else int(os.environ.get('INFERENCE_THREADS', 0))
+    if model is None or n <= 0:
+        return
+    if isinstance(model, BoosterClassifier):
+        model.set_threads(n)
+    elif hasattr(model, 'set_params'):
+        model.set_params(n_jobs=n)
@@ -0,0 +1,266 @@
+# serve.py
+#
+# Production entry point: N uvicorn workers sharing one copy of the models.
+# start_backend.py (single process, reload=True) stays the development server.
+#
+#   python serve.py --workers 4                  # :8001, threads = cores / workers
+#   python serve.py --workers 8 --threads 1 --port 8001
+#   python serve.py --workers 4 --no-preload     # every worker loads its own copy (for comparison)
+#
+#   kill -USR1 <parent>    # per-worker RSS / PSS / USS report
+#   kill -HUP  <parent>    # reload CURRENT in the parent, then replace workers one at a time
+#   kill -TERM <parent>    # graceful shutdown
+#
+# The parent loads and warms every model (LSTM, CNN, XGBoost, LightGBM,
+# meta-learner, student) before forking, then gc.freeze()s the heap so the
+# children's collections never write to those objects. Tensor storage and
+# booster buffers are never written after the fork, so their pages stay
+# shared copy-on-write and each extra worker costs its private heap only:
+# compare the PSS column (shared pages split across processes) with RSS.
+#
+# A registry hot-reload inside a worker (MODEL_WATCH_INTERVAL) gives that
+# worker a private copy; SIGHUP to the parent reloads once and re-shares it.
+#
+# A worker that keeps dying at startup is respawned with exponential backoff;
+# after CRASH_LIMIT such crashes in a row the server stops and exits 1.
+
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_DELAY = 15.0      # seconds after startup before the first memory report
+MIN_UPTIME   = 10.0      # a worker that exits sooner than this counts as a startup crash
+MAX_BACKOFF  = 30.0      # seconds; respawn delay doubles per consecutive startup crash
+CRASH_LIMIT  = 5         # consecutive startup crashes of one slot before the server gives up
+
+
+# ── Memory report ──────────────────────────────────────────────────────────────
+
+def memory_stats(pid):
+    """RSS / PSS / USS / shared in MB from /proc/<pid>/smaps_rollup (Linux), None if unavailable."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            kb = {line.split(':')[0]: int(line.split()[1]) for line in f if line.split()[-1] == 'kB'}
+    except (OSError, ValueError, IndexError):
+        return None
+    return {
+        'rss':    kb.get('Rss', 0) / 1024,
+        'pss':    kb.get('Pss', 0) / 1024,
+        'uss':    (kb.get('Private_Clean', 0) + kb.get('Private_Dirty', 0)) / 1024,
+        'shared': (kb.get('Shared_Clean', 0) + kb.get('Shared_Dirty', 0)) / 1024,
+    }
+
+
+def print_memory_report(parent, workers):
+    rows = [('parent', parent)] + [(f'worker {slot}', pid) for pid, slot in sorted(workers.items(), key=lambda w: w[1])]
+    print("=" * 66)
+    print(f"  {'process':<10}{'pid':>8}{'RSS MB':>11}{'PSS MB':>11}{'USS MB':>11}{'shared MB':>12}")
+    print("=" * 66)
+    total_pss = 0.0
+    for name, pid in rows:
+        stats = memory_stats(pid)
+        if stats is None:
+            print(f"  {name:<10}{pid:>8}{'n/a':>11}")
+            continue
+        total_pss += stats['pss']
+        print(f"  {name:<10}{pid:>8}{stats['rss']:>11.1f}{stats['pss']:>11.1f}"
+              f"{stats['uss']:>11.1f}{stats['shared']:>12.1f}")
+    print("-" * 66)
+    print(f"  {'total PSS':<18}{total_pss:>22.1f}   (actual memory used by all processes)")
+    print("=" * 66, flush=True)
+
+
+# ── Workers ────────────────────────────────────────────────────────────────────
+
+def preload_models():
+    """Import the app and load + warm every model singleton in this process."""
+    from backend.main import app                    # noqa: F401 — imports every router and service
+    from backend.services import warmup
+    from models.export import configure_threads
+
+    # The parent must never start an OpenMP pool (libgomp) with more than one
+    # thread: its workers do not survive fork() and the children would
+    # deadlock in their first parallel region. Single-threaded here; each
+    # worker re-pins to --threads after the fork.
+    configure_threads(intra_op=1)
+    warmup.warm_up_models()
+    # Everything allocated so far moves to the permanent generation: the
+    # children's GC passes skip it, so its pages are never dirtied by them.
+    gc.collect()
+    gc.freeze()
+    return warmup
+
+
+def run_worker(sock, args):
+    """Child: fresh DB pools and thread pools, then uvicorn on the inherited socket."""
+    import uvicorn
+    from data import backends
+    from models.export import configure_threads
+
+    # Pooled connections opened by the parent must not be shared across processes
+    for engine in list(backends._engines.values()):
+        engine.dispose(close=False)
+    # Models loaded from here on (hot reloads, --no-preload) read INFERENCE_THREADS;
+    # the ones inherited from the parent are re-pinned explicitly
+    os.environ['INFERENCE_THREADS'] = str(args.threads)
+    configure_threads(intra_op=args.threads)
+    if not args.no_preload:
+        from backend.services import warmup
+        warmup.set_threads(args.threads)
+
+    config = uvicorn.Config('backend.main:app', log_level=args.log_level, access_log=args.access_log,
+                            timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock, args, slot):
+    pid = os.fork()
+    if pid == 0:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(sig, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(sock, args)
+        except BaseException as e:
+            print(f"Worker {slot} failed: {e}", flush=True)
+            code = 1
+        finally:
+            os._exit(code)
+    print(f"✓ Worker {slot} started (pid {pid})", flush=True)
+    return pid
+
+
+# ── Main ───────────────────────────────────────────────────────────────────────
+
+def main():
+    cores  = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Pre-fork uvicorn server sharing one copy of the models")
+    parser.add_argument('--host',          default='0.0.0.0')
+    parser.add_argument('--port',          type=int, default=8001)
+    parser.add_argument('--workers',       type=int, default=int(os.environ.get('WEB_CONCURRENCY', cores)))
+    parser.add_argument('--threads',       type=int, default=None, help="intra-op threads per worker (default cores / workers)")
+    parser.add_argument('--no-preload',    action='store_true', help="load models in each worker instead of the parent")
+    parser.add_argument('--report-every',  type=float, default=0, help="seconds between memory reports (0 = startup + SIGUSR1 only)")
+    parser.add_argument('--keep-alive',    type=int, default=5)
+    parser.add_argument('--log-level',     default='info')
+    parser.add_argument('--access-log',    action='store_true')
+    args = parser.parse_args()
+    args.threads = args.threads or max(1, cores // args.workers)
+
+    # Read when models load: 1 in the parent (see preload_models), --threads in the workers
+    os.environ['INFERENCE_THREADS'] = '1'
+
+    if args.no_preload:
+        print(f"Preload disabled — each of {args.workers} workers loads its own models")
+    else:
+        start = time.perf_counter()
+        print(f"Loading models once in the parent (pid {os.getpid()})...")
+        preload_models()
+        print(f"✓ Models loaded in {time.perf_counter() - start:.1f}s")
+
+    sock = socket.socket(socket.AF_INET6 if ':' in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    print(f"Listening on {args.host}:{args.port} | {args.workers} workers × {args.threads} threads")
+
+    workers = {}                                   # pid → slot
+    started = {}                                   # slot → monotonic start time
+    crashes = {}                                   # slot → consecutive startup crashes
+    pending = {}                                   # slot → monotonic time to respawn at
+    flags   = {'stop': False, 'reload': False, 'report': False}
+    code    = 0
+
+    def start(slot):
+        workers[spawn(sock, args, slot)] = slot
+        started[slot] = time.monotonic()
+
+    def on_stop(signum, frame):
+        flags['stop'] = True
+
+    def on_reload(signum, frame):
+        flags['reload'] = True
+
+    def on_report(signum, frame):
+        flags['report'] = True
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT,  on_stop)
+    signal.signal(signal.SIGHUP,  on_reload)
+    signal.signal(signal.SIGUSR1, on_report)
+
+    for slot in range(args.workers):
+        start(slot)
+
+    next_report = time.monotonic() + REPORT_DELAY
+    while not flags['stop']:
+        # Reap exited workers; respawn any that were not replaced on purpose,
+        # backing off when a slot keeps dying at startup
+        while workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            if pid not in workers:
+                continue
+            slot = workers.pop(pid)
+            quick         = time.monotonic() - started[slot] < MIN_UPTIME
+            crashes[slot] = crashes.get(slot, 0) + 1 if quick else 0
+            if crashes[slot] >= CRASH_LIMIT:
+                print(f"Worker {slot} (pid {pid}) crashed {crashes[slot]} times in a row at startup "
+                      f"— shutting down", flush=True)
+                flags['stop'] = True
+                code = 1
+                break
+            delay         = min(MAX_BACKOFF, 2 ** (crashes[slot] - 1)) if crashes[slot] else 0.0
+            pending[slot] = time.monotonic() + delay
+            print(f"Worker {slot} (pid {pid}) exited with status {status} — restarting in {delay:.0f}s",
+                  flush=True)
+        if flags['stop']:
+            break
+
+        for slot, due in list(pending.items()):
+            if due <= time.monotonic():
+                del pending[slot]
+                start(slot)
+
+        if flags['reload']:
+            flags['reload'] = False
+            if not args.no_preload:
+                from backend.services import warmup
+
+                print("SIGHUP — reloading models in the parent", flush=True)
+                gc.unfreeze()
+                warmup.reload_models()
+                gc.collect()
+                gc.freeze()
+            # Start each replacement before stopping the old worker; both accept on the shared socket
+            for pid, slot in list(workers.items()):
+                del workers[pid]
+                start(slot)
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+
+        if flags['report'] or (next_report and time.monotonic() >= next_report):
+            flags['report'] = False
+            print_memory_report(os.getpid(), workers)
+            next_report = time.monotonic() + args.report_every if args.report_every > 0 else None
+
+        time.sleep(0.2)
+
+    print("Shutting down workers...", flush=True)
+    for pid in workers:
+        os.kill(pid, signal.SIGTERM)
+    for pid in list(workers):
+        os.waitpid(pid, 0)
+    sock.close()
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,5 @@
+# Development server (auto-reload). For production use serve.py: models are
+# loaded once and shared copy-on-write across forked workers.
 import sys
 import uvicorn
 
@@ -0,0 +1,43 @@
+# tests/test_hash_pool.py
+#
+#   python -m pytest tests/test_hash_pool.py -q
+
+import os
+import sys
+import time
+import asyncio
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')      # authservice builds an engine at import
+
+import pytest
+
+from backend.services.authservice import HashPool, HashPoolBusy
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_job_finishes():
+    pool    = HashPool(workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        task = asyncio.create_task(pool.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        task.cancel()                                   # client disconnected mid-hash
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The job is still running on the executor, so the pool is still full
+        assert pool.stats()['running'] == 1
+        assert pool.stats()['queued'] == 0
+        with pytest.raises(HashPoolBusy):
+            await pool.run(time.sleep, 0)
+        release.set()
+        for _ in range(100):
+            if pool.stats()['running'] == 0 and pool._pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await pool.run(lambda: 'ok') == 'ok'
+
+    asyncio.run(scenario())
+    stats = pool.stats()
+    assert stats['queued'] == 0 and stats['running'] == 0
+    assert stats['completed'] == 2 and stats['rejected'] == 1
@@ -0,0 +1,28 @@
+# tests/test_prediction_cache.py
+#
+#   python -m pytest tests/test_prediction_cache.py -q
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.prediction_cache import PredictionCache
+
+
+def test_tag_lives_and_expires_with_its_entry():
+    cache = PredictionCache(ttl_seconds=60)
+    cache.set('k', {'v': 1}, tag='W/"abc"')
+    assert cache.get_tag('k') == 'W/"abc"'
+    assert cache.get('k') == {'v': 1}
+    assert cache.get_tag('missing') is None
+
+    expired = PredictionCache(ttl_seconds=-1)
+    expired.set('k', {'v': 1}, tag='W/"abc"')
+    assert expired.get_tag('k') is None
+    assert expired.get('k') is None
+
+
+def test_untagged_entry():
+    cache = PredictionCache()
+    cache.set('k', 1)
+    assert cache.get('k') == 1 and cache.get_tag('k') is None
@@ -0,0 +1,44 @@
+# tests/test_rate_limit.py
+#
+#   python -m pytest tests/test_rate_limit.py -q
+
+import os
+import sys
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services import rate_limit
+from backend.services.rate_limit import RateLimiter, client_ip
+
+
+def _request(xff=None, peer='10.0.0.2'):
+    headers = {'x-forwarded-for': xff} if xff is not None else {}
+    return SimpleNamespace(headers=headers, client=SimpleNamespace(host=peer))
+
+
+def test_peer_address_without_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(rate_limit, 'TRUST_PROXY_HEADERS', False)
+    assert client_ip(_request('1.2.3.4')) == '10.0.0.2'
+
+
+def test_rightmost_hop_behind_one_proxy(monkeypatch):
+    monkeypatch.setattr(rate_limit, 'TRUST_PROXY_HEADERS', True)
+    monkeypatch.setattr(rate_limit, 'TRUSTED_PROXY_HOPS', 1)
+    # The client forged the first entry; the proxy appended the real address
+    assert client_ip(_request('6.6.6.6, 203.0.113.7')) == '203.0.113.7'
+    assert client_ip(_request('203.0.113.7')) == '203.0.113.7'
+
+
+def test_skips_configured_trusted_hops(monkeypatch):
+    monkeypatch.setattr(rate_limit, 'TRUST_PROXY_HEADERS', True)
+    monkeypatch.setattr(rate_limit, 'TRUSTED_PROXY_HOPS', 2)
+    # client → CDN (appends client) → LB (appends CDN) → app
+    assert client_ip(_request('6.6.6.6, 203.0.113.7, 198.51.100.1')) == '203.0.113.7'
+
+
+def test_forged_header_rotation_shares_one_bucket(monkeypatch):
+    monkeypatch.setattr(rate_limit, 'TRUST_PROXY_HEADERS', True)
+    monkeypatch.setattr(rate_limit, 'TRUSTED_PROXY_HOPS', 1)
+    limiter  = RateLimiter(rate_per_minute=1, burst=3)
+    admitted = [limiter.acquire(client_ip(_request(f'9.9.9.{i}, 203.0.113.7'))) == 0 for i in range(10)]
+    assert sum(admitted) == 3
@@ -0,0 +1,48 @@
+# tests/test_registry.py
+#
+#   python -m pytest tests/test_registry.py -q
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from models.registry import ModelRegistry, UNVERSIONED
+
+
+@pytest.fixture
+def registry(tmp_path):
+    root = tmp_path / 'saved_models'
+    (root / 'versions' / '20260101-000000').mkdir(parents=True)
+    # A model directory outside the registry that traversal would reach
+    (tmp_path / 'outside').mkdir()
+    return ModelRegistry(str(root))
+
+
+def test_resolve_published_version(registry):
+    version, path = registry.resolve('20260101-000000')
+    assert version == '20260101-000000'
+    assert path == os.path.join(registry.versions_dir, '20260101-000000')
+
+
+@pytest.mark.parametrize('version', ['../..', '../../outside', '..', '/tmp', 'a/../../outside',
+                                     '20260101-000000/..', '.hidden'])
+def test_resolve_rejects_traversal(registry, version):
+    with pytest.raises((FileNotFoundError, ValueError)):
+        registry.resolve(version)
+
+
+def test_resolve_rejects_unpublished_version(registry):
+    with pytest.raises(FileNotFoundError):
+        registry.resolve('20990101-000000')
+
+
+def test_activate_rejects_traversal(registry):
+    with pytest.raises((FileNotFoundError, ValueError)):
+        registry.activate('../../outside')
+    assert registry.current_version() is None
+
+
+def test_flat_layout_still_resolves(registry):
+    assert registry.resolve() == (UNVERSIONED, registry.root)
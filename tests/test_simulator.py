@@ -0,0 +1,81 @@
+# tests/test_simulator.py
+#
+#   python -m pytest tests/test_simulator.py -q
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from backtest.simulator import signals_from_probs, simulate, summarize, threshold_grid, sweep
+
+# Two symbols over four closes, small enough to work out by hand
+PRICES  = np.array([[100.0, 50.0],
+                    [110.0, 50.0],
+                    [121.0, 25.0],
+                    [121.0, 50.0]])
+SIGNALS = np.array([[1,  0],
+                    [1, -1],
+                    [0,  0],
+                    [0,  0]], dtype=np.int8)
+
+
+def test_lagged_fills_costs_and_equity():
+    r = simulate(SIGNALS, PRICES, cost_bps=10, lag=1)
+    # Day-0 signal is filled at the day-1 close; two positions split gross exposure 1
+    np.testing.assert_allclose(r['weights'], [[0, 0], [1, 0], [0.5, -0.5]])
+    np.testing.assert_allclose(r['gross'], [0.0, 0.10, -0.5])
+    np.testing.assert_allclose(r['turnover'], [0.0, 1.0, 1.0])
+    np.testing.assert_allclose(r['costs'], [0.0, 0.001, 0.001])
+    np.testing.assert_allclose(r['net'], [0.0, 0.099, -0.501])
+    np.testing.assert_allclose(r['equity'], [1.0, 1.099, 1.099 * 0.499])
+    np.testing.assert_allclose(r['drawdown'], [0.0, 0.0, -0.501])
+
+
+def test_no_lag_trades_on_the_signal_close():
+    r = simulate(SIGNALS, PRICES, cost_bps=0, lag=0)
+    np.testing.assert_allclose(r['weights'], [[1, 0], [0.5, -0.5], [0, 0]])
+    np.testing.assert_allclose(r['net'], [0.10, 0.05 + 0.25, 0.0])
+
+
+def test_long_only_drops_shorts():
+    r = simulate(SIGNALS, PRICES, cost_bps=10, lag=1, long_only=True)
+    np.testing.assert_allclose(r['weights'], [[0, 0], [1, 0], [1, 0]])
+    np.testing.assert_allclose(r['turnover'], [0.0, 1.0, 0.0])
+
+
+def test_missing_price_is_not_traded():
+    prices       = PRICES.copy()
+    prices[2, 1] = np.nan
+    r = simulate(SIGNALS, prices, cost_bps=0, lag=1)
+    # B has no close on day 2, so only A is held over 1 → 2 and 2 → 3
+    np.testing.assert_allclose(r['weights'], [[0, 0], [1, 0], [1, 0]])
+    np.testing.assert_allclose(r['net'], [0.0, 0.10, 0.0])
+
+
+def test_signals_from_probs_bands_and_nan():
+    prob = np.array([[0.60, 0.50], [0.40, np.nan]])
+    np.testing.assert_array_equal(signals_from_probs(prob, 0.55, 0.45), [[1, 0], [-1, 0]])
+    both = signals_from_probs(prob, np.array([0.55, 0.65]), np.array([0.45, 0.35]))
+    assert both.shape == (2, 2, 2)
+    np.testing.assert_array_equal(both[1], [[0, 0], [0, 0]])
+
+
+def test_threshold_grid():
+    np.testing.assert_allclose(threshold_grid('symmetric', 0.3, 0.7, 0.1),
+                               [[0.5, 0.5], [0.6, 0.4], [0.7, 0.3]])
+    full = threshold_grid('full', 0.4, 0.6, 0.1)
+    assert len(full) == 6
+    assert (full[:, 1] <= full[:, 0]).all()
+
+
+def test_sweep_matches_single_runs():
+    prob  = np.array([[0.7, 0.5], [0.6, 0.3], [0.5, 0.5], [0.5, 0.5]])
+    pairs = threshold_grid('symmetric', 0.5, 0.7, 0.1)
+    rows  = sweep(prob, PRICES, pairs, cost_bps=10, lag=1)
+    for row, (up, down) in zip(rows, pairs):
+        single = summarize(simulate(signals_from_probs(prob, up, down), PRICES, cost_bps=10, lag=1))
+        assert row['total_return'] == pytest.approx(float(single['total_return']))
+        assert row['max_drawdown'] == pytest.approx(float(single['max_drawdown']))
@@ -0,0 +1,23 @@
+# tests/test_sweep.py
+#
+#   python -m pytest tests/test_sweep.py -q
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from training.sweep import sample_configs
+
+
+def test_random_configs_are_distinct():
+    space   = {'max_depth': [3, 5, 7], 'subsample': [0.7, 0.8], 'learning_rate': {'loguniform': [1e-3, 1e-1]}}
+    configs = sample_configs(space, 'random', 20, seed=0)
+    assert len(configs) == 20
+    assert len({tuple(sorted(c.items())) for c in configs}) == 20
+
+
+def test_small_space_is_not_padded_with_repeats():
+    configs = sample_configs({'max_depth': [3, 5], 'subsample': [0.7, 0.8]}, 'random', 10, seed=0)
+    assert sorted(tuple(sorted(c.items())) for c in configs) == [
+        (('max_depth', d), ('subsample', s)) for d in (3, 5) for s in (0.7, 0.8)
+    ]
@@ -6,8 +6,9 @@ class StockSequenceDataset(Dataset):
     """PyTorch Dataset for stock sequences"""
     
     def __init__(self, X, y):
-        self.X = torch.FloatTensor(X)
-        self.y = torch.FloatTensor(y)
+        # as_tensor shares float32 arrays (incl. memory-mapped caches) instead of copying
+        self.X = torch.as_tensor(X, dtype=torch.float32)
+        self.y = torch.as_tensor(y, dtype=torch.float32)
     
     def __len__(self):
         return len(self.X)
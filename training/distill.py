@@ -0,0 +1,188 @@
+# training/distill.py
+#
+# Distil the HybridLSTMGRU teacher (saved_models/returns_model.pth) into a
+# compact student for the high-QPS serving routes.
+#
+#   python training/distill.py                    # 1-layer GRU, 64 hidden
+#   python training/distill.py --arch tcn         # dilated causal conv net
+#   python training/distill.py --hidden 32 --epochs 40
+#   python training/distill.py --resume           # continue an interrupted run
+#
+# The student is trained on the teacher's outputs over the full trainlarge
+# sequence set, not on the raw returns: it has to stand in for the teacher
+# inside the ensemble, where the meta-learner was fitted on the teacher's
+# output distribution. "Dir Acc" during training is therefore sign agreement
+# with the teacher on the validation windows.
+#
+# Outputs:
+#   saved_models/student_model.pth       ← best val loss, config['arch'] etc.
+#   saved_models/student_model.ts.pt     ← frozen TorchScript
+# followed by the evaluate_student.py report (accuracy vs evaluate_test.py,
+# latency, size).
+
+import os
+import sys
+import time
+import shutil
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from torch.utils.data import DataLoader
+
+from models.hybrid_lstm_gru import count_parameters
+from models.export import load_checkpoint_models, export_torchscript
+from models.inference import InferenceRunner
+from models.student import ARCHS, STUDENT_NAME, STUDENT_TS_NAME, build_student
+from training import trainlarge
+from training.dataset import StockSequenceDataset
+from training.engine import (Trainer, default_run_log, atomic_save, save_arrays, load_arrays,
+                             PRECISIONS, CHECKPOINT_DIR)
+
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+MODEL_DIR      = 'saved_models'
+TEACHER_DATA   = os.path.join(CHECKPOINT_DIR, 'trainlarge', 'data')   # trainlarge's sequence cache
+BATCH_SIZE     = 256
+LEARNING_RATE  = 0.001
+EPOCHS         = 60
+PATIENCE       = 10
+
+
+def load_sequences(run_dir, resume):
+    """
+    (arrays, meta) with X_train / X_val — trainlarge's cache when present,
+    otherwise built from the DB into this run's directory.
+    """
+    arrays, meta = load_arrays(TEACHER_DATA, mmap=True)
+    if arrays is not None:
+        print(f"Sequences from {TEACHER_DATA}")
+        return arrays, meta
+
+    data_dir = os.path.join(run_dir, 'data')
+    arrays, meta = load_arrays(data_dir, mmap=True)
+    if arrays is not None and resume:
+        print(f"Sequences from {data_dir}")
+        return arrays, meta
+
+    built = trainlarge.build_dataset()
+    if built is None:
+        return None, None
+    X_train, y_train, X_val, y_val, feature_cols, successful = built
+    save_arrays(data_dir, meta={'feature_cols': feature_cols, 'symbols': successful},
+                X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+    return load_arrays(data_dir, mmap=True)
+
+
+def distill(arch='gru', hidden=None, epochs=EPOCHS, precision='auto', resume=False,
+            checkpoint_every=1, report=True):
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Device: {device}  |  Student: {arch}")
+
+    run_name   = f'distill-{arch}'
+    run_dir    = os.path.join(CHECKPOINT_DIR, run_name)
+    state_path = os.path.join(run_dir, 'state.pt')
+    label_dir  = os.path.join(run_dir, 'labels')
+    if not resume:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    # ── Teacher ────────────────────────────────────────────────────────────────
+    teacher, t_cfg, _, _ = load_checkpoint_models(MODEL_DIR)
+    seq_len = t_cfg.get('sequence_length', trainlarge.SEQUENCE_LENGTH)
+    print(f"Teacher: HybridLSTMGRU  {count_parameters(teacher):,} params")
+
+    arrays, meta = load_sequences(run_dir, resume)
+    if arrays is None:
+        return
+    X_train, X_val = arrays['X_train'], arrays['X_val']
+    if X_train.shape[2] != t_cfg['input_size']:
+        print(f"ERROR: sequences have {X_train.shape[2]} features, teacher expects {t_cfg['input_size']}")
+        return
+
+    # ── Soft targets: one teacher pass over train + val, cached with the run ──
+    labels, _ = load_arrays(label_dir, mmap=True)
+    if labels is None:
+        start = time.perf_counter()
+        runner = InferenceRunner(teacher.to(device), device)
+        save_arrays(label_dir, t_train=runner(X_train), t_val=runner(X_val))
+        labels, _ = load_arrays(label_dir, mmap=True)
+        print(f"Teacher outputs for {len(X_train) + len(X_val):,} windows "
+              f"in {time.perf_counter() - start:.1f}s")
+    del teacher
+
+    print(f"Train: {len(X_train):,}  |  Val: {len(X_val):,}  |  Features: {X_train.shape[2]}")
+    print("=" * 60)
+
+    train_loader = DataLoader(StockSequenceDataset(X_train, labels['t_train']),
+                              batch_size=BATCH_SIZE, shuffle=True, pin_memory=device.type == 'cuda')
+    val_loader   = DataLoader(StockSequenceDataset(X_val, labels['t_val']),
+                              batch_size=BATCH_SIZE, shuffle=False, pin_memory=device.type == 'cuda')
+
+    # ── Student ────────────────────────────────────────────────────────────────
+    config = {'arch': arch, 'input_size': X_train.shape[2], 'sequence_length': seq_len}
+    if arch == 'gru':
+        config['hidden_size'] = hidden or 64
+    else:
+        config.update({'channels': hidden or 32, 'kernel_size': 3, 'levels': 4})
+    config['teacher'] = {k: t_cfg[k] for k in ('hidden_size', 'num_layers') if k in t_cfg}
+
+    model = build_student(config)
+    print(f"Student parameters: {count_parameters(model):,}")
+
+    criterion = trainlarge.DirectionalLoss(mse_weight=0.4, dir_weight=0.6)
+    optimizer = torch.optim.Adam(model.parameters(), lr=LEARNING_RATE)
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', patience=3, factor=0.5)
+    trainer   = Trainer(model, criterion, optimizer, device=device, scheduler=scheduler,
+                        precision=precision, run_log=default_run_log(run_name), name='distill')
+    print(f"Precision: {trainer.precision} | run log: {trainer.run_log}")
+    if resume and os.path.exists(state_path):
+        trainer.load_checkpoint(state_path)
+    elif resume:
+        print(f"No checkpoint at {state_path} — starting from epoch 1.")
+
+    save_path = os.path.join(MODEL_DIR, STUDENT_NAME)
+
+    def save_best(epoch, metrics):
+        atomic_save({
+            'epoch':            epoch,
+            'model_state_dict': trainer.module.state_dict(),
+            'val_loss':         metrics['val_loss'],
+            'agreement':        metrics['dir_acc'],
+            'config':           config,
+        }, save_path)
+        print(f"  --> Best student saved! Agreement with teacher: {metrics['dir_acc']:.2f}%")
+
+    trainer.fit(train_loader, val_loader, epochs, patience=PATIENCE, on_improve=save_best,
+                checkpoint=state_path, checkpoint_every=checkpoint_every)
+
+    # ── Export best checkpoint ─────────────────────────────────────────────────
+    best = torch.load(save_path, map_location='cpu')
+    model.load_state_dict(best['model_state_dict'])
+    ts_path = export_torchscript(model, torch.zeros(1, seq_len, config['input_size']),
+                                 os.path.join(MODEL_DIR, STUDENT_TS_NAME))
+
+    print("=" * 60)
+    print(f"Distillation complete! Student: {save_path}")
+    print(f"TorchScript export: {ts_path}")
+    print(f"Best epoch {best['epoch']}  |  agreement with teacher {best['agreement']:.2f}%")
+    print("=" * 60)
+
+    if report:
+        import evaluate_student
+        evaluate_student.report()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Distil the HybridLSTMGRU teacher into a compact student")
+    parser.add_argument('--arch', choices=ARCHS, default='gru')
+    parser.add_argument('--hidden', type=int, default=None,
+                        help="GRU hidden size (default 64) or TCN channels (default 32)")
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--precision', choices=PRECISIONS, default='auto')
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue from saved_models/checkpoints/distill-<arch>/ instead of starting over")
+    parser.add_argument('--checkpoint-every', type=int, default=1, help="Epochs between checkpoints")
+    parser.add_argument('--no-report', action='store_true', help="Skip the evaluate_student.py report")
+    args = parser.parse_args()
+    distill(arch=args.arch, hidden=args.hidden, epochs=args.epochs, precision=args.precision,
+            resume=args.resume, checkpoint_every=args.checkpoint_every, report=not args.no_report)
@@ -0,0 +1,145 @@
+# training/distributed.py
+#
+# Data-parallel training over CPU cores with torch.distributed (gloo).
+#
+#   python training/trainlarge.py --nproc 8                 # 8 processes on this machine
+#   torchrun --nnodes 2 --nproc-per-node 8 --rdzv-backend c10d \
+#            --rdzv-endpoint head:29500 training/trainlarge.py   # several machines
+#
+# Every rank holds a full model replica and trains on its own shard of the
+# sequence index (DistributedSampler); DDP all-reduces the gradients so the
+# replicas stay identical. Validation is sharded too and its sums are
+# all-reduced, so every rank sees the same val loss and takes the same
+# scheduler / early-stopping decisions. Only rank 0 writes checkpoints,
+# best models and run logs.
+
+import os
+import sys
+import contextlib
+from datetime import timedelta
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.utils.data import DataLoader, Sampler
+from torch.utils.data.distributed import DistributedSampler
+
+BACKEND = 'gloo'
+
+
+def world():
+    """(rank, world_size) — (0, 1) outside a process group."""
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_rank(), dist.get_world_size()
+    return 0, 1
+
+
+def is_main():
+    return world()[0] == 0
+
+
+def barrier():
+    if world()[1] > 1:
+        dist.barrier()
+
+
+def all_reduce_sum(tensor):
+    """In-place sum across ranks (no-op single-process); returns the tensor."""
+    if world()[1] > 1:
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor
+
+
+def broadcast_object(obj, src=0):
+    """Rank `src`'s value of a picklable object, on every rank."""
+    if world()[1] == 1:
+        return obj
+    box = [obj]
+    dist.broadcast_object_list(box, src=src)
+    return box[0]
+
+
+@contextlib.contextmanager
+def process_group():
+    """
+    Join the process group described by the torchrun-style environment
+    (RANK, WORLD_SIZE, MASTER_ADDR, MASTER_PORT). A no-op when WORLD_SIZE is
+    unset or 1, so single-process runs go through the same code path.
+    """
+    world_size = int(os.environ.get('WORLD_SIZE', 1))
+    if world_size == 1 or dist.is_initialized():
+        yield
+        return
+
+    # Split this machine's cores between its ranks unless the launcher pinned them
+    local_world = int(os.environ.get('LOCAL_WORLD_SIZE', world_size))
+    if 'OMP_NUM_THREADS' not in os.environ:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // local_world))
+
+    dist.init_process_group(BACKEND, timeout=timedelta(minutes=30))
+    if dist.get_rank() > 0:
+        sys.stdout = open(os.devnull, 'w')      # rank 0 reports; errors still reach stderr
+    try:
+        yield
+    finally:
+        dist.destroy_process_group()
+
+
+def launch(fn, nproc, **kwargs):
+    """Run fn(**kwargs) in `nproc` local processes joined into one gloo group."""
+    master = {
+        'MASTER_ADDR': os.environ.get('MASTER_ADDR', '127.0.0.1'),
+        'MASTER_PORT': os.environ.get('MASTER_PORT') or str(_free_port()),
+    }
+    mp.spawn(_worker, args=(fn, nproc, master, kwargs), nprocs=nproc, join=True)
+
+
+def _worker(local_rank, fn, nproc, master, kwargs):
+    os.environ.update({
+        **master,
+        'RANK':             str(local_rank),
+        'LOCAL_RANK':       str(local_rank),
+        'WORLD_SIZE':       str(nproc),
+        'LOCAL_WORLD_SIZE': str(nproc),
+    })
+    with process_group():
+        fn(**kwargs)
+
+
+def _free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# ── Sharded loaders ────────────────────────────────────────────────────────────
+
+class ShardSampler(Sampler):
+    """Every world_size-th index starting at rank — exact, no padding (for evaluation)."""
+
+    def __init__(self, n, rank, world_size):
+        self.indices = range(rank, n, world_size)
+
+    def __iter__(self):
+        return iter(self.indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+
+def shard_loader(dataset, batch_size, train, **kwargs):
+    """
+    DataLoader over this rank's shard. Training shards are reshuffled every
+    epoch (Trainer calls sampler.set_epoch) and padded to equal length so all
+    ranks take the same number of optimizer steps; evaluation shards are not.
+    Single-process it is a plain DataLoader.
+    """
+    rank, world_size = world()
+    if world_size == 1:
+        return DataLoader(dataset, batch_size=batch_size, shuffle=train, **kwargs)
+    if train:
+        sampler = DistributedSampler(dataset, num_replicas=world_size, rank=rank, shuffle=True)
+    else:
+        sampler = ShardSampler(len(dataset), rank, world_size)
+    return DataLoader(dataset, batch_size=batch_size, sampler=sampler, **kwargs)
@@ -0,0 +1,433 @@
+# training/engine.py
+#
+# One training loop for every model in the repo (HybridLSTMGRU next-day and
+# multi-horizon, CNN1D direction classifier, train.py's single-stock run).
+#
+#   trainer = Trainer(model, DirectionalLoss(), optimizer, scheduler=scheduler,
+#                     run_log='saved_models/runs/trainlarge.jsonl')
+#   trainer.fit(train_loader, val_loader, epochs=150, patience=20, on_improve=save)
+#
+# Precision follows the device: fp16 autocast + GradScaler on CUDA, bf16
+# autocast on CPUs with native bf16 (AVX512-BF16 / AMX), fp32 elsewhere.
+# Losses are always computed in fp32 on the upcast model output.
+#
+# Each epoch appends one JSON line to `run_log`: losses, direction accuracy,
+# learning rate, samples/sec, mean optimizer-step time and peak memory.
+#
+# With `checkpoint=` fit() atomically rewrites a full-state checkpoint every
+# `checkpoint_every` epochs — model, optimizer, scheduler, grad scaler,
+# epoch/step, best val loss, patience counter, RNG states and the caller's
+# `trainer.extra` dict. trainer.load_checkpoint(path) followed by the same
+# fit() call continues the run from the next epoch; on CPU in fp32 the
+# resumed run is bit-identical to an uninterrupted one.
+#
+# Inside a torch.distributed process group (training/distributed.py) the
+# model is wrapped in DistributedDataParallel, losses and throughput are
+# summed over ranks, and only rank 0 prints, logs and checkpoints.
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import resource
+import contextlib
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+from torch.nn.parallel import DistributedDataParallel
+
+from models.export import cpu_supports_bf16
+from training.distributed import world, all_reduce_sum
+
+RUNS_DIR       = 'saved_models/runs'
+CHECKPOINT_DIR = 'saved_models/checkpoints'
+
+PRECISIONS = ('auto', 'fp32', 'bf16', 'fp16')
+
+
+def resolve_precision(precision, device):
+    """'auto' → fp16 on CUDA, bf16 on CPUs with native support, else fp32."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}' (expected {' | '.join(PRECISIONS)})")
+    if precision == 'auto':
+        if device.type == 'cuda':
+            return 'fp16'
+        return 'bf16' if device.type == 'cpu' and cpu_supports_bf16() else 'fp32'
+    if precision == 'fp16' and device.type != 'cuda':
+        print("fp16 training needs CUDA — using fp32.")
+        return 'fp32'
+    return precision
+
+
+def default_run_log(name):
+    return os.path.join(RUNS_DIR, f"{name}-{datetime.now():%Y%m%d-%H%M%S}.jsonl")
+
+
+def squeeze_output(out):
+    """(B, 1) → (B,) for single-output heads; (B, H) multi-horizon outputs pass through."""
+    return out.squeeze(1)
+
+
+# ── Checkpoint helpers ─────────────────────────────────────────────────────────
+
+def atomic_save(obj, path):
+    """torch.save to a temp file in the same directory, fsync, then rename over `path`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp, 'wb') as f:
+            torch.save(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def rng_state():
+    state = {
+        'python': random.getstate(),
+        'numpy':  np.random.get_state(),
+        'torch':  torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def save_arrays(directory, meta=None, **arrays):
+    """
+    Cache a built dataset as one .npy per array plus meta.json. Written to a
+    sibling temp directory and renamed into place, so a half-written cache
+    is never picked up by --resume.
+    """
+    tmp = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), arr)
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta or {}, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+
+
+def load_arrays(directory, mmap=False):
+    """
+    (arrays, meta) written by save_arrays, or (None, None) if there is no cache.
+    mmap=True maps the files copy-on-write, so processes reading the same
+    cache share one copy in the page cache.
+    """
+    meta_path = os.path.join(directory, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None, None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    arrays = {
+        name[:-4]: np.load(os.path.join(directory, name), mmap_mode='c' if mmap else None)
+        for name in os.listdir(directory) if name.endswith('.npy')
+    }
+    return arrays, meta
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Trainer:
+    """
+    model / loss_fn / optimizer / scheduler are the caller's; the trainer owns
+    device placement, mixed precision, gradient accumulation, clipping,
+    early stopping and telemetry.
+
+    target_threshold  — a prediction counts as the right direction when
+                        (output > 0) == (target > target_threshold): 0 for
+                        return regression, 0.5 for 0/1 direction labels
+    """
+
+    def __init__(self, model, loss_fn, optimizer, device=None, scheduler=None,
+                 precision='auto', accumulation_steps=1, clip_grad_norm=1.0,
+                 compile=False, output_fn=squeeze_output, target_threshold=0.0,
+                 run_log=None, name='train'):
+        self.device    = torch.device(device) if device is not None else torch.device(
+            'cuda' if torch.cuda.is_available() else 'cpu'
+        )
+        self.module    = model.to(self.device)       # unwrapped — use for state_dict()
+        self.model     = self.module
+        self.rank, self.world_size = world()
+        self.loss_fn   = loss_fn
+        self.optimizer = optimizer
+        self.scheduler = scheduler
+        self.precision = resolve_precision(precision, self.device)
+        self.accumulation_steps = max(1, int(accumulation_steps))
+        self.clip_grad_norm     = clip_grad_norm
+        self.output_fn          = output_fn
+        self.target_threshold   = target_threshold
+        self.name               = name
+        self.run_log            = run_log if self.rank == 0 else None
+
+        self.scaler = torch.amp.GradScaler('cuda', enabled=self.precision == 'fp16')
+        self.epoch  = 0
+        self.step   = 0
+
+        # Early-stopping state lives on the trainer so checkpoints carry it
+        self.best_val_loss    = float('inf')
+        self.patience_counter = 0
+        self.stopped          = False
+        self.extra            = {}          # caller state saved with every checkpoint
+
+        self._ddp = None
+        if self.world_size > 1:
+            # Broadcasts rank 0's initial weights, then all-reduces gradients in backward()
+            self._ddp  = DistributedDataParallel(self.module)
+            self.model = self._ddp
+        compiled = False
+        if compile:
+            try:
+                self.model = torch.compile(self.model)
+                compiled   = True
+            except Exception as e:
+                print(f"torch.compile unavailable ({e}) — training eagerly.")
+
+        if self.run_log:
+            os.makedirs(os.path.dirname(os.path.abspath(self.run_log)), exist_ok=True)
+            self._log({
+                'event':              'start',
+                'name':               name,
+                'model':              type(model).__name__,
+                'device':             str(self.device),
+                'precision':          self.precision,
+                'accumulation_steps': self.accumulation_steps,
+                'compiled':           compiled,
+                'threads':            torch.get_num_threads(),
+                'world_size':         self.world_size,
+            })
+
+    # ── Precision ───────────────────────────────────────────────────────────────
+
+    def _autocast(self):
+        if self.precision == 'fp32':
+            return contextlib.nullcontext()
+        dtype = torch.float16 if self.precision == 'fp16' else torch.bfloat16
+        return torch.autocast(device_type=self.device.type, dtype=dtype)
+
+    def _forward(self, X_batch):
+        with self._autocast():
+            out = self.model(X_batch)
+        return self.output_fn(out).float()
+
+    # ── Epochs ──────────────────────────────────────────────────────────────────
+
+    def train_epoch(self, loader):
+        """One pass over `loader`. Returns loss and throughput telemetry."""
+        self.model.train()
+        if self.device.type == 'cuda':
+            torch.cuda.reset_peak_memory_stats(self.device)
+
+        sampler = getattr(loader, 'sampler', None)
+        if hasattr(sampler, 'set_epoch'):
+            sampler.set_epoch(self.epoch)       # new shard permutation per epoch, same on every rank
+
+        non_blocking = self.device.type == 'cuda'
+        n_batches    = len(loader)
+        total_loss   = torch.zeros((), device=self.device)
+        batches, samples, opt_steps = 0, 0, 0
+        start = time.perf_counter()
+
+        self.optimizer.zero_grad(set_to_none=True)
+        for i, (X_batch, y_batch) in enumerate(loader):
+            X_batch = X_batch.to(self.device, non_blocking=non_blocking)
+            y_batch = y_batch.to(self.device, non_blocking=non_blocking)
+
+            # Step at the end of every accumulation window and on the last batch
+            step_now = (i + 1) % self.accumulation_steps == 0 or i + 1 == n_batches
+            # DDP: only all-reduce gradients on the micro-batch that steps
+            sync = self._ddp.no_sync() if self._ddp is not None and not step_now else contextlib.nullcontext()
+            with sync:
+                loss = self.loss_fn(self._forward(X_batch), y_batch)
+                self.scaler.scale(loss / self.accumulation_steps).backward()
+            total_loss += loss.detach()
+            batches    += 1
+            samples    += len(X_batch)
+
+            if step_now:
+                self._optimizer_step()
+                opt_steps += 1
+
+        # Single device sync (and, distributed, one all-reduce) per epoch
+        totals   = all_reduce_sum(torch.stack([
+            total_loss.float().cpu(), torch.tensor(float(batches)), torch.tensor(float(samples)),
+        ])).tolist()
+        avg_loss = totals[0] / max(totals[1], 1)
+        samples  = int(totals[2])
+        seconds  = time.perf_counter() - start
+        stats    = {
+            'train_loss':      avg_loss,
+            'samples':         samples,
+            'optimizer_steps': opt_steps,
+            'train_seconds':   round(seconds, 3),
+            'samples_per_sec': round(samples / seconds, 1) if seconds > 0 else None,
+            'step_time_ms':    round(seconds / max(opt_steps, 1) * 1000, 2),
+            'peak_rss_mb':     round(_peak_rss_mb(), 1),
+        }
+        if self.device.type == 'cuda':
+            stats['peak_cuda_mb'] = round(torch.cuda.max_memory_allocated(self.device) / 2**20, 1)
+        return stats
+
+    def _optimizer_step(self):
+        if self.clip_grad_norm:
+            self.scaler.unscale_(self.optimizer)
+            torch.nn.utils.clip_grad_norm_(self.module.parameters(), max_norm=self.clip_grad_norm)
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        self.optimizer.zero_grad(set_to_none=True)
+        self.step += 1
+
+    @torch.no_grad()
+    def evaluate(self, loader):
+        """Mean loss and direction accuracy (%) over `loader` — over all ranks' shards when distributed."""
+        self.model.eval()
+        total_loss, batches, correct, total = 0.0, 0, 0, 0
+        for X_batch, y_batch in loader:
+            X_batch = X_batch.to(self.device)
+            y_batch = y_batch.to(self.device)
+            preds   = self._forward(X_batch)
+            total_loss += self.loss_fn(preds, y_batch).item()
+            batches    += 1
+            correct    += ((preds > 0) == (y_batch > self.target_threshold)).sum().item()
+            total      += y_batch.numel()
+        total_loss, batches, correct, total = all_reduce_sum(
+            torch.tensor([total_loss, batches, correct, total], dtype=torch.float64)
+        ).tolist()
+        return {
+            'val_loss': total_loss / max(batches, 1),
+            'dir_acc':  correct / max(total, 1) * 100,
+        }
+
+    # ── Fit ─────────────────────────────────────────────────────────────────────
+
+    def fit(self, train_loader, val_loader, epochs, patience=None, on_improve=None, label='Epoch',
+            checkpoint=None, checkpoint_every=1):
+        """
+        Train up to `epochs`, stepping the scheduler on val loss (ReduceLROnPlateau)
+        and stopping after `patience` epochs without improvement.
+        on_improve(epoch, metrics) runs whenever val loss hits a new best (on rank 0 only).
+        checkpoint — path rewritten every `checkpoint_every` epochs and at the end.
+        Returns the per-epoch metrics of the epochs run by this call.
+        """
+        history = []
+        if self.stopped:
+            print(f"Run already finished at epoch {self.epoch} — nothing to resume.")
+            return history
+
+        for epoch in range(self.epoch + 1, epochs + 1):
+            self.epoch = epoch
+            metrics    = {**self.train_epoch(train_loader), **self.evaluate(val_loader)}
+
+            if self.scheduler is not None:
+                if isinstance(self.scheduler, torch.optim.lr_scheduler.ReduceLROnPlateau):
+                    self.scheduler.step(metrics['val_loss'])
+                else:
+                    self.scheduler.step()
+            metrics = {'epoch': epoch, **metrics, 'lr': self.optimizer.param_groups[0]['lr']}
+            history.append(metrics)
+            self._log({'event': 'epoch', **metrics})
+
+            print(f"{label} {epoch:3d}/{epochs} | "
+                  f"Train Loss: {metrics['train_loss']:.6f} | "
+                  f"Val Loss: {metrics['val_loss']:.6f} | "
+                  f"Dir Acc: {metrics['dir_acc']:.2f}% | "
+                  f"{metrics['samples_per_sec']:,.0f} samples/s")
+
+            if metrics['val_loss'] < self.best_val_loss:
+                self.best_val_loss    = metrics['val_loss']
+                self.patience_counter = 0
+                if on_improve is not None and self.rank == 0:
+                    on_improve(epoch, metrics)
+            else:
+                self.patience_counter += 1
+                if patience is not None and self.patience_counter >= patience:
+                    print(f"Early stopping at epoch {epoch}")
+                    self._log({'event': 'early_stop', 'epoch': epoch})
+                    self.stopped = True
+
+            last = self.stopped or epoch == epochs
+            if checkpoint and (last or epoch % checkpoint_every == 0):
+                self.save_checkpoint(checkpoint)
+            if self.stopped:
+                break
+
+            if self.device.type == 'cuda':
+                torch.cuda.empty_cache()
+
+        self._log({'event': 'end', 'epoch': self.epoch, 'best_val_loss': self.best_val_loss})
+        return history
+
+    # ── Checkpoints ─────────────────────────────────────────────────────────────
+
+    def state_dict(self):
+        return {
+            'model':            self.module.state_dict(),
+            'optimizer':        self.optimizer.state_dict(),
+            'scheduler':        self.scheduler.state_dict() if self.scheduler is not None else None,
+            'scaler':           self.scaler.state_dict(),
+            'epoch':            self.epoch,
+            'step':             self.step,
+            'best_val_loss':    self.best_val_loss,
+            'patience_counter': self.patience_counter,
+            'stopped':          self.stopped,
+            'precision':        self.precision,
+            'rng':              rng_state(),
+            'extra':            self.extra,
+        }
+
+    def load_state_dict(self, state):
+        self.module.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        if self.scheduler is not None and state['scheduler'] is not None:
+            self.scheduler.load_state_dict(state['scheduler'])
+        self.scaler.load_state_dict(state['scaler'])
+        self.epoch            = state['epoch']
+        self.step             = state['step']
+        self.best_val_loss    = state['best_val_loss']
+        self.patience_counter = state['patience_counter']
+        self.stopped          = state['stopped']
+        self.extra            = state['extra']
+        set_rng_state(state['rng'])
+
+    def save_checkpoint(self, path):
+        if self.rank != 0:
+            return          # replicas are identical; every rank resumes from rank 0's file
+        atomic_save(self.state_dict(), path)
+        self._log({'event': 'checkpoint', 'epoch': self.epoch, 'path': path})
+
+    def load_checkpoint(self, path):
+        state = torch.load(path, map_location='cpu', weights_only=False)     # RNG states must stay on CPU
+        if state['precision'] != self.precision:
+            print(f"Checkpoint was trained in {state['precision']}, continuing in {self.precision}.")
+        self.load_state_dict(state)
+        self._log({'event': 'resume', 'epoch': self.epoch, 'path': path})
+        print(f"Resumed from {path} at epoch {self.epoch} "
+              f"(best val loss {self.best_val_loss:.6f}, patience {self.patience_counter})")
+
+    def _log(self, record):
+        if not self.run_log:
+            return
+        record = {'time': datetime.now().isoformat(timespec='seconds'), **record}
+        with open(self.run_log, 'a') as f:
+            f.write(json.dumps(record) + '\n')
@@ -0,0 +1,466 @@
+# training/sweep.py
+#
+# Hyperparameter sweeps over the trainlarge / train_ensemble models without
+# editing their module constants.
+#
+#   python training/sweep.py training/sweeps/lstm.yaml --workers 4
+#   python training/sweep.py training/sweeps/xgb.yaml --workers 2 --threads 4
+#
+# A sweep file names the model (lstm | cnn | xgb), a strategy and a search
+# space. Anything not in the space keeps the script's default (trainlarge.
+# HIDDEN_SIZE etc.).
+#
+#   grid     every combination of the list-valued params
+#   random   `trials` distinct draws; lists are categorical, {uniform: [a, b]},
+#            {loguniform: [a, b]} and {int: [a, b]} are ranges
+#   halving  successive halving: `trials` random configs at min_budget,
+#            keep the best 1/eta, multiply the budget by eta, repeat up to
+#            max_budget. Torch trials resume from their checkpoint when
+#            promoted, so surviving trials never repeat epochs.
+#
+# Budgets are epochs for lstm / cnn and boosting rounds for xgb.
+#
+# The DB reads and feature engineering happen once: per-stock standardised
+# feature panels are cached under saved_models/sweeps/data-<stocks>/ and
+# memory-mapped by every worker, which cuts its own windows for the trial's
+# sequence_length. Trials run in spawned worker processes, each pinned to
+# `threads` intra-op threads. Results land in
+# saved_models/sweeps/<name>/leaderboard.json — validation direction
+# accuracy (at the best val-loss epoch, i.e. the model trainlarge would
+# save) against training cost.
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import yaml
+
+SWEEPS_DIR = 'saved_models/sweeps'
+MODELS     = ('lstm', 'cnn', 'xgb')
+STRATEGIES = ('grid', 'random', 'halving')
+MAX_DRAWS  = 50          # random draws per requested trial while skipping duplicates
+
+
+def defaults(model):
+    """The training scripts' own settings — what a param not in the space is fixed to."""
+    from training import trainlarge, train_ensemble
+    if model == 'xgb':
+        # n_estimators is the trial budget, not a parameter
+        params = {k: v for k, v in train_ensemble.XGB_PARAMS.items() if k != 'n_estimators'}
+        return {'sequence_length': train_ensemble.SEQUENCE_LENGTH, **params}
+    if model == 'cnn':
+        return {
+            'sequence_length': train_ensemble.SEQUENCE_LENGTH,
+            'batch_size':      train_ensemble.BATCH_SIZE,
+            'learning_rate':   0.001,
+        }
+    return {
+        'sequence_length': trainlarge.SEQUENCE_LENGTH,
+        'hidden_size':     trainlarge.HIDDEN_SIZE,
+        'num_layers':      trainlarge.NUM_LAYERS,
+        'dropout':         trainlarge.DROPOUT,
+        'batch_size':      trainlarge.BATCH_SIZE,
+        'learning_rate':   trainlarge.LEARNING_RATE,
+    }
+
+
+# ── Search space ───────────────────────────────────────────────────────────────
+
+def _draw(spec, rng):
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    if not isinstance(spec, dict) or len(spec) != 1:
+        return spec                                   # a fixed value
+    (kind, (lo, hi)), = spec.items()
+    if kind == 'uniform':
+        return rng.uniform(lo, hi)
+    if kind == 'loguniform':
+        return math.exp(rng.uniform(math.log(lo), math.log(hi)))
+    if kind == 'int':
+        return rng.randint(lo, hi)
+    raise ValueError(f"Unknown distribution '{kind}' (expected uniform | loguniform | int)")
+
+
+def sample_configs(space, strategy, n_trials, seed):
+    if strategy == 'grid':
+        ranged = [k for k, v in space.items() if isinstance(v, dict)]
+        if ranged:
+            raise ValueError(f"grid needs list-valued params; {ranged} are ranges — use random or halving")
+        keys   = list(space)
+        values = [v if isinstance(v, list) else [v] for v in space.values()]
+        return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+    # Distinct configs only — a small categorical space runs out before n_trials
+    rng, configs, seen = random.Random(seed), [], set()
+    for _ in range(n_trials * MAX_DRAWS):
+        if len(configs) == n_trials:
+            break
+        config = {k: _draw(v, rng) for k, v in space.items()}
+        key    = json.dumps(config, sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    if len(configs) < n_trials:
+        print(f"Search space has only {len(configs)} distinct configs — running those instead of {n_trials}")
+    return configs
+
+
+# ── Shared dataset cache ───────────────────────────────────────────────────────
+
+def build_panels(data_dir, num_stocks, min_days):
+    """
+    Per-stock standardised features + next-day returns, concatenated, with
+    `offsets` marking where each stock starts. Built once per universe.
+    """
+    from data.data_loader import StockDataLoader
+    from training.trainlarge import select_symbols, scaled_panel, detect_feature_cols
+    from training.engine import save_arrays
+
+    loader  = StockDataLoader()
+    symbols = select_symbols(loader, num_stocks=num_stocks, min_days=min_days)
+
+    feature_cols, X_parts, y_parts, kept = None, [], [], []
+    for i, sym in enumerate(symbols):
+        print(f"  {i+1}/{len(symbols)} {sym}...", end=' ')
+        df = loader.load_stock_data(sym)
+        if df is None or len(df) < min_days:
+            print("SKIP - no data")
+            continue
+        if feature_cols is None:
+            feature_cols = detect_feature_cols(df)
+        if not set(feature_cols) <= set(df.columns):
+            print("SKIP - missing features")
+            continue
+        X, y = scaled_panel(df, feature_cols)
+        X_parts.append(X.astype(np.float32))
+        y_parts.append(y.astype(np.float32))
+        kept.append(sym)
+        print(f"OK  {len(X)} rows")
+
+    if not kept:
+        raise RuntimeError("No stocks with enough history to build the sweep dataset")
+    offsets = np.cumsum([0] + [len(X) for X in X_parts]).astype(np.int64)
+    save_arrays(data_dir, meta={'feature_cols': feature_cols, 'symbols': kept},
+                X=np.concatenate(X_parts), y=np.concatenate(y_parts), offsets=offsets)
+    print(f"✓ Sweep dataset → {data_dir} ({len(kept)} stocks, {offsets[-1]:,} rows)")
+
+
+def window_splits(offsets, seq_len, train_split, val_split):
+    """
+    Start rows of every train / val window, split per stock like trainlarge:
+    window i covers rows [i, i + seq_len) and targets the return at i + seq_len.
+    """
+    train, val = [], []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        n = end - start - seq_len
+        if n < 100:
+            continue
+        starts = np.arange(start, start + n)
+        tr, vl = int(n * train_split), int(n * val_split)
+        train.append(starts[:tr])
+        val.append(starts[tr:tr + vl])
+    return np.concatenate(train), np.concatenate(val)
+
+
+class WindowBatches:
+    """
+    Map-style dataset indexed by whole batches: dataset[[i, j, ...]] gathers
+    the windows in one fancy-indexing call on the (memory-mapped) panel.
+    """
+
+    def __init__(self, X, y, starts, seq_len, classify=False):
+        self.X, self.y   = X, y
+        self.starts      = starts
+        self.steps       = np.arange(seq_len)
+        self.seq_len     = seq_len
+        self.classify    = classify
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        import torch
+        s = self.starts[idx]
+        X = self.X[s[:, None] + self.steps]
+        y = self.y[s + self.seq_len]
+        if self.classify:
+            y = (y > 0).astype(np.float32)
+        return torch.from_numpy(np.ascontiguousarray(X)), torch.from_numpy(np.ascontiguousarray(y))
+
+
+# ── Trials ─────────────────────────────────────────────────────────────────────
+
+def _init_worker(threads):
+    import torch
+    torch.set_num_threads(threads)
+    with contextlib.suppress(RuntimeError):
+        torch.set_num_interop_threads(1)
+
+
+def run_trial(spec):
+    """One trial at one budget, in a worker process. stdout goes to the trial's log."""
+    os.makedirs(spec['trial_dir'], exist_ok=True)
+    log_path = os.path.join(spec['trial_dir'], f"{spec['id']:03d}.log")
+    with open(log_path, 'a') as log, contextlib.redirect_stdout(log):
+        print(f"── trial {spec['id']} budget {spec['budget']} {json.dumps(spec['params'])}")
+        if spec['model'] == 'xgb':
+            result = _xgb_trial(spec)
+        else:
+            result = _torch_trial(spec)
+    return {'id': spec['id'], 'budget': spec['budget'], **result}
+
+
+def _load_windows(spec):
+    from training.engine import load_arrays
+    arrays, _ = load_arrays(spec['data_dir'], mmap=True)
+    seq_len   = int(spec['params']['sequence_length'])
+    train, val = window_splits(arrays['offsets'], seq_len, spec['train_split'], spec['val_split'])
+    return arrays, seq_len, train, val
+
+
+def _torch_trial(spec):
+    import torch
+    from torch.utils.data import DataLoader, BatchSampler, RandomSampler, SequentialSampler
+    from training.engine import Trainer
+
+    p = spec['params']
+    arrays, seq_len, train_idx, val_idx = _load_windows(spec)
+    classify = spec['model'] == 'cnn'
+    train_ds = WindowBatches(arrays['X'], arrays['y'], train_idx, seq_len, classify)
+    val_ds   = WindowBatches(arrays['X'], arrays['y'], val_idx,   seq_len, classify)
+    batch    = int(p['batch_size'])
+    train_loader = DataLoader(train_ds, batch_size=None,
+                              sampler=BatchSampler(RandomSampler(train_ds), batch, drop_last=False))
+    val_loader   = DataLoader(val_ds, batch_size=None,
+                              sampler=BatchSampler(SequentialSampler(val_ds), batch * 8, drop_last=False))
+
+    torch.manual_seed(spec['seed'])
+    n_features = arrays['X'].shape[1]
+    if classify:
+        from models.cnn1d_model import CNN1DModel
+        model   = CNN1DModel(input_size=n_features, seq_len=seq_len)
+        loss_fn = torch.nn.BCEWithLogitsLoss()
+    else:
+        from models.hybrid_lstm_gru import HybridLSTMGRU
+        from training.trainlarge import DirectionalLoss
+        model   = HybridLSTMGRU(input_size=n_features, hidden_size=int(p['hidden_size']),
+                                num_layers=int(p['num_layers']), dropout=float(p['dropout']))
+        loss_fn = DirectionalLoss(mse_weight=0.4, dir_weight=0.6)
+    optimizer = torch.optim.Adam(model.parameters(), lr=float(p['learning_rate']))
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', patience=5, factor=0.5)
+
+    ckpt    = os.path.join(spec['trial_dir'], f"{spec['id']:03d}.pt")
+    trainer = Trainer(model, loss_fn, optimizer, device='cpu', scheduler=scheduler,
+                      precision=spec['precision'], target_threshold=0.5 if classify else 0.0,
+                      run_log=os.path.join(spec['trial_dir'], f"{spec['id']:03d}.jsonl"),
+                      name=f"sweep-{spec['id']}")
+    if os.path.exists(ckpt):
+        trainer.load_checkpoint(ckpt)            # promoted by successive halving
+
+    def record_best(epoch, metrics):
+        trainer.extra['best'] = {'epoch': epoch, 'val_loss': metrics['val_loss'], 'dir_acc': metrics['dir_acc']}
+
+    history = trainer.fit(train_loader, val_loader, spec['budget'], patience=spec['patience'],
+                          on_improve=record_best)
+    trainer.extra['train_seconds'] = trainer.extra.get('train_seconds', 0.0) + sum(
+        h['train_seconds'] for h in history
+    )
+    trainer.save_checkpoint(ckpt)                # picked up again if the trial is promoted
+
+    best = trainer.extra.get('best', {'epoch': 0, 'val_loss': float('inf'), 'dir_acc': 0.0})
+    return {
+        'dir_acc':       round(best['dir_acc'], 3),
+        'val_loss':      round(best['val_loss'], 6),
+        'best_epoch':    best['epoch'],
+        'epochs':        trainer.epoch,
+        'train_seconds': round(trainer.extra['train_seconds'], 2),
+        'parameters':    sum(q.numel() for q in model.parameters()),
+        'train_windows': len(train_idx),
+    }
+
+
+def _xgb_trial(spec):
+    from xgboost import XGBClassifier
+    from training import train_ensemble
+
+    p = spec['params']
+    arrays, seq_len, train_idx, val_idx = _load_windows(spec)
+    X, y = arrays['X'], arrays['y']
+    # Last-timestep features of each window, labelled by the next-day direction
+    X_tr, y_tr = X[train_idx + seq_len - 1], (y[train_idx + seq_len] > 0).astype(np.int64)
+    X_vl, y_vl = X[val_idx + seq_len - 1],   (y[val_idx + seq_len] > 0).astype(np.int64)
+
+    model = XGBClassifier(
+        n_estimators=int(spec['budget']),
+        max_depth=int(p['max_depth']),
+        learning_rate=float(p['learning_rate']),
+        subsample=float(p['subsample']),
+        colsample_bytree=float(p['colsample_bytree']),
+        min_child_weight=float(p['min_child_weight']),
+        early_stopping_rounds=train_ensemble.XGB_EARLY_STOPPING,
+        eval_metric='logloss',
+        tree_method='hist',
+        verbosity=0,
+        n_jobs=spec['threads'],
+        random_state=spec['seed']
+    )
+    start = time.perf_counter()
+    model.fit(X_tr, y_tr, eval_set=[(X_vl, y_vl)], verbose=50)
+    seconds = time.perf_counter() - start
+
+    dir_acc = float(((model.predict_proba(X_vl)[:, 1] > 0.5) == y_vl).mean() * 100)
+    return {
+        'dir_acc':       round(dir_acc, 3),
+        'val_loss':      round(float(model.best_score), 6),
+        'best_epoch':    int(model.best_iteration) + 1,
+        'epochs':        int(spec['budget']),
+        'train_seconds': round(seconds, 2),
+        'parameters':    None,
+        'train_windows': len(train_idx),
+    }
+
+
+# ── Scheduling ─────────────────────────────────────────────────────────────────
+
+def run_rung(pool, trials, budget, base):
+    specs   = [{**base, 'id': t['id'], 'params': t['params'], 'budget': budget,
+                'seed': base['seed'] + t['id']} for t in trials]
+    results = {}
+    for r in pool.map(run_trial, specs):
+        results[r['id']] = r
+        print(f"  trial {r['id']:3d} @ {budget:<4} dir acc {r['dir_acc']:6.2f}%  "
+              f"val loss {r['val_loss']:.6f}  {r['train_seconds']:8.1f}s")
+    for t in trials:
+        t.update(results[t['id']])
+        t['rungs'] = t.get('rungs', 0) + 1
+
+
+def mark_pareto(trials):
+    """A trial is on the front if no cheaper-or-equal trial is at least as accurate."""
+    best = -1.0
+    for t in sorted(trials, key=lambda t: (t['train_seconds'], -t['dir_acc'])):
+        t['pareto'] = t['dir_acc'] > best
+        best = max(best, t['dir_acc'])
+
+
+def print_leaderboard(trials, top):
+    keys = sorted({k for t in trials for k in t['params']})
+    print("=" * 100)
+    print(f"{'#':>4} {'dir acc':>8} {'val loss':>10} {'budget':>7} {'train s':>9} {'front':>6}  params")
+    print("-" * 100)
+    for t in trials[:top]:
+        params = ' '.join(f"{k}={_fmt(t['params'][k])}" for k in keys)
+        print(f"{t['id']:>4} {t['dir_acc']:>7.2f}% {t['val_loss']:>10.6f} {t['budget']:>7} "
+              f"{t['train_seconds']:>9.1f} {'*' if t['pareto'] else '':>6}  {params}")
+    print("=" * 100)
+
+
+def _fmt(v):
+    return f"{v:.4g}" if isinstance(v, float) else str(v)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep")
+    parser.add_argument('config', help="sweep YAML (see training/sweeps/)")
+    parser.add_argument('--workers',   type=int, default=None, help="parallel trials (default: from the file, else 2)")
+    parser.add_argument('--threads',   type=int, default=None, help="intra-op threads per trial (default cores / workers)")
+    parser.add_argument('--rebuild',   action='store_true', help="rebuild the cached dataset")
+    parser.add_argument('--precision', default='auto')
+    parser.add_argument('--top',       type=int, default=20, help="leaderboard rows to print")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+
+    name     = cfg.get('name') or os.path.splitext(os.path.basename(args.config))[0]
+    model    = cfg['model']
+    strategy = cfg.get('strategy', 'random')
+    if model not in MODELS:
+        raise SystemExit(f"model must be one of {MODELS}")
+    if strategy not in STRATEGIES:
+        raise SystemExit(f"strategy must be one of {STRATEGIES}")
+
+    space   = {**defaults(model), **cfg.get('space', {})}
+    seed    = int(cfg.get('seed', 0))
+    workers = args.workers or int(cfg.get('workers', 2))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+
+    # ── Dataset, shared by every trial ────────────────────────────────────────
+    from training.engine import load_arrays
+    data     = cfg.get('data', {})
+    stocks   = int(data.get('stocks', 150))
+    min_days = int(data.get('min_days', 1500))
+    data_dir = os.path.join(SWEEPS_DIR, f"data-{stocks}x{min_days}")
+    if args.rebuild or load_arrays(data_dir, mmap=True)[0] is None:
+        build_panels(data_dir, stocks, min_days)
+
+    sweep_dir = os.path.join(SWEEPS_DIR, name)
+    trial_dir = os.path.join(sweep_dir, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    base = {
+        'model':       model,
+        'data_dir':    data_dir,
+        'trial_dir':   trial_dir,
+        'threads':     threads,
+        'precision':   args.precision,
+        'patience':    cfg.get('patience'),
+        'train_split': float(data.get('train_split', 0.70)),
+        'val_split':   float(data.get('val_split', 0.15)),
+        'seed':        seed,
+    }
+
+    configs = sample_configs(space, strategy, int(cfg.get('trials', 16)), seed)
+    trials  = [{'id': i, 'params': p} for i, p in enumerate(configs)]
+    print(f"Sweep '{name}': {model}, {strategy}, {len(trials)} configs | "
+          f"{workers} workers × {threads} threads | logs in {trial_dir}")
+
+    start = time.perf_counter()
+    ctx   = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        if strategy == 'halving':
+            h      = cfg.get('halving', {})
+            eta    = int(h.get('eta', 3))
+            budget = int(h['min_budget'])
+            top    = int(h['max_budget'])
+            alive  = trials
+            while True:
+                print(f"Rung: {len(alive)} trials @ budget {budget}")
+                run_rung(pool, alive, budget, base)
+                if budget >= top or len(alive) <= 1:
+                    break
+                alive  = sorted(alive, key=lambda t: -t['dir_acc'])[:max(1, len(alive) // eta)]
+                budget = min(budget * eta, top)
+        else:
+            run_rung(pool, trials, int(cfg.get('budget', 10)), base)
+
+    trials.sort(key=lambda t: (-t['dir_acc'], t['train_seconds']))
+    mark_pareto(trials)
+    print_leaderboard(trials, args.top)
+
+    os.makedirs(sweep_dir, exist_ok=True)
+    out = os.path.join(sweep_dir, 'leaderboard.json')
+    with open(out, 'w') as f:
+        json.dump({
+            'created':      datetime.now().isoformat(timespec='seconds'),
+            'config':       cfg,
+            'workers':      workers,
+            'threads':      threads,
+            'wall_seconds': round(time.perf_counter() - start, 1),
+            'trial_dir':    trial_dir,
+            'trials':       trials,
+        }, f, indent=2, default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+    print(f"✓ Leaderboard → {out}")
+
+
+if __name__ == '__main__':
+    main()
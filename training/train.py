@@ -13,6 +13,7 @@ from data.data_loader import StockDataLoader
 from data.preprocessing import TimeSeriesPreprocessor
 from models.hybrid_lstm_gru import HybridLSTMGRU, count_parameters
 from training.dataset import StockSequenceDataset
+from training.engine import Trainer, default_run_log
 
 
 class DirectionalLoss(nn.Module):
@@ -37,14 +38,11 @@ class DirectionalLoss(nn.Module):
 
 
 class StockTrainer:
-    """Training pipeline optimized for RTX 3060 6GB"""
+    """Single-stock training pipeline on top of training.engine.Trainer"""
 
     def __init__(self, model, device, config):
-        self.model  = model.to(device)
-        self.device = device
         self.config = config
-
-        self.scaler = torch.amp.GradScaler('cuda')
+        self.device = device
 
         # Directional loss — focuses training on getting direction right
         self.criterion = DirectionalLoss(mse_weight=0.4, dir_weight=0.6)
@@ -56,80 +54,34 @@ class StockTrainer:
         self.scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
             self.optimizer, mode='min', patience=5, factor=0.5
         )
-        self.best_val_loss    = float('inf')
-        self.patience_counter = 0
+        self.engine = Trainer(
+            model, self.criterion, self.optimizer, device=device, scheduler=self.scheduler,
+            precision=config.get('precision', 'auto'),
+            accumulation_steps=config.get('accumulation_steps', 1),
+            clip_grad_norm=None,
+            output_fn=lambda out: out,          # targets are (B, 1) here
+            run_log=default_run_log('train'), name='train'
+        )
+        self.model = self.engine.module
 
     def train_epoch(self, train_loader):
-        self.model.train()
-        total_loss = 0
-
-        for X_batch, y_batch in tqdm(train_loader, desc="Training"):
-            X_batch = X_batch.to(self.device)
-            y_batch = y_batch.to(self.device)
-
-            self.optimizer.zero_grad()
-
-            with torch.amp.autocast('cuda'):
-                outputs = self.model(X_batch)
-                loss    = self.criterion(outputs, y_batch)
-
-            self.scaler.scale(loss).backward()
-            self.scaler.step(self.optimizer)
-            self.scaler.update()
-
-            total_loss += loss.item()
-
-        return total_loss / len(train_loader)
+        return self.engine.train_epoch(tqdm(train_loader, desc="Training"))['train_loss']
 
     def validate(self, val_loader):
-        self.model.eval()
-        total_loss  = 0
-        correct_dir = 0
-        total       = 0
-
-        with torch.no_grad():
-            for X_batch, y_batch in val_loader:
-                X_batch = X_batch.to(self.device)
-                y_batch = y_batch.to(self.device)
-
-                with torch.amp.autocast('cuda'):
-                    outputs = self.model(X_batch)
-                    loss    = self.criterion(outputs, y_batch)
-
-                total_loss  += loss.item()
-                correct_dir += ((outputs > 0) == (y_batch > 0)).sum().item()
-                total       += y_batch.size(0)
-
-        dir_acc = correct_dir / total * 100
-        return total_loss / len(val_loader), dir_acc
+        metrics = self.engine.evaluate(val_loader)
+        return metrics['val_loss'], metrics['dir_acc']
 
     def train(self, train_loader, val_loader, epochs,
               save_path='saved_models/best_model.pth'):
 
-        for epoch in range(epochs):
-            train_loss            = self.train_epoch(train_loader)
-            val_loss, dir_acc     = self.validate(val_loader)
-
-            self.scheduler.step(val_loss)
+        def save_best(epoch, metrics):
+            torch.save(self.model.state_dict(), save_path)
+            print(f"✓ Saved! Best val loss: {metrics['val_loss']:.6f} | Dir Acc: {metrics['dir_acc']:.2f}%")
 
-            print(f"Epoch {epoch+1}/{epochs}")
-            print(f"Train Loss: {train_loss:.6f} | Val Loss: {val_loss:.6f} | Dir Acc: {dir_acc:.2f}%")
-            if torch.cuda.is_available():
-                print(f"GPU Memory: {torch.cuda.memory_allocated()/1e9:.2f}GB")
-
-            if val_loss < self.best_val_loss:
-                self.best_val_loss    = val_loss
-                self.patience_counter = 0
-                torch.save(self.model.state_dict(), save_path)
-                print(f"✓ Saved! Best val loss: {val_loss:.6f} | Dir Acc: {dir_acc:.2f}%")
-            else:
-                self.patience_counter += 1
-
-            if self.patience_counter >= self.config['early_stopping_patience']:
-                print(f"Early stopping after {epoch+1} epochs")
-                break
-
-            torch.cuda.empty_cache()
+        self.engine.fit(
+            train_loader, val_loader, epochs,
+            patience=self.config['early_stopping_patience'], on_improve=save_best
+        )
 
 
 def main():
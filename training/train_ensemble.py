@@ -7,17 +7,33 @@
 # Output files:
 #   saved_models/xgb_model.pkl
 #   saved_models/cnn1d_model.pth
+#   saved_models/cnn1d_model.ts.pt      ← TorchScript, BatchNorm folded
 #   saved_models/meta_learner.pkl
+#   saved_models/versions/<timestamp>/   ← registry snapshot, made CURRENT
+#
+#   python training/train_ensemble.py --resume   # continue an interrupted run
+#
+# Sequences and the CNN's full-state checkpoint are kept under
+# saved_models/checkpoints/train_ensemble/; --resume reuses them and the
+# XGBoost model already saved by the interrupted run.
+#
+#   python training/train_ensemble.py --threads 8   # intra-op threads for the LSTM / CNN passes
+#
+# The sequences are memory-mapped from that directory once built, and the
+# LSTM / CNN meta-features come from models/inference.py, so neither the
+# windows nor the model outputs are held twice in RAM.
 
 import os
 import sys
+import shutil
+import argparse
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import torch
 import torch.nn as nn
 import numpy as np
 import joblib
-from torch.utils.data import DataLoader, TensorDataset
+from torch.utils.data import DataLoader
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score
@@ -26,6 +42,11 @@ from xgboost import XGBClassifier
 from data.data_loader import StockDataLoader
 from models.hybrid_lstm_gru import HybridLSTMGRU
 from models.cnn1d_model import CNN1DModel
+from models.registry import ModelRegistry
+from models.export import export_cnn
+from models.inference import predict_array
+from training.dataset import StockSequenceDataset
+from training.engine import Trainer, default_run_log, save_arrays, load_arrays, CHECKPOINT_DIR
 
 
 # ── Config ─────────────────────────────────────────────────────────────────────
@@ -37,11 +58,23 @@ NUM_STOCKS      = 150
 TRAIN_SPLIT     = 0.70
 VAL_SPLIT       = 0.15
 
+# XGBoost on last-timestep features; n_estimators is the round cap for early stopping
+XGB_PARAMS = {
+    'n_estimators':     400,
+    'max_depth':        5,
+    'learning_rate':    0.05,
+    'subsample':        0.8,
+    'colsample_bytree': 0.8,
+    'min_child_weight': 3,
+}
+XGB_EARLY_STOPPING = 30
+
 LSTM_PATH  = 'saved_models/returns_model.pth'
 FEAT_PATH  = 'saved_models/returns_feature_cols.pkl'
 XGB_PATH   = 'saved_models/xgb_model.pkl'
 CNN_PATH   = 'saved_models/cnn1d_model.pth'
 META_PATH  = 'saved_models/meta_learner.pkl'
+RUN_DIR    = os.path.join(CHECKPOINT_DIR, 'train_ensemble')
 
 NIFTY50 = [
     "RELIANCE","TCS","HDFCBANK","INFY","ICICIBANK","HINDUNILVR","SBIN",
@@ -92,102 +125,86 @@ def create_sequences(df, feature_cols, seq_len=SEQUENCE_LENGTH):
 
 # ── Model inference helpers ────────────────────────────────────────────────────
 
-def get_lstm_preds(model, X_np, device, batch_size=512):
+def get_lstm_preds(model, X_np, device, threads=None):
     """Returns raw LSTM return predictions (float array)."""
-    model.eval()
-    preds = []
-    X_t = torch.FloatTensor(X_np)
-    with torch.no_grad():
-        for i in range(0, len(X_t), batch_size):
-            batch = X_t[i:i + batch_size].to(device)
-            out   = model(batch).squeeze(1).cpu().numpy()
-            preds.extend(out)
-    return np.array(preds, dtype=np.float32)
-
-
-def get_cnn_preds(model, X_np, device, batch_size=512):
+    return predict_array(model, X_np, device, threads=threads)
+
+
+def get_cnn_preds(model, X_np, device, threads=None):
     """Returns raw CNN logits (float array). Positive = predicts UP."""
-    model.eval()
-    preds = []
-    X_t = torch.FloatTensor(X_np)
-    with torch.no_grad():
-        for i in range(0, len(X_t), batch_size):
-            batch = X_t[i:i + batch_size].to(device)
-            out   = model(batch).squeeze(1).cpu().numpy()
-            preds.extend(out)
-    return np.array(preds, dtype=np.float32)
+    return predict_array(model, X_np, device, threads=threads)
 
 
 # ── CNN training ───────────────────────────────────────────────────────────────
 
-def train_cnn(X_train, y_train, X_val, y_val, input_size, device):
+def train_cnn(X_train, y_train, X_val, y_val, input_size, device, precision='auto',
+              checkpoint=None, resume=False):
     """
     Train CNN1D as a binary direction classifier.
     y_train / y_val: float32 arrays of 0.0 or 1.0 (direction labels).
+    checkpoint: full-state checkpoint path, rewritten every epoch; with
+    resume=True an existing one is loaded first.
     Returns: trained CNN1DModel
     """
-    model     = CNN1DModel(input_size=input_size, seq_len=SEQUENCE_LENGTH).to(device)
+    model     = CNN1DModel(input_size=input_size, seq_len=SEQUENCE_LENGTH)
     criterion = nn.BCEWithLogitsLoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
     scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
         optimizer, mode='min', patience=5, factor=0.5
     )
+    trainer = Trainer(
+        model, criterion, optimizer, device=device, scheduler=scheduler,
+        precision=precision, target_threshold=0.5,
+        run_log=default_run_log('train_cnn'), name='train_cnn'
+    )
 
-    X_tr = torch.FloatTensor(X_train)
-    y_tr = torch.FloatTensor(y_train)
-    X_vl = torch.FloatTensor(X_val).to(device)
-    y_vl = torch.FloatTensor(y_val).to(device)
-
+    # StockSequenceDataset shares memory-mapped windows instead of copying them
     train_loader = DataLoader(
-        TensorDataset(X_tr, y_tr),
+        StockSequenceDataset(X_train, y_train),
         batch_size=BATCH_SIZE, shuffle=True, num_workers=0
     )
+    val_loader = DataLoader(
+        StockSequenceDataset(X_val, y_val),
+        batch_size=BATCH_SIZE * 8, num_workers=0
+    )
+
+    if resume and checkpoint and os.path.exists(checkpoint):
+        trainer.load_checkpoint(checkpoint)
 
-    best_val_loss    = float('inf')
-    patience_counter = 0
-    best_state       = None
-
-    for epoch in range(1, CNN_EPOCHS + 1):
-        model.train()
-        train_loss = 0.0
-        for Xb, yb in train_loader:
-            Xb, yb = Xb.to(device), yb.to(device)
-            optimizer.zero_grad()
-            out  = model(Xb).squeeze(1)
-            loss = criterion(out, yb)
-            loss.backward()
-            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
-            optimizer.step()
-            train_loss += loss.item()
-
-        model.eval()
-        with torch.no_grad():
-            val_out  = model(X_vl).squeeze(1)
-            val_loss = criterion(val_out, y_vl).item()
-            val_acc  = ((val_out > 0) == (y_vl > 0.5)).float().mean().item() * 100
-
-        scheduler.step(val_loss)
-        print(f"  CNN Epoch {epoch:3d}/{CNN_EPOCHS} | "
-              f"Train: {train_loss/len(train_loader):.4f} | "
-              f"Val: {val_loss:.4f} | Dir Acc: {val_acc:.2f}%")
-
-        if val_loss < best_val_loss:
-            best_val_loss    = val_loss
-            patience_counter = 0
-            best_state = {k: v.cpu().clone() for k, v in model.state_dict().items()}
-        else:
-            patience_counter += 1
-            if patience_counter >= CNN_PATIENCE:
-                print(f"  CNN early stopping at epoch {epoch}")
-                break
-
-    model.load_state_dict(best_state)
+    # Best weights ride along in trainer.extra so a resumed run still has them
+    def keep_best(epoch, metrics):
+        trainer.extra['best_state'] = {k: v.cpu().clone() for k, v in trainer.module.state_dict().items()}
+
+    trainer.fit(train_loader, val_loader, CNN_EPOCHS, patience=CNN_PATIENCE,
+                on_improve=keep_best, label='  CNN Epoch', checkpoint=checkpoint)
+
+    model.load_state_dict(trainer.extra['best_state'])
     return model
 
 
+def train_xgb(X_tr_last, y_tr_cls, X_vl_last, y_vl_cls):
+    """XGBoost direction classifier on last-timestep features, early-stopped on val."""
+    print("\nTraining XGBoost (last-timestep features)...")
+    xgb = XGBClassifier(
+        **XGB_PARAMS,
+        early_stopping_rounds=XGB_EARLY_STOPPING,   # in constructor — compatible with all versions
+        eval_metric='logloss',
+        tree_method='hist',
+        verbosity=0,
+        n_jobs=-1,
+        random_state=42
+    )
+    xgb.fit(
+        X_tr_last, y_tr_cls,
+        eval_set=[(X_vl_last, y_vl_cls)],
+        verbose=50
+    )
+    return xgb
+
+
 # ── Main ───────────────────────────────────────────────────────────────────────
 
-def main():
+def main(resume=False, threads=None):
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Device: {device}")
 
@@ -217,78 +234,76 @@ def main():
     lstm_model.to(device).eval()
     print(f"LSTM loaded (input={input_size}, hidden={hidden_size}, layers={num_layers})")
 
-    # ── Load stock data and build sequences ──────────────────────────────────
-    loader   = StockDataLoader()
-    all_db   = set(loader.get_stocks_with_min_history(min_days=1500))
-    priority = [s for s in NIFTY50 if s in all_db]
-    others   = sorted([s for s in all_db if s not in set(NIFTY50)])
-    symbols  = (priority + others)[:NUM_STOCKS]
-    print(f"Loading data from {len(symbols)} stocks...")
-
-    all_X_tr, all_y_tr_cls = [], []
-    all_X_vl, all_y_vl_cls = [], []
-
-    for i, sym in enumerate(symbols):
-        print(f"  {i+1}/{len(symbols)} {sym}...", end=' ')
-        try:
-            df = loader.load_stock_data(sym)
-            if df is None or len(df) < 300:
-                print("SKIP")
-                continue
-            X_seq, y_ret, y_cls = create_sequences(df, feature_cols)
-            if X_seq is None or len(X_seq) < 50:
-                print("SKIP - too few seqs")
-                continue
-            tr = int(len(X_seq) * TRAIN_SPLIT)
-            vl = int(len(X_seq) * VAL_SPLIT)
-            all_X_tr.append(X_seq[:tr]);              all_y_tr_cls.append(y_cls[:tr])
-            all_X_vl.append(X_seq[tr:tr + vl]);      all_y_vl_cls.append(y_cls[tr:tr + vl])
-            print(f"OK  {tr} train seqs")
-        except Exception as e:
-            print(f"ERROR: {e}")
-
-    X_train   = np.concatenate(all_X_tr)
-    y_tr_cls  = np.concatenate(all_y_tr_cls)
-    X_val     = np.concatenate(all_X_vl)
-    y_vl_cls  = np.concatenate(all_y_vl_cls)
+    # ── Load stock data and build sequences (or reuse the interrupted run's) ─
+    if not resume:
+        shutil.rmtree(RUN_DIR, ignore_errors=True)     # a fresh run never mixes with an old one
+    data_dir  = os.path.join(RUN_DIR, 'data')
+    arrays, _ = load_arrays(data_dir, mmap=True) if resume else (None, None)
+    if arrays is not None:
+        print(f"Sequences from {data_dir}")
+    else:
+        loader   = StockDataLoader()
+        all_db   = set(loader.get_stocks_with_min_history(min_days=1500))
+        priority = [s for s in NIFTY50 if s in all_db]
+        others   = sorted([s for s in all_db if s not in set(NIFTY50)])
+        symbols  = (priority + others)[:NUM_STOCKS]
+        print(f"Loading data from {len(symbols)} stocks...")
+
+        all_X_tr, all_y_tr_cls = [], []
+        all_X_vl, all_y_vl_cls = [], []
+
+        for i, sym in enumerate(symbols):
+            print(f"  {i+1}/{len(symbols)} {sym}...", end=' ')
+            try:
+                df = loader.load_stock_data(sym)
+                if df is None or len(df) < 300:
+                    print("SKIP")
+                    continue
+                X_seq, y_ret, y_cls = create_sequences(df, feature_cols)
+                if X_seq is None or len(X_seq) < 50:
+                    print("SKIP - too few seqs")
+                    continue
+                tr = int(len(X_seq) * TRAIN_SPLIT)
+                vl = int(len(X_seq) * VAL_SPLIT)
+                all_X_tr.append(X_seq[:tr]);              all_y_tr_cls.append(y_cls[:tr])
+                all_X_vl.append(X_seq[tr:tr + vl]);      all_y_vl_cls.append(y_cls[tr:tr + vl])
+                print(f"OK  {tr} train seqs")
+            except Exception as e:
+                print(f"ERROR: {e}")
+
+        save_arrays(data_dir,
+                    X_train=np.concatenate(all_X_tr), y_tr_cls=np.concatenate(all_y_tr_cls),
+                    X_val=np.concatenate(all_X_vl),   y_vl_cls=np.concatenate(all_y_vl_cls))
+        del all_X_tr, all_X_vl
+        arrays, _ = load_arrays(data_dir, mmap=True)
+    X_train, y_tr_cls = arrays['X_train'], arrays['y_tr_cls']
+    X_val,   y_vl_cls = arrays['X_val'],   arrays['y_vl_cls']
     print(f"\nTrain: {len(X_train):,}  Val: {len(X_val):,}")
     print("=" * 60)
 
     # ── LSTM baseline on val ─────────────────────────────────────────────────
     print("Getting LSTM predictions on validation set...")
-    lstm_val = get_lstm_preds(lstm_model, X_val, device)
+    lstm_val = get_lstm_preds(lstm_model, X_val, device, threads)
     lstm_acc = ((lstm_val > 0) == (y_vl_cls == 1)).mean() * 100
     print(f"LSTM standalone dir acc: {lstm_acc:.2f}%")
 
     # ── XGBoost on last-timestep features ────────────────────────────────────
-    print("\nTraining XGBoost (last-timestep features)...")
     X_tr_last  = X_train[:, -1, :]   # (n_train, n_features)
     X_vl_last  = X_val[:,   -1, :]
+    cnn_ckpt   = os.path.join(RUN_DIR, 'cnn_state.pt')
+    # The CNN only starts after XGBoost is saved, so a CNN checkpoint means
+    # XGB_PATH already holds this run's model.
+    if resume and os.path.exists(cnn_ckpt) and os.path.exists(XGB_PATH):
+        print(f"\nXGBoost from {XGB_PATH} (saved before the interruption)")
+        xgb = joblib.load(XGB_PATH)
+    else:
+        xgb = train_xgb(X_tr_last, y_tr_cls, X_vl_last, y_vl_cls)
+        joblib.dump(xgb, XGB_PATH)
+        print(f"XGBoost saved → {XGB_PATH}")
 
-    xgb = XGBClassifier(
-        n_estimators=400,
-        max_depth=5,
-        learning_rate=0.05,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        min_child_weight=3,
-        early_stopping_rounds=30,       # in constructor — compatible with all versions
-        eval_metric='logloss',
-        tree_method='hist',
-        verbosity=0,
-        n_jobs=-1,
-        random_state=42
-    )
-    xgb.fit(
-        X_tr_last, y_tr_cls,
-        eval_set=[(X_vl_last, y_vl_cls)],
-        verbose=50
-    )
     xgb_val_probs = xgb.predict_proba(X_vl_last)[:, 1]
     xgb_acc       = accuracy_score(y_vl_cls, (xgb_val_probs > 0.5).astype(int)) * 100
     print(f"XGBoost standalone dir acc: {xgb_acc:.2f}%")
-    joblib.dump(xgb, XGB_PATH)
-    print(f"XGBoost saved → {XGB_PATH}")
 
     # ── CNN1D classifier ─────────────────────────────────────────────────────
     print("\nTraining CNN1D direction classifier...")
@@ -296,9 +311,11 @@ def main():
         X_train, y_tr_cls.astype(np.float32),
         X_val,   y_vl_cls.astype(np.float32),
         input_size=X_train.shape[2],
-        device=device
+        device=device,
+        checkpoint=cnn_ckpt,
+        resume=resume
     )
-    cnn_val_logits = get_cnn_preds(cnn, X_val, device)
+    cnn_val_logits = get_cnn_preds(cnn, X_val, device, threads)
     cnn_acc        = ((cnn_val_logits > 0) == (y_vl_cls == 1)).mean() * 100
     print(f"CNN1D standalone dir acc: {cnn_acc:.2f}%")
     torch.save({
@@ -309,12 +326,14 @@ def main():
         }
     }, CNN_PATH)
     print(f"CNN1D saved → {CNN_PATH}")
+    ts_path = export_cnn(cnn, SEQUENCE_LENGTH, X_train.shape[2], os.path.dirname(CNN_PATH))
+    print(f"CNN1D TorchScript (BN folded) → {ts_path}")
 
     # ── Meta-learner: stack all 3 on VAL ──────────────────────────────────────
     print("\nBuilding meta-features on train set...")
-    lstm_tr      = get_lstm_preds(lstm_model, X_train, device)
+    lstm_tr      = get_lstm_preds(lstm_model, X_train, device, threads)
     xgb_tr_probs = xgb.predict_proba(X_tr_last)[:, 1]
-    cnn_tr       = get_cnn_preds(cnn, X_train, device)
+    cnn_tr       = get_cnn_preds(cnn, X_train, device, threads)
 
     meta_train = np.column_stack([lstm_tr,  xgb_tr_probs,  cnn_tr])
     meta_val   = np.column_stack([lstm_val, xgb_val_probs, cnn_val_logits])
@@ -337,6 +356,21 @@ def main():
     print(f"  Ensemble (meta) : {meta_acc:.2f}%  ← this is what prediction_service uses")
     print("=" * 60)
 
+    # ── Snapshot into the model registry ─────────────────────────────────────
+    version = ModelRegistry().publish(metrics={
+        'lstm_dir_acc': round(float(lstm_acc), 2),
+        'xgb_dir_acc':  round(float(xgb_acc), 2),
+        'cnn_dir_acc':  round(float(cnn_acc), 2),
+        'meta_dir_acc': round(float(meta_acc), 2),
+    })
+    print(f"Published model version {version} (now CURRENT)")
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the XGBoost + CNN1D + meta-learner ensemble")
+    parser.add_argument('--resume', action='store_true',
+                        help=f"Continue from {RUN_DIR}/ instead of starting over")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Intra-op threads for the LSTM / CNN inference passes (default: PyTorch's)")
+    args = parser.parse_args()
+    main(resume=args.resume, threads=args.threads)
\ No newline at end of file
@@ -0,0 +1,351 @@
+# training/train_trees.py
+#
+# Trains the XGBoost + LightGBM pair served by EnsemblePredictionService
+# (backend/services/ensemble_service.py) on the same latest-row features
+# the service scores: load_stock_data → add_technical_indicators → dropna.
+#
+# Output files:
+#   saved_models/ensemble_xgb.pkl
+#   saved_models/ensemble_lgbm.pkl
+#   saved_models/ensemble_scaler.pkl
+#   saved_models/ensemble_feature_cols.pkl
+#   saved_models/ensemble_weights.pkl      ← {'xgb_weight', 'lgbm_weight'}
+#   saved_models/versions/<timestamp>/     ← registry snapshot, made CURRENT
+#
+#   python training/train_trees.py
+#   python training/train_trees.py --threads 8      # split between XGBoost and LightGBM
+#   python training/train_trees.py --resume         # reuse the cached feature rows
+#
+# Labels compare consecutive raw DB closes: the features use the
+# wavelet-denoised series like the service does, but the denoiser sees the
+# whole history, so a label from it would leak the next close.
+#
+# Each stock's rows are split in time: train, val (early stopping), blend
+# (XGB / LGBM weights) and test (the accuracy published with the version).
+#
+# Feature rows (one per stock-day, not one 20-day window per day) are cached
+# under saved_models/checkpoints/train_trees/data/ and memory-mapped. Both
+# libraries read them in CHUNK_ROWS batches, scaled on the fly: XGBoost
+# sketches its QuantileDMatrix from a DataIter and LightGBM bins its Dataset
+# from a Sequence, so neither a scaled copy nor a float64 copy of the
+# matrix is ever made. The two boosters then train concurrently, each with
+# its share of the thread budget.
+
+import os
+import sys
+import time
+import shutil
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import joblib
+import xgboost as xgb
+import lightgbm as lgb
+from sklearn.preprocessing import StandardScaler
+
+from data.data_loader import StockDataLoader
+from data.feature_engineering import FeatureEngineer
+from models.registry import ModelRegistry, MODEL_DIR
+from models.trees import BoosterClassifier
+from backtest.walk_forward import raw_closes
+from training.engine import save_arrays, load_arrays, CHECKPOINT_DIR
+from training.trainlarge import select_symbols, detect_feature_cols, TRAIN_SPLIT, VAL_SPLIT
+
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+CHUNK_ROWS     = 65536
+MAX_BIN        = 256
+MAX_ROUNDS     = 400
+EARLY_STOPPING = 30
+BLEND_SPLIT    = 0.075    # after train / val; the remaining rows are the test split
+RUN_DIR        = os.path.join(CHECKPOINT_DIR, 'train_trees')
+
+XGB_PARAMS = {
+    'objective':        'binary:logistic',
+    'eval_metric':      'logloss',
+    'tree_method':      'hist',
+    'max_depth':        5,
+    'eta':              0.05,
+    'subsample':        0.8,
+    'colsample_bytree': 0.8,
+    'min_child_weight': 3,
+    'seed':             42,
+}
+LGBM_PARAMS = {
+    'objective':         'binary',
+    'metric':            'binary_logloss',
+    'max_depth':         5,
+    'num_leaves':        31,
+    'learning_rate':     0.05,
+    'bagging_fraction':  0.8,
+    'bagging_freq':      1,
+    'feature_fraction':  0.8,
+    'min_child_samples': 20,
+    'seed':              42,
+    'verbosity':         -1,
+}
+
+
+# ── Feature rows ───────────────────────────────────────────────────────────────
+
+def split_bounds(n):
+    """Row indices where a stock's val, blend and test splits start, for `n` labelled rows."""
+    tr = int(n * TRAIN_SPLIT)
+    vl = tr + int(n * VAL_SPLIT)
+    bl = vl + int(n * BLEND_SPLIT)
+    return tr, vl, bl
+
+
+def symbol_rows(loader, engineer, symbol, feature_cols):
+    """
+    One stock's service-space feature rows, next-day UP labels and dates,
+    oldest first. UP = the next raw close is above this day's raw close.
+    """
+    df = loader.load_stock_data(symbol)
+    if df is None or len(df) < 300:
+        return None, None, None
+    df              = engineer.add_technical_indicators(df).dropna()
+    dates           = pd.to_datetime(df['trade_date']).values.astype('datetime64[D]')
+    raw_dates, raw  = raw_closes(symbol)
+    idx             = np.searchsorted(raw_dates, dates)
+    # Rows whose date has a raw close and a next one
+    ok              = (idx + 1 < len(raw_dates)) & (raw_dates[np.minimum(idx, len(raw_dates) - 1)] == dates)
+    idx             = idx[ok]
+    up              = raw[idx + 1] > raw[idx]
+    rows            = df[feature_cols].values[ok].astype(np.float32)
+    return rows, up.astype(np.float32), dates[ok]
+
+
+def build_rows(data_dir):
+    """Per-stock time split (train / val / blend / test) → cached .npy files."""
+    loader, engineer = StockDataLoader(), FeatureEngineer()
+    symbols          = select_symbols(loader)
+
+    feature_cols = None
+    for sym in symbols:
+        df = loader.load_stock_data(sym)
+        if df is not None and len(df) >= 300:
+            feature_cols = detect_feature_cols(engineer.add_technical_indicators(df))
+            print(f"Feature cols from {sym}: {len(feature_cols)} features")
+            break
+    if not feature_cols:
+        print("ERROR: Could not detect feature columns!")
+        return False
+
+    parts = {f'{x}_{split}': [] for split in ('train', 'val', 'blend', 'test') for x in 'Xy'}
+    kept  = []
+    for i, sym in enumerate(symbols):
+        print(f"  {i+1}/{len(symbols)} {sym}...", end=' ')
+        try:
+            rows, up, _ = symbol_rows(loader, engineer, sym, feature_cols)
+            if rows is None or len(rows) < 100:
+                print("SKIP")
+                continue
+            tr, vl, bl = split_bounds(len(rows))
+            for split, sl in (('train', slice(0, tr)), ('val', slice(tr, vl)),
+                              ('blend', slice(vl, bl)), ('test', slice(bl, None))):
+                parts[f'X_{split}'].append(rows[sl])
+                parts[f'y_{split}'].append(up[sl])
+            kept.append(sym)
+            print(f"OK  {tr} train rows")
+        except Exception as e:
+            print(f"ERROR: {e}")
+
+    if not kept:
+        print("ERROR: No valid data to train on!")
+        return False
+    save_arrays(data_dir, meta={'feature_cols': feature_cols, 'symbols': kept},
+                **{name: np.concatenate(arrs) for name, arrs in parts.items()})
+    return True
+
+
+def fit_scaler(X):
+    """StandardScaler over the mapped rows, one chunk at a time."""
+    scaler = StandardScaler()
+    for start in range(0, len(X), CHUNK_ROWS):
+        scaler.partial_fit(X[start:start + CHUNK_ROWS])
+    return scaler
+
+
+class ScaledRows:
+    """Chunked, scaled float32 view of a mapped (N, F) array — what both libraries consume."""
+
+    def __init__(self, X, scaler):
+        self.X     = X
+        self.mean  = scaler.mean_.astype(np.float32)
+        self.scale = scaler.scale_.astype(np.float32)
+
+    def __len__(self):
+        return len(self.X)
+
+    def __getitem__(self, idx):
+        return (np.asarray(self.X[idx]) - self.mean) / self.scale
+
+    def chunks(self):
+        for start in range(0, len(self.X), CHUNK_ROWS):
+            yield start, self[start:start + CHUNK_ROWS]
+
+
+class _XGBRows(xgb.DataIter):
+    """Feeds QuantileDMatrix one scaled chunk at a time."""
+
+    def __init__(self, rows, y):
+        self.rows, self.y = rows, y
+        self._it = None
+        super().__init__()
+
+    def next(self, input_data):
+        if self._it is None:
+            self._it = self.rows.chunks()
+        batch = next(self._it, None)
+        if batch is None:
+            return False
+        start, X = batch
+        input_data(data=X, label=np.asarray(self.y[start:start + len(X)]))
+        return True
+
+    def reset(self):
+        self._it = None
+
+
+class _LGBMRows(lgb.Sequence):
+    """Row / slice access for lightgbm.Dataset's sampling and chunked binning."""
+
+    batch_size = CHUNK_ROWS
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, idx):
+        # Sampled single rows must be float64; chunks are pushed as float32
+        row = self.rows[idx]
+        return row.astype(np.float64) if row.ndim == 1 else row
+
+
+# ── Boosters ───────────────────────────────────────────────────────────────────
+
+def train_xgb(train, y_train, val, y_val, threads):
+    start  = time.perf_counter()
+    dtrain = xgb.QuantileDMatrix(_XGBRows(train, y_train), max_bin=MAX_BIN, nthread=threads)
+    dval   = xgb.QuantileDMatrix(_XGBRows(val, y_val), ref=dtrain, nthread=threads)
+    booster = xgb.train({**XGB_PARAMS, 'max_bin': MAX_BIN, 'nthread': threads}, dtrain,
+                        num_boost_round=MAX_ROUNDS, evals=[(dval, 'val')],
+                        early_stopping_rounds=EARLY_STOPPING, verbose_eval=50)
+    print(f"✓ XGBoost: {booster.best_iteration + 1} rounds in {time.perf_counter() - start:.1f}s "
+          f"({threads} threads)")
+    return BoosterClassifier(booster, booster.best_iteration)
+
+
+def train_lgbm(train, y_train, val, y_val, threads):
+    start  = time.perf_counter()
+    params = {**LGBM_PARAMS, 'max_bin': MAX_BIN - 1, 'num_threads': threads}
+    dtrain = lgb.Dataset(_LGBMRows(train), label=np.asarray(y_train), params=params)
+    dval   = lgb.Dataset(_LGBMRows(val), label=np.asarray(y_val), reference=dtrain)
+    booster = lgb.train(params, dtrain, num_boost_round=MAX_ROUNDS, valid_sets=[dval],
+                        callbacks=[lgb.early_stopping(EARLY_STOPPING, verbose=False), lgb.log_evaluation(50)])
+    print(f"✓ LightGBM: {booster.best_iteration} rounds in {time.perf_counter() - start:.1f}s "
+          f"({threads} threads)")
+    return BoosterClassifier(booster, booster.best_iteration)
+
+
+def blend_weights(p_xgb, p_lgbm, y, step=0.05):
+    """XGBoost weight in [0, 1] minimising the blend's log loss on (p_xgb, p_lgbm, y)."""
+    eps    = 1e-7
+    grid   = np.round(np.arange(0, 1 + step / 2, step), 4)
+    losses = []
+    for w in grid:
+        p = np.clip(w * p_xgb + (1 - w) * p_lgbm, eps, 1 - eps)
+        losses.append(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+    w = float(grid[int(np.argmin(losses))])
+    return {'xgb_weight': w, 'lgbm_weight': round(1 - w, 4)}
+
+
+def predict_chunked(model, rows):
+    return np.concatenate([model.predict_proba(X)[:, 1] for _, X in rows.chunks()])
+
+
+# ── Main ───────────────────────────────────────────────────────────────────────
+
+def main(resume=False, threads=None):
+    if not resume:
+        shutil.rmtree(RUN_DIR, ignore_errors=True)
+    data_dir     = os.path.join(RUN_DIR, 'data')
+    arrays, meta = load_arrays(data_dir, mmap=True)
+    if arrays is not None:
+        print(f"Feature rows from {data_dir}")
+    else:
+        if not build_rows(data_dir):
+            return
+        arrays, meta = load_arrays(data_dir, mmap=True)
+    X_train, y_train = arrays['X_train'], arrays['y_train']
+    X_val,   y_val   = arrays['X_val'],   arrays['y_val']
+    feature_cols     = meta['feature_cols']
+    print(f"Train: {len(X_train):,}  |  Val: {len(X_val):,}  |  Blend: {len(arrays['X_blend']):,}  |  "
+          f"Test: {len(arrays['X_test']):,}  |  Features: {X_train.shape[1]}  |  Stocks: {len(meta['symbols'])}")
+    print("=" * 60)
+
+    scaler = fit_scaler(X_train)
+    train  = ScaledRows(X_train, scaler)
+    val    = ScaledRows(X_val, scaler)
+
+    # ── XGBoost and LightGBM side by side, splitting the thread budget ────────
+    budget       = threads or os.cpu_count() or 1
+    xgb_threads  = max(1, (budget + 1) // 2)
+    lgbm_threads = max(1, budget // 2)
+    print(f"Training XGBoost ({xgb_threads} threads) and LightGBM ({lgbm_threads} threads) concurrently...")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        xgb_future  = pool.submit(train_xgb,  train, y_train, val, y_val, xgb_threads)
+        lgbm_future = pool.submit(train_lgbm, train, y_train, val, y_val, lgbm_threads)
+        xgb_model, lgbm_model = xgb_future.result(), lgbm_future.result()
+
+    # ── Blend weights on the blend split, accuracy on the untouched test split ─
+    blend    = ScaledRows(arrays['X_blend'], scaler)
+    weights  = blend_weights(predict_chunked(xgb_model, blend), predict_chunked(lgbm_model, blend),
+                             np.asarray(arrays['y_blend']))
+    test     = ScaledRows(arrays['X_test'], scaler)
+    y_ts     = np.asarray(arrays['y_test'])
+    p_xgb    = predict_chunked(xgb_model, test)
+    p_lgbm   = predict_chunked(lgbm_model, test)
+    p_blend  = weights['xgb_weight'] * p_xgb + weights['lgbm_weight'] * p_lgbm
+    xgb_acc  = ((p_xgb > 0.5) == (y_ts == 1)).mean() * 100
+    lgbm_acc = ((p_lgbm > 0.5) == (y_ts == 1)).mean() * 100
+    acc      = ((p_blend > 0.5) == (y_ts == 1)).mean() * 100
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(xgb_model,    os.path.join(MODEL_DIR, 'ensemble_xgb.pkl'))
+    joblib.dump(lgbm_model,   os.path.join(MODEL_DIR, 'ensemble_lgbm.pkl'))
+    joblib.dump(scaler,       os.path.join(MODEL_DIR, 'ensemble_scaler.pkl'))
+    joblib.dump(feature_cols, os.path.join(MODEL_DIR, 'ensemble_feature_cols.pkl'))
+    joblib.dump(weights,      os.path.join(MODEL_DIR, 'ensemble_weights.pkl'))
+
+    print("\n" + "=" * 60)
+    print("  ENSEMBLE (XGBoost + LightGBM) — held-out test")
+    print("=" * 60)
+    print(f"  XGBoost alone   : {xgb_acc:.2f}%")
+    print(f"  LightGBM alone  : {lgbm_acc:.2f}%")
+    print(f"  Blend           : {acc:.2f}%  (xgb {weights['xgb_weight']:.2f} / lgbm {weights['lgbm_weight']:.2f})")
+    print("=" * 60)
+
+    # ── Snapshot into the model registry ─────────────────────────────────────
+    version = ModelRegistry().publish(metrics={
+        'ensemble_xgb_dir_acc':  round(float(xgb_acc), 2),
+        'ensemble_lgbm_dir_acc': round(float(lgbm_acc), 2),
+        'ensemble_dir_acc':      round(float(acc), 2),
+    })
+    print(f"Published model version {version} (now CURRENT)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the XGBoost + LightGBM pair for EnsemblePredictionService")
+    parser.add_argument('--resume', action='store_true',
+                        help=f"Reuse the feature rows cached in {RUN_DIR}/data")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Total threads, split between the two boosters (default: all cores)")
+    args = parser.parse_args()
+    main(resume=args.resume, threads=args.threads)
@@ -1,7 +1,19 @@
 # training/trainlarge.py
+#
+#   python training/trainlarge.py                   # next-day returns model
+#   python training/trainlarge.py --multi-horizon   # direct 1..250-day head
+#   python training/trainlarge.py --precision fp32 --accumulation-steps 4
+#   python training/trainlarge.py --resume          # continue an interrupted run
+#   python training/trainlarge.py --nproc 8         # data-parallel over 8 local processes (gloo)
+#
+# Full-state checkpoints and the built sequences are kept under
+# saved_models/checkpoints/trainlarge[-mh]/, so --resume skips the DB reads
+# and feature engineering as well as the finished epochs.
 
 import os
 import sys
+import shutil
+import argparse
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import torch
@@ -9,12 +21,16 @@ import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
 import joblib
-from torch.utils.data import DataLoader
 from sklearn.preprocessing import StandardScaler
 
 from data.data_loader import StockDataLoader
 from models.hybrid_lstm_gru import HybridLSTMGRU, count_parameters
+from models.export import export_lstm
+from models.multi_horizon import HORIZONS, MULTI_HORIZON_NAME, horizon_targets, horizon_scale
 from training.dataset import StockSequenceDataset
+from training.engine import (Trainer, default_run_log, atomic_save, save_arrays, load_arrays,
+                             PRECISIONS, CHECKPOINT_DIR)
+from training.distributed import world, is_main, barrier, broadcast_object, shard_loader, launch, process_group
 
 
 # ── Config ─────────────────────────────────────────────────────────────────────
@@ -31,6 +47,7 @@ VAL_SPLIT       = 0.15
 NUM_STOCKS      = 150
 BEST_PATH       = 'saved_models/returns_model.pth'
 FEAT_COLS_PATH  = 'saved_models/returns_feature_cols.pkl'
+MH_PATH         = f'saved_models/{MULTI_HORIZON_NAME}'
 
 NIFTY50 = [
     "RELIANCE","TCS","HDFCBANK","INFY","ICICIBANK","HINDUNILVR","SBIN",
@@ -62,8 +79,11 @@ class DirectionalLoss(nn.Module):
         return self.mse_weight * mse_loss + self.dir_weight * dir_loss
 
 
-def create_return_sequences(df, feature_cols, sequence_length=SEQUENCE_LENGTH):
-    """Build (X_seq, y_seq) from a single stock's dataframe."""
+def scaled_panel(df, feature_cols):
+    """
+    A single stock's standardised feature matrix and next-day return target,
+    before windowing — (None, None) if none of feature_cols are present.
+    """
     df = df.copy()
     df['target_return'] = df['close_price'].pct_change().shift(-1)
     df = df.dropna()
@@ -75,6 +95,14 @@ def create_return_sequences(df, feature_cols, sequence_length=SEQUENCE_LENGTH):
     scaler = StandardScaler()
     X = scaler.fit_transform(df[cols].values)
     y = df['target_return'].values
+    return X, y
+
+
+def create_return_sequences(df, feature_cols, sequence_length=SEQUENCE_LENGTH):
+    """Build (X_seq, y_seq) from a single stock's dataframe."""
+    X, y = scaled_panel(df, feature_cols)
+    if X is None:
+        return None, None
 
     X_seq, y_seq = [], []
     for i in range(len(X) - sequence_length):
@@ -87,6 +115,35 @@ def create_return_sequences(df, feature_cols, sequence_length=SEQUENCE_LENGTH):
     )
 
 
+def create_multi_horizon_sequences(df, feature_cols, sequence_length=SEQUENCE_LENGTH):
+    """
+    Build (X_seq, Y_seq) for the direct multi-horizon head. Y_seq[i, j] is the
+    cumulative log return from the window's last close to HORIZONS[j] days
+    later, divided by √h. Windows without a full 250-day future are dropped.
+    """
+    df   = df.dropna()
+    cols = [c for c in feature_cols if c in df.columns]
+    if not cols:
+        return None, None
+
+    scaler = StandardScaler()
+    X = scaler.fit_transform(df[cols].values)
+    Y = horizon_targets(df['close_price'].values) / horizon_scale()
+
+    X_seq, y_seq = [], []
+    for i in range(len(X) - sequence_length + 1):
+        t = i + sequence_length - 1          # last row inside the window
+        if np.isnan(Y[t]).any():
+            break                            # NaNs only at the tail
+        X_seq.append(X[i:i + sequence_length])
+        y_seq.append(Y[t])
+
+    return (
+        np.array(X_seq, dtype=np.float32),
+        np.array(y_seq, dtype=np.float32)
+    )
+
+
 def detect_feature_cols(df):
     """Exclude raw OHLCV and target — use everything else as features."""
     exclude = {
@@ -97,45 +154,51 @@ def detect_feature_cols(df):
     return [c for c in df.columns if c not in exclude]
 
 
-def train():
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Device: {device}")
-    if torch.cuda.is_available():
-        print(f"GPU: {torch.cuda.get_device_name(0)}")
-
-    loader = StockDataLoader()
-
-    # ── Stock selection: NIFTY50 priority + fill to NUM_STOCKS ────────────────
-    all_db   = set(loader.get_stocks_with_min_history(min_days=1500))
+def select_symbols(loader, num_stocks=NUM_STOCKS, min_days=1500):
+    """Stock selection: NIFTY50 priority + fill to num_stocks."""
+    all_db   = set(loader.get_stocks_with_min_history(min_days=min_days))
     priority = [s for s in NIFTY50 if s in all_db]
     others   = sorted([s for s in all_db if s not in set(NIFTY50)])
-    symbols  = (priority + others)[:NUM_STOCKS]
-    print(f"DB symbols with 1500+ days : {len(all_db)}")
+    symbols  = (priority + others)[:num_stocks]
+    print(f"DB symbols with {min_days}+ days : {len(all_db)}")
     print(f"NIFTY50 in DB              : {len(priority)}/50")
     print(f"Extra fill                 : {len(symbols) - len(priority)}")
     print(f"Total stocks               : {len(symbols)}")
     print("=" * 60)
+    return symbols
+
+
+def build_dataset(multi_horizon=False):
+    """
+    Select the stock universe, detect feature columns and build the
+    train / val sequences. Returns
+    (X_train, y_train, X_val, y_val, feature_cols, symbols) or None.
+    """
+    loader  = StockDataLoader()
+    symbols = select_symbols(loader)
 
     # ── Detect feature cols from first valid stock ─────────────────────────────
-    feature_cols = None
-    for sym in symbols:
-        df = loader.load_stock_data(sym)
-        if df is not None and len(df) >= 1500:
-            df['target_return'] = df['close_price'].pct_change().shift(-1)
-            df = df.dropna()
-            feature_cols = detect_feature_cols(df)
-            if feature_cols:
-                print(f"Feature cols from {sym}: {len(feature_cols)} features")
-                print(f"  {feature_cols}")
-                break
+    # The multi-horizon head must share the serving feature list, so reuse it.
+    if multi_horizon and os.path.exists(FEAT_COLS_PATH):
+        feature_cols = joblib.load(FEAT_COLS_PATH)
+        print(f"Feature cols from {FEAT_COLS_PATH}: {len(feature_cols)} features")
+    else:
+        feature_cols = None
+        for sym in symbols:
+            df = loader.load_stock_data(sym)
+            if df is not None and len(df) >= 1500:
+                df['target_return'] = df['close_price'].pct_change().shift(-1)
+                df = df.dropna()
+                feature_cols = detect_feature_cols(df)
+                if feature_cols:
+                    print(f"Feature cols from {sym}: {len(feature_cols)} features")
+                    print(f"  {feature_cols}")
+                    break
 
     if not feature_cols:
         print("ERROR: Could not detect feature columns!")
-        return
+        return None
 
-    os.makedirs('saved_models', exist_ok=True)
-    joblib.dump(feature_cols, FEAT_COLS_PATH)
-    print(f"Feature cols saved ({len(feature_cols)} features)")
     print("=" * 60)
 
     # ── Build sequences ────────────────────────────────────────────────────────
@@ -152,7 +215,10 @@ def train():
                 failed.append(sym)
                 continue
 
-            X_seq, y_seq = create_return_sequences(df, feature_cols)
+            if multi_horizon:
+                X_seq, y_seq = create_multi_horizon_sequences(df, feature_cols)
+            else:
+                X_seq, y_seq = create_return_sequences(df, feature_cols)
             if X_seq is None or len(X_seq) < 100:
                 print("SKIP - too few sequences")
                 failed.append(sym)
@@ -160,13 +226,16 @@ def train():
 
             train_size = int(len(X_seq) * TRAIN_SPLIT)
             val_size   = int(len(X_seq) * VAL_SPLIT)
+            # Long-horizon targets look up to 250 bars ahead — purge the tail of
+            # the train split so no training target overlaps the validation period.
+            gap        = max(HORIZONS) if multi_horizon else 0
 
-            all_X_train.append(X_seq[:train_size])
-            all_y_train.append(y_seq[:train_size])
+            all_X_train.append(X_seq[:train_size - gap])
+            all_y_train.append(y_seq[:train_size - gap])
             all_X_val.append(X_seq[train_size:train_size + val_size])
             all_y_val.append(y_seq[train_size:train_size + val_size])
             successful.append(sym)
-            print(f"OK  {train_size} train seqs")
+            print(f"OK  {train_size - gap} train seqs")
 
         except Exception as e:
             print(f"ERROR: {e}")
@@ -177,34 +246,87 @@ def train():
 
     if not all_X_train:
         print("ERROR: No valid data to train on!")
-        return
+        return None
 
     X_train = np.concatenate(all_X_train)
     y_train = np.concatenate(all_y_train)
     X_val   = np.concatenate(all_X_val)
     y_val   = np.concatenate(all_y_val)
 
+    return X_train, y_train, X_val, y_val, feature_cols, successful
+
+
+def train(multi_horizon=False, precision='auto', accumulation_steps=1, compile=False,
+          resume=False, checkpoint_every=1):
+    rank, world_size = world()
+    # Distributed runs are gloo data-parallel over CPU processes
+    device = torch.device('cuda' if torch.cuda.is_available() and world_size == 1 else 'cpu')
+    print(f"Device: {device}")
+    print(f"Mode  : {'direct multi-horizon ' + str(HORIZONS) if multi_horizon else 'next-day returns'}")
+    if device.type == 'cuda':
+        print(f"GPU: {torch.cuda.get_device_name(0)}")
+    if world_size > 1:
+        print(f"Distributed: {world_size} processes × {torch.get_num_threads()} threads | "
+              f"global batch {world_size * BATCH_SIZE}")
+
+    run_name   = 'trainlarge-mh' if multi_horizon else 'trainlarge'
+    run_dir    = os.path.join(CHECKPOINT_DIR, run_name)
+    state_path = os.path.join(run_dir, 'state.pt')
+    data_dir   = os.path.join(run_dir, 'data')
+
+    # ── Sequences: cached from the interrupted run, or built from the DB ───────
+    # Rank 0 builds and caches them; every rank then maps the same .npy files
+    # copy-on-write, so N processes share one copy in the page cache.
+    ok = True
+    if is_main():
+        if not resume:
+            shutil.rmtree(run_dir, ignore_errors=True)     # a fresh run never mixes with an old one
+        if load_arrays(data_dir, mmap=True)[0] is not None:
+            print(f"Sequences from {data_dir}")
+        else:
+            built = build_dataset(multi_horizon)
+            ok    = built is not None
+            if ok:
+                X_train, y_train, X_val, y_val, feature_cols, successful = built
+                save_arrays(data_dir, meta={'feature_cols': feature_cols, 'symbols': successful},
+                            X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+                del built, X_train, y_train, X_val, y_val
+    if not broadcast_object(ok):
+        return
+
+    arrays, meta     = load_arrays(data_dir, mmap=True)
+    X_train, y_train = arrays['X_train'], arrays['y_train']
+    X_val,   y_val   = arrays['X_val'],   arrays['y_val']
+    feature_cols     = meta['feature_cols']
+    successful       = meta['symbols']
+
+    if is_main():
+        os.makedirs('saved_models', exist_ok=True)
+        joblib.dump(feature_cols, FEAT_COLS_PATH)
+
     print(f"Train: {len(X_train):,}  |  Val: {len(X_val):,}  |  Features: {X_train.shape[2]}")
     print("=" * 60)
 
     # ── Dataloaders ────────────────────────────────────────────────────────────
-    train_loader = DataLoader(
-        StockSequenceDataset(X_train, y_train),
-        batch_size=BATCH_SIZE, shuffle=True,
-        num_workers=0, pin_memory=True
+    # Each rank sees its own shard of the sequence index (all of it single-process)
+    train_loader = shard_loader(
+        StockSequenceDataset(X_train, y_train), BATCH_SIZE, train=True,
+        num_workers=0, pin_memory=device.type == 'cuda'
     )
-    val_loader = DataLoader(
-        StockSequenceDataset(X_val, y_val),
-        batch_size=BATCH_SIZE,
-        num_workers=0, pin_memory=True
+    val_loader = shard_loader(
+        StockSequenceDataset(X_val, y_val), BATCH_SIZE, train=False,
+        num_workers=0, pin_memory=device.type == 'cuda'
     )
 
     # ── Model ──────────────────────────────────────────────────────────────────
-    input_size = X_train.shape[2]
+    input_size  = X_train.shape[2]
+    output_size = len(HORIZONS) if multi_horizon else 1
+    save_path   = MH_PATH if multi_horizon else BEST_PATH
     model = HybridLSTMGRU(
         input_size=input_size,
         hidden_size=HIDDEN_SIZE,
         num_layers=NUM_LAYERS,
+        output_size=output_size,
         dropout=DROPOUT
     ).to(device)
     print(f"Model parameters: {count_parameters(model):,}")
@@ -215,76 +337,62 @@ def train():
     scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
         optimizer, mode='min', patience=5, factor=0.5
     )
-
-    best_val_loss    = float('inf')
-    patience_counter = 0
+    trainer = Trainer(
+        model, criterion, optimizer, device=device, scheduler=scheduler,
+        precision=precision, accumulation_steps=accumulation_steps, compile=compile,
+        run_log=default_run_log(run_name), name='trainlarge'
+    )
+    print(f"Precision: {trainer.precision} | accumulation: {trainer.accumulation_steps} | "
+          f"run log: {trainer.run_log}")
+    if resume and os.path.exists(state_path):
+        trainer.load_checkpoint(state_path)
+    elif resume:
+        print(f"No checkpoint at {state_path} — starting from epoch 1.")
+
+    config = {
+        'input_size':      input_size,
+        'hidden_size':     HIDDEN_SIZE,
+        'num_layers':      NUM_LAYERS,
+        'dropout':         DROPOUT,
+        'sequence_length': SEQUENCE_LENGTH,   # ← saved for prediction_service
+    }
+    if multi_horizon:
+        config['horizons']     = list(HORIZONS)
+        config['target_scale'] = 'sqrt_horizon'
+
+    def save_best(epoch, metrics):
+        atomic_save({
+            'epoch':            epoch,
+            'model_state_dict': trainer.module.state_dict(),
+            'val_loss':         metrics['val_loss'],
+            'dir_acc':          metrics['dir_acc'],
+            'config':           config
+        }, save_path)
+        print(f"  --> Best model saved! Dir Acc: {metrics['dir_acc']:.2f}%")
 
     # ── Training loop ──────────────────────────────────────────────────────────
-    for epoch in range(1, EPOCHS + 1):
-        model.train()
-        train_loss = 0.0
-        for X_batch, y_batch in train_loader:
-            X_batch = X_batch.to(device)
-            y_batch = y_batch.to(device)
-            optimizer.zero_grad()
-            preds = model(X_batch).squeeze(1)
-            loss  = criterion(preds, y_batch)
-            loss.backward()
-            torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
-            optimizer.step()
-            train_loss += loss.item()
-
-        model.eval()
-        val_loss    = 0.0
-        val_correct = 0
-        val_total   = 0
-        with torch.no_grad():
-            for X_batch, y_batch in val_loader:
-                X_batch = X_batch.to(device)
-                y_batch = y_batch.to(device)
-                preds    = model(X_batch).squeeze(1)
-                loss     = criterion(preds, y_batch)
-                val_loss += loss.item()
-                val_correct += ((preds > 0) == (y_batch > 0)).sum().item()
-                val_total   += y_batch.size(0)
-
-        avg_train = train_loss / len(train_loader)
-        avg_val   = val_loss   / len(val_loader)
-        dir_acc   = val_correct / val_total * 100
-        scheduler.step(avg_val)
-
-        print(f"Epoch {epoch:3d}/{EPOCHS} | "
-              f"Train Loss: {avg_train:.6f} | "
-              f"Val Loss: {avg_val:.6f} | "
-              f"Dir Acc: {dir_acc:.2f}%")
-
-        if avg_val < best_val_loss:
-            best_val_loss    = avg_val
-            patience_counter = 0
-            torch.save({
-                'epoch':            epoch,
-                'model_state_dict': model.state_dict(),
-                'val_loss':         avg_val,
-                'dir_acc':          dir_acc,
-                'config': {
-                    'input_size':      input_size,
-                    'hidden_size':     HIDDEN_SIZE,
-                    'num_layers':      NUM_LAYERS,
-                    'dropout':         DROPOUT,
-                    'sequence_length': SEQUENCE_LENGTH,   # ← saved for prediction_service
-                }
-            }, BEST_PATH)
-            print(f"  --> Best model saved! Dir Acc: {dir_acc:.2f}%")
-        else:
-            patience_counter += 1
-            if patience_counter >= PATIENCE:
-                print(f"Early stopping at epoch {epoch}")
-                break
+    trainer.fit(train_loader, val_loader, EPOCHS, patience=PATIENCE, on_improve=save_best,
+                checkpoint=state_path, checkpoint_every=checkpoint_every)
 
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+    barrier()
+    if not is_main():
+        return
+
+    if multi_horizon:
+        print("=" * 60)
+        print(f"Training complete! Multi-horizon model: {MH_PATH}")
+        print(f"Horizons: {HORIZONS}")
+        print("=" * 60)
+        return
 
     joblib.dump(successful, 'saved_models/trained_stocks.pkl')
+
+    # ── Export best checkpoint for the optimised CPU runtime ───────────────────
+    best = torch.load(BEST_PATH, map_location='cpu')
+    model.load_state_dict(best['model_state_dict'])
+    ts_path = export_lstm(model, SEQUENCE_LENGTH, input_size, os.path.dirname(BEST_PATH))
+    print(f"TorchScript export: {ts_path}")
+
     print("=" * 60)
     print(f"Training complete! Model: {BEST_PATH}")
     print(f"Trained on {len(successful)} stocks")
@@ -292,4 +400,24 @@ def train():
 
 
 if __name__ == '__main__':
-    train()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the Hybrid LSTM-GRU on the NSE universe")
+    parser.add_argument('--multi-horizon', action='store_true',
+                        help=f"Train the direct multi-horizon head {HORIZONS} instead of next-day returns")
+    parser.add_argument('--precision', choices=PRECISIONS, default='auto',
+                        help="auto = fp16 on CUDA, bf16 on CPUs with native bf16, else fp32")
+    parser.add_argument('--accumulation-steps', type=int, default=1)
+    parser.add_argument('--compile', action='store_true', help="torch.compile the model")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue from saved_models/checkpoints/trainlarge[-mh]/ instead of starting over")
+    parser.add_argument('--checkpoint-every', type=int, default=1, help="Epochs between checkpoints")
+    parser.add_argument('--nproc', type=int, default=1,
+                        help="Data-parallel processes on this machine (gloo); use torchrun for several machines")
+    args = parser.parse_args()
+    kwargs = dict(multi_horizon=args.multi_horizon, precision=args.precision,
+                  accumulation_steps=args.accumulation_steps, compile=args.compile,
+                  resume=args.resume, checkpoint_every=args.checkpoint_every)
+    if args.nproc > 1:
+        launch(train, args.nproc, **kwargs)
+    else:
+        with process_group():          # joins the group when started by torchrun
+            train(**kwargs)
\ No newline at end of file
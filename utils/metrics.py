@@ -0,0 +1,156 @@
+# utils/metrics.py
+#
+# In-process timing spans and Prometheus histograms. Kept outside the backend
+# package so the data and training layers can time their stages without
+# importing FastAPI code; backend/services/metrics.py adds the HTTP middleware.
+#
+#   with span('load.sql'):
+#       df = pd.read_sql(...)
+#
+# Every span is observed into stage_duration_seconds{stage=...}. While a
+# request is being traced (collect_timings(), switched on per request by the
+# X-Debug-Timings header) the same spans are also summed per stage and
+# returned in the response as a Server-Timing header.
+#
+# GET /metrics renders everything in the Prometheus text format. The
+# registry is per process — with several uvicorn workers, scrape each one.
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds. Covers single LSTM steps (~1 ms) up to cold 365-day forecasts.
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HTTP_BUCKETS  = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label tuple."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name        = name
+        self.help_text   = help_text
+        self.label_names = tuple(label_names)
+        self.buckets     = tuple(buckets)
+        self._series     = {}        # labels → [bucket counts..., +Inf count, sum]
+        self._lock       = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[i]  += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in items:
+            base  = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, labels))
+            sep   = ',' if base else ''
+            total = 0
+            for bound, n in zip(self.buckets, series):
+                total += n
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {total}')
+            total += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {total}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-1]:.6f}' if base else f'{self.name}_sum {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{base}}} {total}' if base else f'{self.name}_count {total}')
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name, help_text, label_names):
+        self.name        = name
+        self.help_text   = help_text
+        self.label_names = tuple(label_names)
+        self._values     = {}
+        self._lock       = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            base = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+stage_duration = Histogram(
+    'stage_duration_seconds', 'Wall time per prediction-pipeline stage', ['stage'], STAGE_BUCKETS
+)
+http_duration = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template',
+    ['method', 'route', 'status'], HTTP_BUCKETS
+)
+cache_requests = Counter(
+    'prediction_cache_requests_total', 'Prediction / signal cache lookups', ['service', 'result']
+)
+
+_REGISTRY = [stage_duration, http_duration, cache_requests]
+
+
+# ── Spans ──────────────────────────────────────────────────────────────────────
+
+# {stage: [total_seconds, count]} for the request being traced, else None.
+# run_in_threadpool copies the context, so spans in worker threads land here too.
+_trace = ContextVar('stage_trace', default=None)
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage)
+        trace = _trace.get()
+        if trace is not None:
+            entry = trace.get(stage)
+            if entry is None:
+                trace[stage] = [elapsed, 1]
+            else:
+                entry[0] += elapsed
+                entry[1] += 1
+
+
+@contextmanager
+def collect_timings():
+    """Trace every span() inside the block; yields the {stage: [seconds, count]} dict."""
+    trace = {}
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def server_timing(trace):
+    """Server-Timing header value (durations in ms, the count in desc) — shows up in browser devtools."""
+    return ', '.join(
+        f'{stage.replace(".", "-")};dur={seconds * 1000:.2f};desc="x{count}"'
+        for stage, (seconds, count) in trace.items()
+    )
+
+
+def render_prometheus():
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'